@@ -8,6 +8,7 @@ service discovery capabilities with JWT authentication.
 
 import argparse
 import asyncio
+import logging
 import os
 import sys
 from pathlib import Path
@@ -16,53 +17,49 @@ from contextlib import asynccontextmanager
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
-from mcp_server import create_server
+from mcp_server import create_server, orjson_dumps
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import structlog
 
-def configure_logging(use_json=True):
+def configure_logging(use_json=True, log_level="INFO"):
     """配置日志格式
 
+    使用 make_filtering_bound_logger 在调用入口按级别过滤，低于阈值的日志调用
+    是空操作，不会进入处理器链。
+
     Args:
         use_json: 是否使用JSON格式，True为JSON格式（简洁），False为控制台彩色格式
+        log_level: 最低日志级别（DEBUG/INFO/WARNING/ERROR）
     """
+    wrapper_class = structlog.make_filtering_bound_logger(getattr(logging, log_level))
+
     if use_json:
         # JSON格式 - 适合日志文件和生产环境
         structlog.configure(
             processors=[
-                structlog.stdlib.filter_by_level,
                 structlog.stdlib.add_logger_name,
                 structlog.stdlib.add_log_level,
-                structlog.stdlib.PositionalArgumentsFormatter(),
                 structlog.processors.TimeStamper(fmt="iso"),
-                structlog.processors.StackInfoRenderer(),
-                structlog.processors.format_exc_info,
-                structlog.processors.UnicodeDecoder(),
-                structlog.processors.JSONRenderer()  # JSON格式，避免ANSI转义字符
+                structlog.processors.JSONRenderer(serializer=orjson_dumps)  # JSON格式（orjson），避免ANSI转义字符
             ],
             context_class=dict,
             logger_factory=structlog.stdlib.LoggerFactory(),
-            wrapper_class=structlog.stdlib.BoundLogger,
+            wrapper_class=wrapper_class,
             cache_logger_on_first_use=True,
         )
     else:
         # 控制台彩色格式 - 适合开发环境
         structlog.configure(
             processors=[
-                structlog.stdlib.filter_by_level,
                 structlog.stdlib.add_logger_name,
                 structlog.stdlib.add_log_level,
-                structlog.stdlib.PositionalArgumentsFormatter(),
                 structlog.processors.TimeStamper(fmt="iso"),
-                structlog.processors.StackInfoRenderer(),
-                structlog.processors.format_exc_info,
-                structlog.processors.UnicodeDecoder(),
                 structlog.dev.ConsoleRenderer()  # 控制台彩色输出
             ],
             context_class=dict,
             logger_factory=structlog.stdlib.LoggerFactory(),
-            wrapper_class=structlog.stdlib.BoundLogger,
+            wrapper_class=wrapper_class,
             cache_logger_on_first_use=True,
         )
 
@@ -128,10 +125,9 @@ async def main():
     args = parser.parse_args()
 
     # Configure logging format
-    configure_logging(use_json=(args.log_format == "json"))
+    configure_logging(use_json=(args.log_format == "json"), log_level=args.log_level)
 
     # Set log level
-    import logging
     logging.basicConfig(level=getattr(logging, args.log_level))
 
     logger.info(
@@ -5,9 +5,12 @@
 提供基于 Cookie 的 JWT 认证功能，支持自动令牌刷新和过期检测。
 """
 
+import base64
+import hashlib
+import json
 import os
 import time
-from typing import Optional
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
 import httpx
 import structlog
 from pathlib import Path
@@ -16,6 +19,10 @@ from dotenv import load_dotenv
 # 获取日志记录器实例
 logger = structlog.get_logger(__name__)
 
+# 进程级 JWT 令牌缓存：hash(区域, Cookie) -> (JWT 令牌, 过期时间)
+# 同一 Cookie 新建的认证管理器可以直接复用仍然有效的令牌，无需再次请求认证服务
+_TOKEN_CACHE: Dict[bytes, Tuple[str, float]] = {}
+_TOKEN_CACHE_MAXSIZE = 1024  # 令牌缓存最大条目数
 
 
 class JWTAuthManager:
@@ -26,6 +33,14 @@ class JWTAuthManager:
     该类负责获取、缓存和刷新 JWT 令牌，支持基于 Cookie 的认证方式。
     """
 
+    # 认证请求的默认请求头，模拟浏览器行为
+    DEFAULT_HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/",
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+        "Accept-Encoding": "gzip, deflate, br, zstd",
+    }
+
     # 区域特定的认证端点配置
     # 定义不同区域的 JWT 认证服务 URL
     REGION_AUTH_URLS = {
@@ -34,7 +49,8 @@ class JWTAuthManager:
         "us": "https://cloud-ttp-us.bytedance.net/auth/api/v1/jwt"    # 美区
     }
 
-    def __init__(self, cookie_value: Optional[str] = None, region: str = "cn"):
+    def __init__(self, cookie_value: Optional[str] = None, region: str = "cn",
+                 client: Optional[httpx.AsyncClient] = None):
         """
         初始化 JWT 认证管理器
 
@@ -44,6 +60,7 @@ class JWTAuthManager:
         参数:
             cookie_value: CAS_SESSION Cookie 值，如果为 None 则使用区域特定的环境变量
             region: 区域标识符 ("cn"、"i18n"、"us")，默认为 "cn"
+            client: 可选的共享 HTTP 客户端；提供时复用该客户端，且 close() 不会关闭它
 
         异常:
             ValueError: 如果无法获取到有效的 Cookie 值
@@ -64,18 +81,13 @@ class JWTAuthManager:
         self.jwt_token: Optional[str] = None  # JWT 令牌
         self.expires_at: Optional[float] = None  # 令牌过期时间
         self.auth_url = self.REGION_AUTH_URLS.get(region, self.REGION_AUTH_URLS["cn"])  # 认证 URL
+        # 进程级令牌缓存的键，不保存 Cookie 明文
+        self._token_cache_key = hashlib.blake2b(f"{region}\0{self.cookie_value}".encode(), digest_size=16).digest()
 
         # 配置 HTTP 客户端
-        # 设置合适的超时时间和请求头，模拟浏览器行为
-        self.client = httpx.AsyncClient(
-            timeout=30.0,  # 30秒超时
-            headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/",
-                "Accept": "application/json, text/plain, */*",
-                "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                "Accept-Encoding": "gzip, deflate, br, zstd",
-            }
-        )
+        # 优先复用外部传入的共享客户端，否则创建私有客户端（设置合适的超时时间）
+        self._owns_client = client is None
+        self.client = client if client is not None else httpx.AsyncClient(timeout=30.0)  # 30秒超时
 
     async def get_jwt_token(self, force_refresh: bool = False) -> str:
         """
@@ -98,11 +110,21 @@ class JWTAuthManager:
             logger.debug("使用缓存的 JWT 令牌")
             return self.jwt_token
 
+        # 尝试复用进程级缓存中的令牌
+        if not force_refresh:
+            cached = _TOKEN_CACHE.get(self._token_cache_key)
+            # 与 is_token_valid 一致，5 分钟内过期的令牌视为无效
+            if cached and time.time() < cached[1] - 300:
+                self.jwt_token, self.expires_at = cached
+                logger.debug("使用进程级缓存的 JWT 令牌")
+                return self.jwt_token
+
         logger.info("正在获取新的 JWT 令牌")
 
         try:
             # 准备认证请求头，包含 Cookie 信息
             headers = {
+                **self.DEFAULT_HEADERS,
                 "Cookie": f"CAS_SESSION={self.cookie_value}"
             }
 
@@ -115,8 +137,14 @@ class JWTAuthManager:
             if not self.jwt_token:
                 raise RuntimeError("响应头中没有 JWT 令牌")
 
-            # 设置过期时间（假设令牌有效期为 1 小时）
-            self.expires_at = time.time() + 3600
+            # 设置过期时间（优先使用令牌中的 exp 声明，否则假设有效期为 1 小时）
+            self.expires_at = self._decode_expiry(self.jwt_token)
+
+            # 写入进程级缓存，超出上限时淘汰最早写入的条目
+            _TOKEN_CACHE.pop(self._token_cache_key, None)
+            while len(_TOKEN_CACHE) >= _TOKEN_CACHE_MAXSIZE:
+                del _TOKEN_CACHE[next(iter(_TOKEN_CACHE))]
+            _TOKEN_CACHE[self._token_cache_key] = (self.jwt_token, self.expires_at)
 
             logger.info("JWT 令牌获取成功")
             return self.jwt_token
@@ -130,6 +158,28 @@ class JWTAuthManager:
             logger.error("获取 JWT 令牌时发生意外错误", error=str(e))
             raise RuntimeError(f"意外错误: {e}")
 
+    @staticmethod
+    def _decode_expiry(token: str) -> float:
+        """
+        从 JWT 令牌中读取过期时间
+
+        只解码载荷中的 exp 声明，不校验签名（令牌刚由认证服务签发）。
+        无法解析或 exp 超过 1 小时时，按 1 小时有效期处理。
+
+        参数:
+            token: JWT 令牌字符串
+
+        返回:
+            过期时间（Unix 时间戳）
+        """
+        default_expiry = time.time() + 3600
+        try:
+            payload = token.split(".")[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+            return min(float(claims["exp"]), default_expiry)
+        except (IndexError, KeyError, TypeError, ValueError):
+            return default_expiry
+
     def is_token_valid(self) -> bool:
         """
         检查当前令牌是否有效
@@ -151,9 +201,22 @@ class JWTAuthManager:
         """
         关闭 HTTP 客户端
 
-        关闭 HTTP 客户端连接，释放资源。
+        关闭私有的 HTTP 客户端连接，释放资源；共享客户端由其创建者负责关闭。
         """
-        await self.client.aclose()
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def __aenter__(self) -> "JWTAuthManager":
+        """
+        进入异步上下文，返回认证管理器本身
+        """
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        退出异步上下文时关闭 HTTP 客户端，无论是否发生异常
+        """
+        await self.close()
 
     def __del__(self):
         """
@@ -164,11 +227,34 @@ class JWTAuthManager:
         """
         try:
             # 检查是否存在客户端属性
-            if hasattr(self, 'client'):
+            if hasattr(self, 'client') and getattr(self, '_owns_client', True):
                 import asyncio
                 # 如果事件循环正在运行，则异步关闭客户端
                 if asyncio.get_event_loop().is_running():
                     asyncio.create_task(self.client.aclose())
         except Exception:
             # 忽略清理过程中的任何异常
-            pass
\ No newline at end of file
+            pass
+
+
+class SingleRegionManager(NamedTuple):
+    """
+    单区域 JWT 管理器映射
+
+    以轻量的具名元组代替只有一个键的字典，提供日志查询类所需的 get/values/items 接口。
+    """
+
+    region: str  # 区域标识
+    manager: JWTAuthManager  # 该区域的 JWT 认证管理器
+
+    def get(self, region: str, default=None):
+        """按区域获取 JWT 管理器，区域不匹配时返回 default"""
+        return self.manager if region == self.region else default
+
+    def values(self) -> Iterator[JWTAuthManager]:
+        """遍历所有 JWT 管理器"""
+        return iter((self.manager,))
+
+    def items(self) -> Iterator[Tuple[str, JWTAuthManager]]:
+        """遍历 (区域, JWT 管理器) 对"""
+        return iter(((self.region, self.manager),))
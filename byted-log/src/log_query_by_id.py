@@ -15,6 +15,13 @@ from typing import Any, Dict, List, Optional
 import httpx
 import structlog
 
+try:
+    # 作为脚本目录导入时（src 在 sys.path 中）
+    from auth import SingleRegionManager
+except ImportError:
+    # 作为包导入时
+    from .auth import SingleRegionManager
+
 # 获取日志记录器实例
 logger = structlog.get_logger(__name__)
 
@@ -54,7 +61,7 @@ class LogQueryByID:
     DEFAULT_FILTER_CONFIG_PATH = Path(__file__).resolve().parent.parent / "message_filters.json"
 
     def __init__(self, jwt_managers: Dict[str, Any], message_filter_patterns: Optional[List[str]] = None,
-                 filter_config_path: Optional[Path] = None):
+                 filter_config_path: Optional[Path] = None, client: Optional[httpx.AsyncClient] = None):
         """
         初始化日志发现器
 
@@ -62,9 +69,11 @@ class LogQueryByID:
 
         参数:
             jwt_managers: 区域 JWT 管理器字典，将区域键映射到 JWTAuthManager 实例
-                         期望的键: "us", "i18n"（如果需要也可以包含 "cn"）
+                         期望的键: "us", "i18n"（如果需要也可以包含 "cn"）；
+                         单区域查询可使用 for_region() 构造，避免创建字典
             message_filter_patterns: 可选的消息过滤正则列表，用于删除 _msg 中的噪声字段
             filter_config_path: 可选的过滤配置文件路径，默认为仓库根目录 message_filters.json
+            client: 可选的共享 HTTP 客户端；提供时复用该客户端，且 close() 不会关闭它
         """
         # 保存 JWT 管理器实例
         self.jwt_managers = jwt_managers
@@ -72,16 +81,24 @@ class LogQueryByID:
         self._prepare_message_filters(message_filter_patterns, filter_config_path)
 
         # 配置 HTTP 客户端
-        # 设置超时时间和请求头，模拟浏览器行为以避免被拦截
-        self.client = httpx.AsyncClient(
-            timeout=30.0,  # 30秒超时
-            headers={
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0",
-                "Accept": "application/json, text/plain, */*",
-                "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                "Content-Type": "application/json",
-            }
-        )
+        # 优先复用外部传入的共享客户端，否则创建私有客户端（30秒超时）
+        self._owns_client = client is None
+        self.client = client if client is not None else httpx.AsyncClient(timeout=30.0)
+
+    @classmethod
+    def for_region(cls, region: str, jwt_manager: Any, **kwargs) -> "LogQueryByID":
+        """
+        为单个区域创建日志查询实例
+
+        参数:
+            region: 区域键
+            jwt_manager: 该区域的 JWTAuthManager 实例
+            **kwargs: 传给构造函数的其它参数（如 client）
+
+        返回:
+            LogQueryByID 实例
+        """
+        return cls(SingleRegionManager(region, jwt_manager), **kwargs)
 
     def _prepare_message_filters(self, message_filter_patterns: Optional[List[str]],
                                  filter_config_path: Optional[Path]):
@@ -223,6 +240,7 @@ class LogQueryByID:
         headers = {
             "X-Jwt-Token": jwt_token,  # JWT 认证令牌
             "accept": "application/json, text/plain, */*",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
             "Content-Type": "application/json",
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0"
         }
@@ -392,6 +410,45 @@ class LogQueryByID:
             "region_display_name": result.get("region_display_name", "未知区域")  # 区域显示名称
         }
 
+    async def get_log_details_multi_region(self, logid: str, regions: List[str],
+                                           psm_list: Optional[List[str]] = None,
+                                           scan_time_min: int = 10) -> Dict[str, Any]:
+        """
+        并发查询多个区域并返回最佳结果
+
+        使用 asyncio.gather 同时查询所有区域，总耗时取决于最慢的区域而不是各区域耗时之和。
+        优先返回第一个找到日志消息的区域结果（按 regions 顺序），都没有消息时返回第一个成功的结果。
+
+        参数:
+            logid: 要搜索的日志 ID
+            regions: 目标区域列表，例如 ["us", "i18n"]
+            psm_list: PSM 服务列表用于过滤（可选）
+            scan_time_min: 扫描时间范围（分钟，默认：10）
+
+        返回:
+            最佳区域的详细日志信息
+
+        异常:
+            所有区域都查询失败时，抛出第一个区域的异常
+        """
+        results = await asyncio.gather(
+            *(self.get_log_details(logid, region, psm_list, scan_time_min) for region in regions),
+            return_exceptions=True
+        )
+
+        succeeded = []
+        for region, result in zip(regions, results):
+            if isinstance(result, BaseException):
+                logger.warning("区域日志查询失败", region=region, logid=logid, error=str(result))
+                continue
+            if result.get("total_items"):
+                return result
+            succeeded.append(result)
+
+        if succeeded:
+            return succeeded[0]
+        raise results[0]
+
     def format_log_response(self, log_details: Dict[str, Any]) -> str:
         """
         格式化日志详情为可读响应
@@ -471,13 +528,26 @@ class LogQueryByID:
 
         清理资源，关闭 HTTP 连接和所有的 JWT 认证管理器。
         """
-        # 关闭 HTTP 客户端连接
-        await self.client.aclose()
+        # 关闭私有的 HTTP 客户端连接（共享客户端由其创建者负责关闭）
+        if self._owns_client:
+            await self.client.aclose()
 
         # 关闭所有 JWT 管理器
         for jwt_manager in self.jwt_managers.values():
             await jwt_manager.close()
 
+    async def __aenter__(self) -> "LogQueryByID":
+        """
+        进入异步上下文，返回日志查询实例本身
+        """
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        退出异步上下文时清理资源，无论是否发生异常
+        """
+        await self.close()
+
     def __del__(self):
         """
         对象销毁时的清理工作
@@ -486,7 +556,7 @@ class LogQueryByID:
         """
         try:
             # 检查是否存在客户端属性
-            if hasattr(self, 'client'):
+            if hasattr(self, 'client') and getattr(self, '_owns_client', True):
                 import asyncio
                 # 如果事件循环正在运行，则异步关闭客户端
                 if asyncio.get_event_loop().is_running():
@@ -4,14 +4,32 @@
 """
 
 import asyncio
-from typing import Dict, List, Optional, Any
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional, Any, Tuple
 import httpx
 import structlog
 from datetime import datetime
 
+try:
+    # 作为脚本目录导入时（src 在 sys.path 中）
+    from auth import SingleRegionManager
+except ImportError:
+    # 作为包导入时
+    from .auth import SingleRegionManager
+
 # 获取日志记录器实例
 logger = structlog.get_logger(__name__)
 
+# 在途查询表：相同请求体的并发查询共享同一个 Future（单飞合并）
+_INFLIGHT: Dict[bytes, asyncio.Future] = {}
+
+# 近期查询结果缓存：请求键 -> (过期时间, 查询结果)
+_RESULT_CACHE: Dict[bytes, Tuple[float, Dict[str, Any]]] = {}
+_RESULT_CACHE_TTL = 5.0  # 结果缓存有效期（秒）
+_RESULT_CACHE_MAXSIZE = 256  # 结果缓存最大条目数
+
 class LogQueryByKeyword:
     """
     多区域日志发现器
@@ -36,7 +54,7 @@ class LogQueryByKeyword:
         }
     }
 
-    def __init__(self, jwt_managers: Dict[str, Any]):
+    def __init__(self, jwt_managers: Dict[str, Any], client: Optional[httpx.AsyncClient] = None):
         """
         初始化日志发现器
 
@@ -44,22 +62,32 @@ class LogQueryByKeyword:
 
         参数:
             jwt_managers: 区域 JWT 管理器字典，将区域键映射到 JWTAuthManager 实例
-                         期望的键: "us", "i18n"（如果需要也可以包含 "cn"）
+                         期望的键: "us", "i18n"（如果需要也可以包含 "cn"）；
+                         单区域查询可使用 for_region() 构造，避免创建字典
+            client: 可选的共享 HTTP 客户端；提供时复用该客户端，且 close() 不会关闭它
         """
         # 保存 JWT 管理器实例
         self.jwt_managers = jwt_managers
 
         # 配置 HTTP 客户端
-        # 设置超时时间和请求头，模拟浏览器行为以避免被拦截
-        self.client = httpx.AsyncClient(
-            timeout=30.0,  # 30秒超时
-            headers={
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0",
-                "Accept": "application/json, text/plain, */*",
-                "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                "Content-Type": "application/json",
-            }
-        )
+        # 优先复用外部传入的共享客户端，否则创建私有客户端（30秒超时）
+        self._owns_client = client is None
+        self.client = client if client is not None else httpx.AsyncClient(timeout=30.0)
+
+    @classmethod
+    def for_region(cls, region: str, jwt_manager: Any, **kwargs) -> "LogQueryByKeyword":
+        """
+        为单个区域创建日志查询实例
+
+        参数:
+            region: 区域键
+            jwt_manager: 该区域的 JWTAuthManager 实例
+            **kwargs: 传给构造函数的其它参数（如 client）
+
+        返回:
+            LogQueryByKeyword 实例
+        """
+        return cls(SingleRegionManager(region, jwt_manager), **kwargs)
 
     async def query_logs_by_keyword(self, region: str, psm_list: Optional[List[str]] = None,
                                   start_time: Optional[int] = None, end_time: Optional[int] = None,
@@ -128,7 +156,6 @@ class LogQueryByKeyword:
         """
         # 获取区域配置信息
         config = self.REGION_CONFIGS[region_key]
-        region_url = config["url"]
 
         # 设置默认时间范围（如果未提供）
         current_time = int(datetime.now().timestamp())
@@ -145,15 +172,12 @@ class LogQueryByKeyword:
         logger.info("开始查询单个区域（关键词）", region=region_key, start_time=start_time,
                    end_time=end_time, vregion=vregion, psm_count=len(psm_list) if psm_list else 0)
 
-        # 获取特定区域的JWT令牌
+        # 获取特定区域的JWT管理器
         jwt_manager = self.jwt_managers.get(region_key)
         if not jwt_manager:
             logger.error(f"未配置JWT管理器用于区域: {region_key}")
             raise RuntimeError(f"未配置JWT管理器用于区域: {region_key}")
 
-        # 异步获取JWT令牌
-        jwt_token = await jwt_manager.get_jwt_token()
-
         # 构建关键词过滤条件
         keyword_filter = self._build_keyword_filter(keyword_filter_include, keyword_filter_exclude)
 
@@ -171,10 +195,131 @@ class LogQueryByKeyword:
             "vregion": vregion
         }
 
+        # 请求键包含调用方凭证，只有同一凭证的相同查询才会共享缓存结果或在途请求
+        request_key = self._make_request_key(region_key, request_body, self._credential_key(jwt_manager))
+        while True:
+            # 命中近期结果缓存时直接返回
+            cached = _RESULT_CACHE.get(request_key)
+            if cached and cached[0] > time.monotonic():
+                logger.info("命中关键词查询结果缓存", region=region_key, start_time=start_time, end_time=end_time)
+                return cached[1]
+
+            # 相同查询正在进行时，等待其结果而不是重复请求日志服务
+            inflight = _INFLIGHT.get(request_key)
+            if inflight is None:
+                break
+            logger.info("合并相同的在途关键词查询", region=region_key, start_time=start_time, end_time=end_time)
+            # asyncio.wait 不会取消被等待的 Future，也不会把发起方的取消传给跟随方；
+            # 发起方被取消时重新检查缓存和在途表，必要时由本调用重新发起查询
+            await asyncio.wait({inflight})
+            if not inflight.cancelled():
+                return inflight.result()
+
+        future = asyncio.get_running_loop().create_future()
+        _INFLIGHT[request_key] = future
+        try:
+            result = await self._send_keyword_query(jwt_manager, config, region_key, request_body)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 标记异常已被读取，避免无人等待时输出 "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            self._store_result(request_key, result)
+            return result
+        finally:
+            _INFLIGHT.pop(request_key, None)
+
+    @staticmethod
+    def _credential_key(jwt_manager: Any) -> bytes:
+        """
+        计算 JWT 管理器所用凭证的摘要
+
+        优先复用管理器的令牌缓存键（区域 + Cookie 的摘要），否则对 Cookie 取摘要；
+        两者都没有时按管理器实例区分，不同实例之间不共享查询结果。
+
+        参数:
+            jwt_manager: 区域对应的 JWT 管理器
+
+        返回:
+            凭证摘要字节串
+        """
+        token_cache_key = getattr(jwt_manager, "_token_cache_key", None)
+        if isinstance(token_cache_key, bytes):
+            return token_cache_key
+        cookie_value = getattr(jwt_manager, "cookie_value", None)
+        if isinstance(cookie_value, str):
+            return hashlib.blake2b(cookie_value.encode("utf-8"), digest_size=16).digest()
+        return id(jwt_manager).to_bytes(8, "little")
+
+    @staticmethod
+    def _make_request_key(region_key: str, request_body: Dict[str, Any], credential_key: bytes) -> bytes:
+        """
+        计算查询请求的唯一键
+
+        对区域和请求体做规范化 JSON 序列化，连同凭证摘要取 blake2b 摘要，用于单飞合并和结果缓存。
+
+        参数:
+            region_key: 区域键
+            request_body: 发送到日志服务的请求体
+            credential_key: 调用方凭证摘要，见 _credential_key
+
+        返回:
+            请求键（摘要字节串）
+        """
+        canonical = json.dumps([region_key, request_body], sort_keys=True, ensure_ascii=False)
+        digest = hashlib.blake2b(credential_key, digest_size=16)
+        digest.update(canonical.encode("utf-8"))
+        return digest.digest()
+
+    @staticmethod
+    def _store_result(request_key: bytes, result: Dict[str, Any]) -> None:
+        """
+        写入近期结果缓存，并清理过期或超量的条目
+
+        参数:
+            request_key: 请求键
+            result: 查询结果
+        """
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in _RESULT_CACHE.items() if expires_at <= now]:
+            del _RESULT_CACHE[key]
+        while len(_RESULT_CACHE) >= _RESULT_CACHE_MAXSIZE:
+            # 字典保持插入顺序，淘汰最早写入的条目
+            del _RESULT_CACHE[next(iter(_RESULT_CACHE))]
+        _RESULT_CACHE[request_key] = (now + _RESULT_CACHE_TTL, result)
+
+    async def _send_keyword_query(self, jwt_manager: Any, config: Dict[str, Any], region_key: str,
+                                  request_body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        向日志服务发送关键词查询请求
+
+        参数:
+            jwt_manager: 区域对应的 JWT 管理器
+            config: 区域配置信息
+            region_key: 区域键
+            request_body: 请求体
+
+        返回:
+            日志查询结果
+        """
+        region_url = config["url"]
+        start_time = request_body["start"]
+        end_time = request_body["end"]
+        vregion = request_body["vregion"]
+
+        # 异步获取JWT令牌
+        jwt_token = await jwt_manager.get_jwt_token()
+
         # 准备请求头
         headers = {
             "X-Jwt-Token": jwt_token,  # JWT认证令牌
             "accept": "application/json, text/plain, */*",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
             "Content-Type": "application/json",
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0"
         }
@@ -537,13 +682,26 @@ class LogQueryByKeyword:
 
         清理资源，关闭 HTTP 连接和所有的 JWT 认证管理器。
         """
-        # 关闭 HTTP 客户端连接
-        await self.client.aclose()
+        # 关闭私有的 HTTP 客户端连接（共享客户端由其创建者负责关闭）
+        if self._owns_client:
+            await self.client.aclose()
 
         # 关闭所有 JWT 管理器
         for jwt_manager in self.jwt_managers.values():
             await jwt_manager.close()
 
+    async def __aenter__(self) -> "LogQueryByKeyword":
+        """
+        进入异步上下文，返回日志查询实例本身
+        """
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        退出异步上下文时清理资源，无论是否发生异常
+        """
+        await self.close()
+
     def __del__(self):
         """
         对象销毁时的清理工作
@@ -552,7 +710,7 @@ class LogQueryByKeyword:
         """
         try:
             # 检查是否存在客户端属性
-            if hasattr(self, 'client'):
+            if hasattr(self, 'client') and getattr(self, '_owns_client', True):
                 import asyncio
                 # 如果事件循环正在运行，则异步关闭客户端
                 if asyncio.get_event_loop().is_running():
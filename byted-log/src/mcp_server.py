@@ -6,48 +6,236 @@
 
 import os
 import asyncio
-from typing import Dict, Any
-from mcp.server.fastmcp import FastMCP
-from fastmcp.server.dependencies import get_http_headers
+import functools
+import hashlib
+import importlib.util
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Tuple
+import httpx
+import orjson
 import structlog
 
+# 日志查询模块只在对应工具首次调用时导入（见工具函数内部），这里只导入共享的认证模块
 try:
     # 尝试直接导入模块（当作为包运行时）
     from auth import JWTAuthManager
-    from log_query_by_id import LogQueryByID
-    from log_query_by_keyword import LogQueryByKeyword
 except ImportError:
     # 回退方案：当作为脚本运行时，调整导入路径
     import sys
     from pathlib import Path
     sys.path.insert(0, str(Path(__file__).parent))
     from auth import JWTAuthManager
-    from log_query_by_id import LogQueryByID
-    from log_query_by_keyword import LogQueryByKeyword
-
-# 配置结构化日志 - 使用简洁格式，避免ANSI转义字符
-# 设置日志处理器和格式，用于记录详细的运行信息
-structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,  # 按级别过滤日志
-        structlog.stdlib.add_logger_name,  # 添加记录器名称
-        structlog.stdlib.add_log_level,   # 添加日志级别
-        structlog.stdlib.PositionalArgumentsFormatter(),  # 位置参数格式化
-        structlog.processors.TimeStamper(fmt="iso"),       # ISO 时间戳
-        structlog.processors.StackInfoRenderer(),          # 堆栈信息渲染
-        structlog.processors.format_exc_info,              # 异常信息格式化
-        structlog.processors.UnicodeDecoder(),             # Unicode 解码
-        structlog.processors.JSONRenderer()                # JSON 格式输出，避免ANSI转义字符
-    ],
-    context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
-    cache_logger_on_first_use=True,
-)
+
+
+def orjson_dumps(obj: Any, default=str, **kwargs) -> str:
+    """
+    structlog JSONRenderer 使用的序列化函数，基于 orjson 实现
+
+    orjson 的序列化速度明显快于标准库 json，并直接输出 UTF-8 中文。
+
+    参数:
+        obj: 待序列化的日志事件字典
+        default: 无法直接序列化的对象的回退处理函数
+        **kwargs: JSONRenderer 传入的其它标准库参数（忽略）
+
+    返回:
+        JSON 字符串
+    """
+    return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _http2_enabled() -> bool:
+    """
+    判断共享 HTTP 客户端是否启用 HTTP/2
+
+    默认启用（由 MCP_CLIENT_HTTP2 控制）；未安装 h2 时回退到 HTTP/1.1。
+
+    返回:
+        是否启用 HTTP/2
+    """
+    if os.getenv("MCP_CLIENT_HTTP2", "true").lower() not in ("1", "true", "yes"):
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("未安装 h2，共享 HTTP 客户端回退到 HTTP/1.1")
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def _configure_logging():
+    """
+    配置结构化日志 - 使用简洁格式，避免ANSI转义字符
+
+    延迟到首次创建服务器时执行，且只执行一次；如果入口程序已经配置过 structlog，
+    则保留其配置，不再覆盖。
+    """
+    if structlog.is_configured():
+        return
+
+    # 设置日志处理器和格式，用于记录详细的运行信息
+    # 级别过滤由 make_filtering_bound_logger 在调用入口完成，低于阈值的调用直接返回
+    structlog.configure(
+        processors=[
+            structlog.stdlib.add_logger_name,  # 添加记录器名称
+            structlog.stdlib.add_log_level,   # 添加日志级别
+            structlog.processors.TimeStamper(fmt="iso"),       # ISO 时间戳
+            # 日志调用不携带 exc_info/stack_info，且字段均为 str，
+            # 因此省略 StackInfoRenderer、format_exc_info 和 UnicodeDecoder 以缩短处理链
+            structlog.processors.JSONRenderer(serializer=orjson_dumps)  # JSON 格式输出（orjson），避免ANSI转义字符
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.make_filtering_bound_logger(
+            getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+        ),
+        cache_logger_on_first_use=True,
+    )
 
 # 获取日志记录器实例
 logger = structlog.get_logger(__name__)
 
+# JWT 认证管理器缓存：(区域, Cookie 摘要) -> (认证管理器, 过期时间)
+# 复用管理器可以避免每次请求都重新建立连接和获取 JWT 令牌
+_jwt_cache: Dict[Tuple[str, str], Tuple[JWTAuthManager, float]] = {}
+# 缓存锁及其所属的事件循环，首次使用时在运行中的事件循环内创建（见 _get_jwt_cache_lock）
+_jwt_cache_lock: Optional[asyncio.Lock] = None
+_jwt_cache_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+_JWT_CACHE_TTL = 3600.0  # 管理器最长复用时间（秒）
+_JWT_CACHE_MAXSIZE = 256  # 缓存的管理器数量上限
+_background_tasks = set()  # 持有后台任务引用，防止被垃圾回收
+
+# 各区域按优先级查找 Cookie 的请求头名称（小写）：区域特定 Cookie 优先，其次通用 Cookie
+_REGION_COOKIE_KEYS = {
+    "us": ("cas_session_us", "cookie"),
+    "i18n": ("cas_session_i18n", "cookie"),
+}
+_DEFAULT_COOKIE_KEYS = ("cookie",)
+
+# 当前请求的请求头缓存：(HTTP 请求对象, 小写键请求头字典)
+# 同一请求内多次读取请求头时只解析一次
+_EMPTY_HEADERS: Dict[str, str] = {}  # 没有活动请求时返回的共享空字典（只读使用）
+_HEADERS_CV: ContextVar[Optional[Tuple[Any, Dict[str, str]]]] = ContextVar("request_headers", default=None)
+
+
+def _get_request_headers() -> Dict[str, str]:
+    """
+    获取当前 HTTP 请求的请求头（键为小写）
+
+    首次读取时解析并缓存到 ContextVar，同一请求内再次读取直接返回缓存结果。
+    没有活动的 HTTP 请求时返回空字典。
+
+    返回:
+        请求头字典
+    """
+    from fastmcp.server.dependencies import get_http_headers, get_http_request
+
+    try:
+        request = get_http_request()
+    except RuntimeError:
+        return _EMPTY_HEADERS
+
+    cached = _HEADERS_CV.get()
+    if cached is not None and cached[0] is request:
+        return cached[1]
+
+    headers = {k.lower(): v for k, v in get_http_headers().items()}  # 请求头名称不区分大小写
+    _HEADERS_CV.set((request, headers))
+    return headers
+
+
+# 工具错误消息模板（预先绑定 format_map，出错时直接填充）
+_ERR_LOGID = "❌ 查询 logid {logid} 的日志时出错: {err}".format_map
+_ERR_KEYWORD = "❌ 关键词查询日志时出错: {err}".format_map
+
+# 逗号分隔列表的切分函数：在 C 实现的正则引擎中一次完成切分和去除空白
+_CSV_SPLIT = re.compile(r"\s*,\s*").split
+
+
+def _get_jwt_cache_lock() -> asyncio.Lock:
+    """
+    获取当前事件循环中的 JWT 管理器缓存锁
+
+    Python 3.8/3.9 的 asyncio.Lock 在创建时绑定当时的事件循环，模块导入时创建的锁
+    与 uvicorn 启动的事件循环不同，竞争时会报 "attached to a different loop"；
+    因此在运行中的事件循环内按需创建，事件循环变化时重新创建。
+
+    返回:
+        当前事件循环的缓存锁
+    """
+    global _jwt_cache_lock, _jwt_cache_lock_loop
+    loop = asyncio.get_running_loop()
+    if _jwt_cache_lock is None or _jwt_cache_lock_loop is not loop:
+        _jwt_cache_lock = asyncio.Lock()
+        _jwt_cache_lock_loop = loop
+    return _jwt_cache_lock
+
+
+def _lookup_cookie(headers: Dict[str, str], region: str) -> Optional[str]:
+    """
+    按区域优先级从请求头中查找 Cookie 值
+
+    参数:
+        headers: 键已转为小写的请求头字典
+        region: 区域标识符（小写）
+
+    返回:
+        Cookie 值，未找到时返回 None
+    """
+    keys = _REGION_COOKIE_KEYS.get(region, _DEFAULT_COOKIE_KEYS)
+
+    # 快速路径：最常见的情况是请求头中带有区域特定的 cas_session_<region>
+    cookie_value = headers.get(keys[0])
+    if cookie_value:
+        return cookie_value
+
+    return next((headers[k] for k in keys[1:] if headers.get(k)), None)
+
+
+def _close_jwt_managers(managers):
+    """
+    在后台关闭被淘汰的 JWT 认证管理器，不阻塞当前请求
+    """
+    for manager in managers:
+        task = asyncio.create_task(manager.close())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+
+async def _get_jwt_manager(cookie_value: str, region: str,
+                           client: Optional[httpx.AsyncClient] = None) -> JWTAuthManager:
+    """
+    获取指定区域和 Cookie 对应的 JWT 认证管理器
+
+    命中缓存且未过期时直接复用已有实例，否则创建新实例并写入缓存。
+
+    参数:
+        cookie_value: CAS_SESSION Cookie 值
+        region: 区域标识符
+        client: 新建管理器时注入的共享 HTTP 客户端（可选）
+
+    返回:
+        JWTAuthManager 实例
+    """
+    key = (region, hashlib.sha256(cookie_value.encode()).hexdigest())
+    async with _get_jwt_cache_lock():
+        now = time.monotonic()
+        cached = _jwt_cache.get(key)
+        if cached and now < cached[1]:
+            return cached[0]
+
+        # 清理过期条目，超出上限时淘汰最早写入的条目
+        evicted = [_jwt_cache.pop(k)[0] for k, (_, expires_at) in list(_jwt_cache.items()) if expires_at <= now]
+        while len(_jwt_cache) >= _JWT_CACHE_MAXSIZE:
+            evicted.append(_jwt_cache.pop(next(iter(_jwt_cache)))[0])
+        _close_jwt_managers(evicted)
+
+        jwt_manager = JWTAuthManager(cookie_value=cookie_value, region=region, client=client)
+        _jwt_cache[key] = (jwt_manager, now + _JWT_CACHE_TTL)
+        return jwt_manager
+
 
 class ByteDanceLogQueryMCPServer:
     """
@@ -63,6 +251,26 @@ class ByteDanceLogQueryMCPServer:
 
         不再在初始化时处理 headers，而是每个客户端连接维护自己的认证上下文。
         """
+        from mcp.server.fastmcp import FastMCP
+
+        # 首次创建服务器时才配置日志
+        _configure_logging()
+
+        # 进程内共享的 HTTP 客户端，所有认证和日志查询请求复用同一个连接池
+        # 连接池上限可通过环境变量调整
+        self._http = httpx.AsyncClient(
+            http2=_http2_enabled(),  # HTTP/2 多路复用：并发请求共享同一条 TCP+TLS 连接
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("MCP_CLIENT_MAX_CONNECTIONS", "500")),
+                max_keepalive_connections=int(os.getenv("MCP_CLIENT_MAX_KEEPALIVE_CONNECTIONS", "100")),
+                keepalive_expiry=float(os.getenv("MCP_CLIENT_KEEPALIVE_EXPIRY", "30")),
+            ),
+            timeout=httpx.Timeout(30.0),  # 30秒超时
+        )
+
+        # 限制同时进行的上游日志查询数量，超出的调用排队等待
+        self._query_semaphore = asyncio.Semaphore(int(os.getenv("MCP_MAX_CONCURRENT_QUERIES", "64")))
+
         # 创建 FastMCP 实例
         self.mcp = FastMCP(
             name="byted-log-query-api", # 服务器名称
@@ -94,13 +302,16 @@ class ByteDanceLogQueryMCPServer:
                 logid: 要搜索的日志 ID（必需）
                 psm_list: 逗号分隔的 PSM 服务列表，用于过滤（可选）
                 scan_time_min: 扫描时间范围，单位为分钟（默认: 10）
-                region: 目标区域 - "us", "i18n"
+                region: 目标区域 - "us", "i18n"，逗号分隔的多个区域（如 "us,i18n"），或 "auto" 查询所有提供了 Cookie 的区域
 
             返回:
                 日志查询结果，包含来自最佳区域的关键信息消息
 
             示例:
 
+                # 同时查询所有区域，返回找到日志的区域结果
+                query_logs_by_logid("20250923034643559E874098ED5808B03C", region="auto")
+
                 # 强制指定区域
                 query_logs_by_logid("20250923034643559E874098ED5808B03C", region="i18n")
 
@@ -108,61 +319,91 @@ class ByteDanceLogQueryMCPServer:
                 query_logs_by_logid("20250923034643559E874098ED5808B03C", region="i18n", psm_list="oec.live.promotion_core")
 
             """
+            from log_query_by_id import LogQueryByID
+
             try:
                 # 获取当前请求的 headers
-                headers = {}
-
-                headers = get_http_headers()
+                headers = _get_request_headers()
 
-                logger.info("Received headers for logid query", headers=headers)
+                # 只在 DEBUG 级别记录请求头名称，避免序列化 Cookie 值，也跳过整个日志处理链
+                if logger.is_enabled_for(logging.DEBUG):
+                    logger.debug("Received headers for logid query", headers_keys=list(headers.keys()))
 
+                # 没有任何请求头时不可能带有 Cookie，直接返回
+                if not headers:
+                    return "❌ 缺少 Cookie 认证信息，请在请求头中提供 Cookie"
 
                 # 解析 PSM 列表（如果提供了）
                 psm_services = None
                 if psm_list:
-                    psm_services = [psm.strip() for psm in psm_list.split(",") if psm.strip()]
+                    psm_services = [s for s in _CSV_SPLIT(psm_list.strip()) if s]
 
                 logger.info("Querying logs by logid", logid=logid, psm_list=psm_services,
                            scan_time_min=scan_time_min, region=region)
 
-                # 从 headers 动态获取 cookie，默认是 cn 区域的 Cookie
-                cookie_value = headers.get(f"cas_session_{region.lower()}") or headers.get("cookie") or headers.get("Cookie")
-                if not cookie_value:
+                # 解析目标区域："auto" 表示所有区域，也支持逗号分隔的多个区域
+                # 快速路径：最常见的单个已知区域（"us"/"i18n"）无需解析
+                auto_region = False
+                if region in _REGION_COOKIE_KEYS:
+                    regions = [region]
+                elif region.strip().lower() == "auto":
+                    auto_region = True
+                    regions = list(LogQueryByID.REGION_CONFIGS)
+                else:
+                    regions = [r.lower() for r in _CSV_SPLIT(region.strip()) if r]
+                if not regions:
+                    return "❌ 区域参数不能为空，请指定 us、i18n 或 auto"
+
+                # 为每个区域获取（或复用）认证管理器
+                # 从 headers 动态获取 cookie，优先使用区域特定的 Cookie
+                # "auto" 时跳过没有 Cookie 的区域，只查询能认证的区域；显式指定的区域缺少 Cookie 时直接报错
+                authed_regions = []
+                jwt_managers = []
+                for region_key in regions:
+                    cookie_value = _lookup_cookie(headers, region_key)
+                    if not cookie_value:
+                        if auto_region:
+                            continue
+                        return "❌ 缺少 Cookie 认证信息，请在请求头中提供 Cookie"
+                    authed_regions.append(region_key)
+                    jwt_managers.append(await _get_jwt_manager(cookie_value, region_key, client=self._http))
+                if not authed_regions:
                     return "❌ 缺少 Cookie 认证信息，请在请求头中提供 Cookie"
-
-                # 动态创建认证管理器
-                jwt_manager = JWTAuthManager(cookie_value=cookie_value, region=region)
-
-                # 创建临时的日志查询实例
-                log_query = LogQueryByID({region: jwt_manager})
-
-                # 使用新的多区域支持查询日志
-                # result = await log_query.query_logs_by_logid(
-                #     logid=logid,
-                #     region=region,
-                #     psm_list=psm_services,
-                #     scan_time_min=scan_time_min
-                # )
-                result = await log_query.get_log_details(
-                    logid=logid,
-                    region=region,
-                    psm_list=psm_services,
-                    scan_time_min=scan_time_min
+                regions = authed_regions
+
+                # 限制同时进行的上游查询数量，避免突发流量耗尽连接池
+                async with self._query_semaphore:
+                    if len(regions) == 1:
+                        # 单区域查询（最常见），使用轻量的单区域映射创建临时的日志查询实例
+                        log_query = LogQueryByID.for_region(regions[0], jwt_managers[0], client=self._http)
+                        result = await log_query.get_log_details(
+                            logid=logid,
+                            region=regions[0],
+                            psm_list=psm_services,
+                            scan_time_min=scan_time_min
+                        )
+                    else:
+                        # 多区域并发查询，耗时为最慢区域而非各区域之和
+                        log_query = LogQueryByID(dict(zip(regions, jwt_managers)), client=self._http)
+                        result = await log_query.get_log_details_multi_region(
+                            logid=logid,
+                            regions=regions,
+                            psm_list=psm_services,
+                            scan_time_min=scan_time_min
+                        )
+
+                # 格式化响应结果（在工作线程中执行，避免大结果的字符串拼接阻塞事件循环）
+                formatted_response = await asyncio.get_running_loop().run_in_executor(
+                    None, log_query.format_log_response, result
                 )
 
-
-
-                # 格式化响应结果
-                formatted_response = log_query.format_log_response(result)
-
-                # 清理资源
-                await jwt_manager.close()
-
                 return formatted_response
 
             except Exception as e:
-                logger.error("Error querying logs by logid", logid=logid, error=str(e))
-                return f"❌ 查询 logid {logid} 的日志时出错: {str(e)}"
+                # 错误消息只构建一次，日志和返回值共用同一个字符串
+                error_message = _ERR_LOGID({"logid": logid, "err": e})
+                logger.error("Error querying logs by logid", logid=logid, error=error_message)
+                return error_message
 
         @self.mcp.tool()
         async def query_logs_by_keyword(region: str, psm_list: str, start_time: int = None,
@@ -206,69 +447,81 @@ class ByteDanceLogQueryMCPServer:
                                     keyword_filter_exclude="debug,info")
 
             """
+            from log_query_by_keyword import LogQueryByKeyword
+
             try:
                 # 获取当前请求的headers
-                headers = get_http_headers()
-                logger.info("Received headers for keyword query", headers=headers)
+                headers = _get_request_headers()
+
+                # 只在 DEBUG 级别记录请求头名称，避免序列化 Cookie 值，也跳过整个日志处理链
+                if logger.is_enabled_for(logging.DEBUG):
+                    logger.debug("Received headers for keyword query", headers_keys=list(headers.keys()))
 
                 # 验证PSM列表不能为空
                 if not psm_list or not psm_list.strip():
                     return "❌ PSM服务列表不能为空，请提供至少一个PSM服务名称"
 
+                # 没有任何请求头时不可能带有 Cookie，直接返回
+                if not headers:
+                    return "❌ 缺少Cookie认证信息，请在请求头中提供Cookie"
+
                 # 解析PSM列表
-                psm_services = [psm.strip() for psm in psm_list.split(",") if psm.strip()]
+                psm_services = [s for s in _CSV_SPLIT(psm_list.strip()) if s]
                 if not psm_services:
                     return "❌ PSM服务列表解析失败，请检查PSM服务名称格式"
 
                 # 解析关键词列表
                 include_keywords = None
                 if keyword_filter_include:
-                    include_keywords = [kw.strip() for kw in keyword_filter_include.split(",") if kw.strip()]
+                    include_keywords = [s for s in _CSV_SPLIT(keyword_filter_include.strip()) if s]
 
                 exclude_keywords = None
                 if keyword_filter_exclude:
-                    exclude_keywords = [kw.strip() for kw in keyword_filter_exclude.split(",") if kw.strip()]
+                    exclude_keywords = [s for s in _CSV_SPLIT(keyword_filter_exclude.strip()) if s]
 
-                # 限制limit范围
-                limit = max(1, min(limit, 1000))
+                # 限制limit范围（未提供时使用默认值100，超出范围时截断到1~1000）
+                limit = 100 if limit is None else (1 if limit < 1 else 1000 if limit > 1000 else limit)
 
                 logger.info("Querying logs by keyword", region=region, psm_list=psm_services,
                            start_time=start_time, end_time=end_time,
                            include_keywords=include_keywords, exclude_keywords=exclude_keywords, limit=limit)
 
                 # 从headers动态获取cookie
-                cookie_value = headers.get(f"cas_session_{region.lower()}") or headers.get("cookie") or headers.get("Cookie")
+                cookie_value = _lookup_cookie(headers, region if region in _REGION_COOKIE_KEYS else region.lower())
                 if not cookie_value:
                     return "❌ 缺少Cookie认证信息，请在请求头中提供Cookie"
 
-                # 动态创建认证管理器
-                jwt_manager = JWTAuthManager(cookie_value=cookie_value, region=region)
+                # 获取（或复用）认证管理器
+                jwt_manager = await _get_jwt_manager(cookie_value, region, client=self._http)
 
                 # 创建关键词日志查询实例
-                log_query = LogQueryByKeyword({region: jwt_manager})
-
-                # 执行关键词查询
-                result = await log_query.get_log_details_by_keyword(
-                    region=region,
-                    psm_list=psm_services,
-                    start_time=start_time,
-                    end_time=end_time,
-                    keyword_filter_include=include_keywords,
-                    keyword_filter_exclude=exclude_keywords,
-                    limit=limit
+                log_query = LogQueryByKeyword.for_region(region, jwt_manager, client=self._http)
+
+                # 限制同时进行的上游查询数量，避免突发流量耗尽连接池
+                async with self._query_semaphore:
+                    # 执行关键词查询
+                    result = await log_query.get_log_details_by_keyword(
+                        region=region,
+                        psm_list=psm_services,
+                        start_time=start_time,
+                        end_time=end_time,
+                        keyword_filter_include=include_keywords,
+                        keyword_filter_exclude=exclude_keywords,
+                        limit=limit
+                    )
+
+                # 格式化响应结果（在工作线程中执行，避免大结果的字符串拼接阻塞事件循环）
+                formatted_response = await asyncio.get_running_loop().run_in_executor(
+                    None, log_query.format_log_response_by_keyword, result
                 )
 
-                # 格式化响应结果
-                formatted_response = log_query.format_log_response_by_keyword(result)
-
-                # 清理资源
-                await jwt_manager.close()
-
                 return formatted_response
 
             except Exception as e:
-                logger.error("Error querying logs by keyword", region=region, error=str(e))
-                return f"❌ 关键词查询日志时出错: {str(e)}"
+                # 错误消息只构建一次，日志和返回值共用同一个字符串
+                error_message = _ERR_KEYWORD({"err": e})
+                logger.error("Error querying logs by keyword", region=region, error=error_message)
+                return error_message
 
     async def start(self):
         """
@@ -282,10 +535,18 @@ class ByteDanceLogQueryMCPServer:
         """
         停止 MCP 服务器并清理资源
 
-        资源清理现在由每个请求单独处理，这里只需要简单记录日志。
+        关闭所有缓存的 JWT 认证管理器以及共享的 HTTP 客户端。
         """
         logger.info("Stopping ByteDance MCP Server")
 
+        async with _get_jwt_cache_lock():
+            managers = [manager for manager, _ in _jwt_cache.values()]
+            _jwt_cache.clear()
+        for manager in managers:
+            await manager.close()
+
+        await self._http.aclose()
+
     @property
     def app(self):
         """
@@ -0,0 +1,136 @@
+"""
+JWT 认证管理器测试
+
+验证进程级令牌缓存和过期时间解析
+"""
+
+import base64
+import json
+import time
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, Mock
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import auth
+from auth import JWTAuthManager
+
+
+def make_jwt(claims):
+    """构造一个未签名的测试 JWT"""
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=").decode()
+    return f"eyJhbGciOiJIUzI1NiJ9.{payload}.signature"
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    """每个测试前后清空进程级令牌缓存"""
+    auth._TOKEN_CACHE.clear()
+    yield
+    auth._TOKEN_CACHE.clear()
+
+
+@pytest.fixture
+def mock_client():
+    """返回固定 JWT 令牌的模拟 HTTP 客户端"""
+    response = Mock()
+    response.headers = {"x-jwt-token": make_jwt({"exp": time.time() + 1800})}
+    response.raise_for_status = Mock()
+    client = Mock()
+    client.get = AsyncMock(return_value=response)
+    return client
+
+
+class TestTokenCache:
+    """进程级令牌缓存测试"""
+
+    @pytest.mark.asyncio
+    async def test_new_manager_reuses_cached_token(self, mock_client):
+        """相同 Cookie 的新管理器复用已获取的令牌"""
+        first = JWTAuthManager(cookie_value="test-cookie", region="us", client=mock_client)
+        second = JWTAuthManager(cookie_value="test-cookie", region="us", client=mock_client)
+
+        token = await first.get_jwt_token()
+
+        assert await second.get_jwt_token() == token
+        assert mock_client.get.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_different_region_fetches_new_token(self, mock_client):
+        """不同区域不会共享令牌"""
+        await JWTAuthManager(cookie_value="test-cookie", region="us", client=mock_client).get_jwt_token()
+        await JWTAuthManager(cookie_value="test-cookie", region="i18n", client=mock_client).get_jwt_token()
+
+        assert mock_client.get.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_force_refresh_bypasses_cache(self, mock_client):
+        """强制刷新时忽略缓存"""
+        manager = JWTAuthManager(cookie_value="test-cookie", region="us", client=mock_client)
+
+        await manager.get_jwt_token()
+        await manager.get_jwt_token(force_refresh=True)
+
+        assert mock_client.get.await_count == 2
+
+
+class TestDecodeExpiry:
+    """过期时间解析测试"""
+
+    def test_uses_exp_claim(self):
+        """使用令牌中的 exp 声明"""
+        exp = time.time() + 600
+
+        assert JWTAuthManager._decode_expiry(make_jwt({"exp": exp})) == pytest.approx(exp)
+
+    def test_caps_expiry_at_one_hour(self):
+        """exp 超过 1 小时时按 1 小时处理"""
+        expiry = JWTAuthManager._decode_expiry(make_jwt({"exp": time.time() + 86400}))
+
+        assert expiry <= time.time() + 3600
+
+    def test_opaque_token_defaults_to_one_hour(self):
+        """无法解析的令牌按 1 小时有效期处理"""
+        expiry = JWTAuthManager._decode_expiry("opaque-token")
+
+        assert time.time() + 3500 < expiry <= time.time() + 3600
+
+
+class TestAsyncContextManager:
+    """异步上下文管理测试"""
+
+    @pytest.mark.asyncio
+    async def test_private_client_closed_on_error(self):
+        """发生异常时也会关闭私有 HTTP 客户端"""
+        with pytest.raises(RuntimeError):
+            async with JWTAuthManager(cookie_value="test-cookie", region="us") as manager:
+                raise RuntimeError("查询失败")
+
+        assert manager.client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_shared_client_left_open(self, mock_client):
+        """共享 HTTP 客户端不会被关闭"""
+        mock_client.aclose = AsyncMock()
+
+        async with JWTAuthManager(cookie_value="test-cookie", region="us", client=mock_client):
+            pass
+
+        mock_client.aclose.assert_not_called()
+
+
+class TestSingleRegionManager:
+    """单区域 JWT 管理器映射测试"""
+
+    def test_behaves_like_single_entry_dict(self):
+        """提供与单键字典一致的 get/values/items 行为"""
+        manager = JWTAuthManager(cookie_value="test-cookie", region="us", client=Mock())
+        managers = auth.SingleRegionManager("us", manager)
+
+        assert managers.get("us") is manager
+        assert managers.get("i18n") is None
+        assert list(managers.values()) == [manager]
+        assert dict(managers.items()) == {"us": manager}
@@ -0,0 +1,64 @@
+"""
+logid 日志查询测试
+
+验证多区域并发查询的结果选择逻辑
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, Mock
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from log_query_by_id import LogQueryByID
+
+LOGID = "02176355661407900000000000000000000ffff0a71b1e8a4db84"
+
+
+@pytest.fixture
+def log_query(mock_jwt_manager):
+    """使用模拟客户端的 logid 日志查询实例"""
+    return LogQueryByID({"us": mock_jwt_manager, "i18n": mock_jwt_manager}, client=Mock())
+
+
+def make_details(region: str, total_items: int):
+    """构造 get_log_details 的返回值"""
+    return {"logid": LOGID, "region": region, "messages": [{}] * total_items, "total_items": total_items}
+
+
+class TestMultiRegionQuery:
+    """多区域并发查询测试"""
+
+    @pytest.mark.asyncio
+    async def test_prefers_region_with_messages(self, log_query):
+        """优先返回找到日志消息的区域"""
+        log_query.get_log_details = AsyncMock(side_effect=lambda logid, region, *args: make_details(region, 2 if region == "i18n" else 0))
+
+        result = await log_query.get_log_details_multi_region(LOGID, ["us", "i18n"])
+
+        assert result["region"] == "i18n"
+        assert log_query.get_log_details.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_region_is_skipped(self, log_query):
+        """单个区域失败时返回其他区域的结果"""
+        async def details(logid, region, *args):
+            if region == "us":
+                raise RuntimeError("查询日志超时")
+            return make_details(region, 0)
+
+        log_query.get_log_details = AsyncMock(side_effect=details)
+
+        result = await log_query.get_log_details_multi_region(LOGID, ["us", "i18n"])
+
+        assert result["region"] == "i18n"
+
+    @pytest.mark.asyncio
+    async def test_all_regions_failed_raises(self, log_query):
+        """所有区域都失败时抛出异常"""
+        log_query.get_log_details = AsyncMock(side_effect=RuntimeError("查询日志超时"))
+
+        with pytest.raises(RuntimeError):
+            await log_query.get_log_details_multi_region(LOGID, ["us", "i18n"])
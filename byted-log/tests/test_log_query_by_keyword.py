@@ -0,0 +1,133 @@
+"""
+关键词日志查询测试
+
+验证相同查询的单飞合并和短期结果缓存
+"""
+
+import asyncio
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, Mock
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import log_query_by_keyword
+from log_query_by_keyword import LogQueryByKeyword
+
+
+@pytest.fixture(autouse=True)
+def clear_query_caches():
+    """每个测试前后清空在途查询表和结果缓存"""
+    log_query_by_keyword._INFLIGHT.clear()
+    log_query_by_keyword._RESULT_CACHE.clear()
+    yield
+    log_query_by_keyword._INFLIGHT.clear()
+    log_query_by_keyword._RESULT_CACHE.clear()
+
+
+@pytest.fixture
+def mock_client():
+    """模拟的共享 HTTP 客户端，请求会短暂挂起以便并发调用重叠"""
+    response = Mock()
+    response.status_code = 200
+    response.json = Mock(return_value={"data": {"content": []}})
+    response.raise_for_status = Mock()
+
+    async def post(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return response
+
+    client = Mock()
+    client.post = AsyncMock(side_effect=post)
+    return client
+
+
+@pytest.fixture
+def log_query(mock_jwt_manager, mock_client):
+    """使用模拟客户端的关键词日志查询实例"""
+    return LogQueryByKeyword({"us": mock_jwt_manager}, client=mock_client)
+
+
+class TestKeywordQueryCoalescing:
+    """相同关键词查询合并测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_queries_share_one_request(self, log_query, mock_client):
+        """并发的相同查询只向日志服务发送一次请求"""
+        results = await asyncio.gather(*[
+            log_query.query_single_region_by_keyword("us", ["ttec.script.live_promotion_change"], 100, 200)
+            for _ in range(5)
+        ])
+
+        assert mock_client.post.await_count == 1
+        assert all(result is results[0] for result in results)
+
+    @pytest.mark.asyncio
+    async def test_recent_result_is_served_from_cache(self, log_query, mock_client):
+        """短时间内重复的相同查询命中结果缓存"""
+        first = await log_query.query_single_region_by_keyword("us", ["ttec.script.live_promotion_change"], 100, 200)
+        second = await log_query.query_single_region_by_keyword("us", ["ttec.script.live_promotion_change"], 100, 200)
+
+        assert mock_client.post.await_count == 1
+        assert second is first
+
+    @pytest.mark.asyncio
+    async def test_different_queries_are_not_merged(self, log_query, mock_client):
+        """不同的查询条件分别请求"""
+        await asyncio.gather(
+            log_query.query_single_region_by_keyword("us", ["ttec.script.live_promotion_change"], 100, 200),
+            log_query.query_single_region_by_keyword("us", ["ttec.service.api"], 100, 200),
+        )
+
+        assert mock_client.post.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_shared_client_is_not_closed(self, log_query, mock_client):
+        """关闭查询实例时不会关闭外部传入的客户端"""
+        mock_client.aclose = AsyncMock()
+
+        await log_query.close()
+
+        mock_client.aclose.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_different_credentials_are_not_merged(self, mock_client):
+        """不同凭证的相同查询不共享在途请求和结果缓存"""
+        managers = []
+        for cookie in ("cookie-a", "cookie-b"):
+            manager = Mock()
+            manager.cookie_value = cookie
+            manager.get_jwt_token = AsyncMock(return_value=f"jwt-{cookie}")
+            managers.append(manager)
+
+        queries = [LogQueryByKeyword({"us": manager}, client=mock_client) for manager in managers]
+        await asyncio.gather(*[
+            query.query_single_region_by_keyword("us", ["ttec.script.live_promotion_change"], 100, 200)
+            for query in queries
+        ])
+        await queries[1].query_single_region_by_keyword("us", ["ttec.script.live_promotion_change"], 100, 200)
+
+        assert mock_client.post.await_count == 2
+        for manager in managers:
+            manager.get_jwt_token.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_follower_survives_leader_cancellation(self, log_query, mock_client):
+        """发起方被取消时，等待中的相同查询重新发起请求而不是一起被取消"""
+        leader = asyncio.ensure_future(
+            log_query.query_single_region_by_keyword("us", ["ttec.script.live_promotion_change"], 100, 200)
+        )
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(
+            log_query.query_single_region_by_keyword("us", ["ttec.script.live_promotion_change"], 100, 200)
+        )
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        result = await follower
+
+        assert leader.cancelled()
+        assert result["region"] == "us"
+        assert mock_client.post.await_count == 2
@@ -0,0 +1,198 @@
+"""
+MCP 服务器资源复用测试
+
+验证 JWT 认证管理器缓存和共享 HTTP 客户端的行为
+"""
+
+import asyncio
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, Mock, patch
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import mcp_server
+from mcp_server import ByteDanceLogQueryMCPServer, _get_jwt_cache_lock, _get_jwt_manager, _get_request_headers, _lookup_cookie
+
+
+@pytest.fixture(autouse=True)
+def clear_jwt_cache():
+    """每个测试前后清空 JWT 管理器缓存"""
+    mcp_server._jwt_cache.clear()
+    yield
+    mcp_server._jwt_cache.clear()
+
+
+class TestJWTManagerCache:
+    """JWT 认证管理器缓存测试"""
+
+    @pytest.mark.asyncio
+    async def test_same_cookie_reuses_manager(self):
+        """相同区域和 Cookie 复用同一个管理器"""
+        first = await _get_jwt_manager("test-cookie", "us")
+        second = await _get_jwt_manager("test-cookie", "us")
+
+        assert first is second
+        await first.close()
+
+    @pytest.mark.asyncio
+    async def test_different_region_creates_new_manager(self):
+        """不同区域使用不同的管理器"""
+        us_manager = await _get_jwt_manager("test-cookie", "us")
+        i18n_manager = await _get_jwt_manager("test-cookie", "i18n")
+
+        assert us_manager is not i18n_manager
+        assert i18n_manager.region == "i18n"
+        await us_manager.close()
+        await i18n_manager.close()
+
+    @pytest.mark.asyncio
+    async def test_expired_manager_is_replaced(self):
+        """过期的管理器会被替换"""
+        first = await _get_jwt_manager("test-cookie", "us")
+        key = next(iter(mcp_server._jwt_cache))
+        mcp_server._jwt_cache[key] = (first, 0.0)
+
+        second = await _get_jwt_manager("test-cookie", "us")
+
+        assert second is not first
+        await second.close()
+
+    def test_cache_lock_created_per_event_loop(self):
+        """缓存锁在运行中的事件循环内创建，同一事件循环复用，换事件循环后重新创建"""
+        async def get_locks():
+            return _get_jwt_cache_lock(), _get_jwt_cache_lock()
+
+        first, same = asyncio.run(get_locks())
+        second, _ = asyncio.run(get_locks())
+
+        assert first is same
+        assert second is not first
+
+
+class TestSharedHTTPClient:
+    """共享 HTTP 客户端测试"""
+
+    @pytest.mark.asyncio
+    async def test_manager_does_not_close_shared_client(self):
+        """管理器关闭时不会关闭共享客户端"""
+        server = ByteDanceLogQueryMCPServer()
+        manager = await _get_jwt_manager("test-cookie", "us", client=server._http)
+
+        assert manager.client is server._http
+        await manager.close()
+        assert not server._http.is_closed
+
+        await server.stop()
+        assert server._http.is_closed
+        assert not mcp_server._jwt_cache
+
+
+class TestCookieLookup:
+    """请求头 Cookie 查找测试"""
+
+    def test_region_specific_cookie_takes_priority(self):
+        """区域特定 Cookie 优先于通用 Cookie"""
+        headers = {"cookie": "default-cookie", "cas_session_us": "us-cookie"}
+
+        assert _lookup_cookie(headers, "us") == "us-cookie"
+
+    def test_falls_back_to_generic_cookie(self):
+        """没有区域特定 Cookie 时回退到通用 Cookie"""
+        headers = {"cookie": "default-cookie", "cas_session_us": "us-cookie"}
+
+        assert _lookup_cookie(headers, "i18n") == "default-cookie"
+
+    def test_missing_cookie_returns_none(self):
+        """没有任何 Cookie 时返回 None"""
+        assert _lookup_cookie({}, "us") is None
+        assert _lookup_cookie({"cas_session_us": ""}, "us") is None
+
+
+class TestRequestHeaders:
+    """请求头读取测试"""
+
+    def test_headers_parsed_once_per_request(self):
+        """同一请求内只解析一次请求头，并统一转为小写键"""
+        request = Mock()
+        get_headers = Mock(return_value={"Cookie": "test-cookie"})
+        with patch("fastmcp.server.dependencies.get_http_request", return_value=request), \
+                patch("fastmcp.server.dependencies.get_http_headers", get_headers):
+            first = _get_request_headers()
+            second = _get_request_headers()
+
+        assert first == {"cookie": "test-cookie"}
+        assert second is first
+        get_headers.assert_called_once()
+
+    def test_new_request_is_parsed_again(self):
+        """新的请求会重新解析请求头"""
+        get_headers = Mock(side_effect=[{"cookie": "first"}, {"cookie": "second"}])
+        with patch("fastmcp.server.dependencies.get_http_headers", get_headers):
+            with patch("fastmcp.server.dependencies.get_http_request", return_value=Mock()):
+                assert _get_request_headers() == {"cookie": "first"}
+            with patch("fastmcp.server.dependencies.get_http_request", return_value=Mock()):
+                assert _get_request_headers() == {"cookie": "second"}
+
+    def test_no_active_request_returns_empty(self):
+        """没有活动的 HTTP 请求时返回空字典"""
+        with patch("fastmcp.server.dependencies.get_http_request", side_effect=RuntimeError):
+            assert _get_request_headers() == {}
+
+
+class TestToolRegistration:
+    """工具注册测试"""
+
+    @pytest.mark.asyncio
+    async def test_tool_schema_not_rebuilt_per_call(self):
+        """工具参数模型在注册时生成，调用时不再重新解析函数签名和文档"""
+        server = ByteDanceLogQueryMCPServer()
+        tool = server.mcp._tool_manager.get_tool("query_logs_by_logid")
+        assert "logid" in tool.parameters["properties"]
+
+        with patch("mcp.server.fastmcp.tools.base.func_metadata") as func_metadata:
+            await server.mcp.call_tool("query_logs_by_logid", {"logid": "test-logid", "region": "us"})
+            await server.mcp.call_tool("query_logs_by_logid", {"logid": "test-logid", "region": "us"})
+
+        func_metadata.assert_not_called()
+        await server.stop()
+
+
+class TestRegionSelection:
+    """多区域查询的 Cookie 选择测试"""
+
+    @pytest.mark.asyncio
+    async def test_auto_skips_regions_without_cookie(self):
+        """auto 只查询带有 Cookie 的区域"""
+        server = ByteDanceLogQueryMCPServer()
+        get_log_details = AsyncMock(return_value={"status": "success"})
+        with patch("mcp_server._get_request_headers", return_value={"cas_session_us": "us-cookie"}), \
+                patch("log_query_by_id.LogQueryByID.get_log_details", get_log_details), \
+                patch("log_query_by_id.LogQueryByID.format_log_response", return_value="ok"):
+            result = await server.mcp.call_tool("query_logs_by_logid", {"logid": "test-logid", "region": "auto"})
+
+        assert "ok" in str(result)
+        assert get_log_details.await_args.kwargs["region"] == "us"
+        await server.stop()
+
+    @pytest.mark.asyncio
+    async def test_explicit_region_without_cookie_fails(self):
+        """显式指定的区域缺少 Cookie 时返回错误"""
+        server = ByteDanceLogQueryMCPServer()
+        with patch("mcp_server._get_request_headers", return_value={"cas_session_us": "us-cookie"}):
+            result = await server.mcp.call_tool("query_logs_by_logid", {"logid": "test-logid", "region": "us,i18n"})
+
+        assert "缺少 Cookie" in str(result)
+        await server.stop()
+
+    @pytest.mark.asyncio
+    async def test_auto_without_any_cookie_fails(self):
+        """auto 下所有区域都没有 Cookie 时返回错误"""
+        server = ByteDanceLogQueryMCPServer()
+        with patch("mcp_server._get_request_headers", return_value={"user-agent": "test"}):
+            result = await server.mcp.call_tool("query_logs_by_logid", {"logid": "test-logid", "region": "auto"})
+
+        assert "缺少 Cookie" in str(result)
+        await server.stop()
@@ -4,6 +4,7 @@
 用于运行所有单元测试
 """
 
+import importlib.util
 import sys
 import pytest
 
@@ -12,12 +13,17 @@ def run_tests():
     """运行所有测试"""
     print("开始运行image2text MCP服务器测试...")
 
-    # 运行测试
-    exit_code = pytest.main([
+    args = [
         "tests/",
         "-v",  # 详细输出
         "--tb=short",  # 简短的错误回溯
-    ])
+    ]
+    # 安装了 pytest-xdist 时按CPU核数多进程并行执行
+    if importlib.util.find_spec("xdist") is not None:
+        args += ["-n", "auto"]
+
+    # 运行测试
+    exit_code = pytest.main(args)
 
     return exit_code
 
@@ -3,16 +3,224 @@ API客户端模块
 封装OpenAI兼容API调用
 """
 
+import asyncio
+import gzip
+import hashlib
+import importlib.util
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
 import httpx
 import base64
-from typing import Dict, Any, Optional
+import orjson
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set, Tuple
 from config import config
 
 
+logger = logging.getLogger(__name__)
+
+# 单次批量请求允许携带的最大图片数量
+MAX_BATCH_IMAGES = 16
+
+# 可重试的HTTP状态码（限流和上游临时故障）
+_RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# 重试等待时间上限（秒）
+_MAX_RETRY_DELAY = 30.0
+
+# 识别结果缓存：请求键 -> (过期时间, 模型返回的文本)，有效期由 RESPONSE_CACHE_TTL 控制
+_RESPONSE_CACHE: Dict[bytes, Tuple[float, str]] = {}
+_RESPONSE_CACHE_MAXSIZE = 1024  # 结果缓存最大条目数
+
+# 所有API请求共用的请求头模板，创建客户端时只需补充认证头
+_BASE_HEADERS = {
+    "Content-Type": "application/json",
+    "User-Agent": "image2text-mcp/1.0"
+}
+
+# gzip压缩请求体时附加的请求头
+_GZIP_HEADERS = {"Content-Encoding": "gzip"}
+
+# 不接受gzip请求体的API地址（曾返回415），之后对这些地址发送未压缩的请求
+_GZIP_UNSUPPORTED: set = set()
+
+
+# 共享客户端（及其图片处理器）的缓存上限，限制同时保持的连接池数量
+MAX_CACHED_CLIENTS = min(32, (os.cpu_count() or 1) * 4)
+
+# 共享HTTP客户端缓存，按 (base_url, api_key) 复用连接池
+# 避免每次工具调用都重新建立TCP+TLS连接；超出上限时淘汰最久未使用的客户端
+_CLIENT_CACHE: "OrderedDict[Tuple[str, str], httpx.AsyncClient]" = OrderedDict()
+
+# 已被淘汰、等待关闭的共享客户端，以及正在关闭它们的后台任务（保持引用避免任务被回收）
+_RETIRED_CLIENTS: Set[httpx.AsyncClient] = set()
+_CLOSING_TASKS: Set[asyncio.Task] = set()
+
+
+def _http2_enabled() -> bool:
+    """
+    判断共享HTTP客户端是否启用HTTP/2
+
+    Returns:
+        配置开启且已安装h2时返回True，否则回退到HTTP/1.1
+    """
+    if not config.HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("未安装 h2，API客户端回退到 HTTP/1.1")
+        return False
+    return True
+
+
+def _get_shared_client(base_url: str, api_key: str) -> httpx.AsyncClient:
+    """
+    获取（必要时创建）共享的HTTP客户端
+
+    Args:
+        base_url: API基础地址
+        api_key: API密钥
+
+    Returns:
+        该地址和密钥对应的共享客户端
+    """
+    key = (base_url, api_key)
+    client = _CLIENT_CACHE.get(key)
+    if client is not None and not client.is_closed:
+        _CLIENT_CACHE.move_to_end(key)
+    else:
+        # 传输层负责连接失败的重试，HTTP状态码层面的重试由 APIClient 处理
+        transport = httpx.AsyncHTTPTransport(
+            http2=_http2_enabled(),  # HTTP/2 多路复用：并发请求共享同一条 TCP+TLS 连接
+            limits=httpx.Limits(
+                max_keepalive_connections=32,
+                max_connections=100,
+                keepalive_expiry=300
+            ),
+            retries=2
+        )
+        client = httpx.AsyncClient(
+            timeout=config.REQUEST_TIMEOUT,
+            transport=transport,
+            headers={**_BASE_HEADERS, "Authorization": f"Bearer {api_key}"}
+        )
+        _CLIENT_CACHE[key] = client
+        _CLIENT_CACHE.move_to_end(key)
+        while len(_CLIENT_CACHE) > MAX_CACHED_CLIENTS:
+            _retire_client(_CLIENT_CACHE.popitem(last=False)[1])
+    return client
+
+
+def _retire_client(client: httpx.AsyncClient) -> None:
+    """
+    延迟关闭被淘汰的共享客户端
+
+    淘汰时可能仍有在途请求在使用该客户端。每次请求都受 REQUEST_TIMEOUT 限制，
+    因此等待一个超时时间后再关闭；没有运行中的事件循环时留给 close_shared_clients 关闭
+
+    Args:
+        client: 被淘汰的客户端
+    """
+    _RETIRED_CLIENTS.add(client)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    loop.call_later(config.REQUEST_TIMEOUT, _close_retired_client, client)
+
+
+def _close_retired_client(client: httpx.AsyncClient) -> None:
+    """
+    在后台关闭被淘汰的客户端（已由 close_shared_clients 关闭的跳过）
+
+    Args:
+        client: 被淘汰的客户端
+    """
+    if client not in _RETIRED_CLIENTS:
+        return
+    _RETIRED_CLIENTS.discard(client)
+    task = asyncio.ensure_future(client.aclose())
+    _CLOSING_TASKS.add(task)
+    task.add_done_callback(_CLOSING_TASKS.discard)
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """
+    计算下一次重试前的等待时间
+
+    优先遵循响应中的 Retry-After（秒数或HTTP日期），否则使用带抖动的指数退避
+
+    Args:
+        response: 触发重试的响应
+        attempt: 已重试次数（从0开始）
+
+    Returns:
+        等待秒数
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0.0), _MAX_RETRY_DELAY)
+    return min(2 ** attempt + random.random(), _MAX_RETRY_DELAY)
+
+
+def clear_response_cache() -> int:
+    """
+    清空识别结果缓存
+
+    Returns:
+        被清除的缓存条目数
+    """
+    count = len(_RESPONSE_CACHE)
+    _RESPONSE_CACHE.clear()
+    return count
+
+
+def _store_response(request_key: bytes, result: str):
+    """
+    写入识别结果缓存，清理过期条目并在超出容量时淘汰最早写入的条目
+
+    Args:
+        request_key: 请求键
+        result: 模型返回的文本
+    """
+    now = time.monotonic()
+    for key in [k for k, (expires_at, _) in _RESPONSE_CACHE.items() if expires_at <= now]:
+        del _RESPONSE_CACHE[key]
+    while len(_RESPONSE_CACHE) >= _RESPONSE_CACHE_MAXSIZE:
+        # 字典保持插入顺序，淘汰最早写入的条目
+        del _RESPONSE_CACHE[next(iter(_RESPONSE_CACHE))]
+    _RESPONSE_CACHE[request_key] = (now + config.RESPONSE_CACHE_TTL, result)
+
+
+async def close_shared_clients():
+    """关闭所有共享HTTP客户端，在服务器停止时调用"""
+    clients = [*_CLIENT_CACHE.values(), *_RETIRED_CLIENTS]
+    _CLIENT_CACHE.clear()
+    _RETIRED_CLIENTS.clear()
+    for client in clients:
+        await client.aclose()
+
+
 class APIClient:
     """OpenAI兼容API客户端"""
 
-    def __init__(self, base_url: str, api_key: str, model_id: str):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        model_id: str,
+        client: Optional[httpx.AsyncClient] = None
+    ):
         """
         初始化API客户端
 
@@ -20,58 +228,157 @@ class APIClient:
             base_url: API基础地址
             api_key: API密钥
             model_id: 模型ID
+            client: 可选的HTTP客户端；不传时使用按地址和密钥共享的客户端
         """
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.model_id = model_id
-        self.client = httpx.AsyncClient(
-            timeout=config.REQUEST_TIMEOUT,
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-                "User-Agent": "image2text-mcp/1.0"
-            }
-        )
+        # 密钥摘要参与结果缓存键，不同密钥的请求互不复用结果（缓存中不保存明文密钥）
+        self._api_key_digest = hashlib.blake2b(api_key.encode("utf-8"), digest_size=16).digest()
+        # APIClient 不拥有任何HTTP客户端：外部传入的由调用方自行关闭，共享客户端由 close_shared_clients 统一关闭
+        self._client = client
+        if client is None:
+            # 提前创建（或刷新）共享客户端，首次请求时不再建立连接池
+            _get_shared_client(self.base_url, api_key)
+        # 在途请求表：相同提示词和图片的并发调用共享同一个 Future（单飞合并）
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        当前使用的HTTP客户端
+
+        共享客户端每次都从缓存中取，不长期持有，被淘汰的客户端只剩在途请求引用，可以安全地延迟关闭
+        """
+        if self._client is not None:
+            return self._client
+        return _get_shared_client(self.base_url, self.api_key)
 
     async def vision_completion(self, image_data: str, prompt: str = "描述这张图片的内容") -> str:
         """
         调用视觉模型API进行图片理解
 
+        近期相同的请求直接返回缓存结果，并发的相同请求共享同一次上游调用
+
         Args:
-            image_data: base64编码的图片数据
+            image_data: base64编码的图片数据或 data URL
             prompt: 提示词
 
         Returns:
             模型返回的文本内容
         """
-        payload = {
+        # 请求键包含密钥、地址和模型，不同凭证和后端的结果互不混用
+        request_key = hashlib.blake2b(
+            self._api_key_digest + f"{self.base_url}\0{self.model_id}\0{prompt}\0{image_data}".encode("utf-8"),
+            digest_size=16
+        ).digest()
+        while True:
+            cached = _RESPONSE_CACHE.get(request_key)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+            inflight = self._inflight.get(request_key)
+            if inflight is None:
+                break
+            # asyncio.wait 不会取消被等待的 Future，也不会把发起方的取消传给跟随方；
+            # 发起方被取消时重新检查缓存和在途表，必要时由本调用重新发起请求
+            await asyncio.wait({inflight})
+            if not inflight.cancelled():
+                return inflight.result()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[request_key] = future
+        try:
+            result = await self._post_completion(self._build_payload([image_data], prompt))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 标记异常已被读取，避免无人等待时输出 "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if config.RESPONSE_CACHE_TTL > 0:
+                _store_response(request_key, result)
+            return result
+        finally:
+            self._inflight.pop(request_key, None)
+
+    async def vision_completion_batch(self, image_data_list: List[str], prompt: str = "描述这些图片的内容") -> str:
+        """
+        在一次API调用中提交多张图片进行理解
+
+        Args:
+            image_data_list: base64编码的图片数据或 data URL 列表
+            prompt: 提示词
+
+        Returns:
+            模型返回的文本内容
+
+        Raises:
+            ValueError: 图片列表为空或超过单次批量上限
+        """
+        if not image_data_list:
+            raise ValueError("图片列表不能为空")
+        if len(image_data_list) > MAX_BATCH_IMAGES:
+            raise ValueError(f"单次最多提交 {MAX_BATCH_IMAGES} 张图片: {len(image_data_list)}")
+
+        return await self._post_completion(self._build_payload(image_data_list, prompt))
+
+    def _build_payload(self, image_data_list: List[str], prompt: str) -> Dict[str, Any]:
+        """
+        构建 chat/completions 请求体
+
+        Args:
+            image_data_list: base64编码的图片数据或 data URL 列表
+            prompt: 提示词
+
+        Returns:
+            请求体字典
+        """
+        content: List[Dict[str, Any]] = [{"type": "text", "text": prompt}]
+        for image_data in image_data_list:
+            # 调用方已提供 data URL 时直接透传，避免再次拼接整段图片数据
+            if image_data.startswith("data:"):
+                url = image_data
+            else:
+                url = f"data:image/jpeg;base64,{image_data}"
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": url
+                }
+            })
+
+        return {
             "model": self.model_id,
             "messages": [
                 {
                     "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_data}"
-                            }
-                        }
-                    ]
+                    "content": content
                 }
             ],
             "max_tokens": 500,
             "temperature": 0.7
         }
 
+    async def _post_completion(self, payload: Dict[str, Any]) -> str:
+        """
+        发送 chat/completions 请求并解析返回的文本
+
+        Args:
+            payload: 请求体
+
+        Returns:
+            模型返回的文本内容
+        """
         try:
-            response = await self.client.post(
-                f"{self.base_url}/chat/completions",
-                json=payload
-            )
-            response.raise_for_status()
+            # 请求体包含整张图片的base64，使用 orjson 序列化明显快于标准库 json
+            response = await self._send_with_retry(orjson.dumps(payload))
 
-            result = response.json()
+            result = orjson.loads(response.content)
             if "choices" in result and len(result["choices"]) > 0:
                 return result["choices"][0]["message"]["content"]
             else:
@@ -83,18 +390,77 @@ class APIClient:
             elif e.response.status_code == 429:
                 raise Exception("API调用频率超限，请稍后重试")
             elif e.response.status_code == 400:
-                error_msg = e.response.json().get("error", {}).get("message", "请求参数错误")
+                error_msg = orjson.loads(e.response.content).get("error", {}).get("message", "请求参数错误")
                 raise Exception(f"API请求错误: {error_msg}")
             else:
                 raise Exception(f"API调用失败: HTTP {e.response.status_code}")
         except httpx.RequestError as e:
             raise Exception(f"网络请求失败: {str(e)}")
+        except asyncio.TimeoutError:
+            raise Exception(f"API请求超时（超过 {config.REQUEST_TIMEOUT} 秒）")
         except Exception as e:
             raise Exception(f"处理失败: {str(e)}")
 
+    async def _send_with_retry(self, body: bytes) -> httpx.Response:
+        """
+        发送请求，遇到限流或上游临时故障时按退避策略重试
+
+        开启 COMPRESS_REQUESTS 时请求体使用gzip压缩
+
+        Args:
+            body: 已序列化的请求体
+
+        Returns:
+            状态码正常的响应
+
+        Raises:
+            httpx.HTTPStatusError: 不可重试的状态码或重试次数用尽
+            asyncio.TimeoutError: 单次请求超过整体超时时间
+        """
+        attempt = 0
+        compressed_body = None
+        while True:
+            compress = config.COMPRESS_REQUESTS and self.base_url not in _GZIP_UNSUPPORTED
+            if compress and compressed_body is None:
+                # 大请求体压缩较耗CPU，放到线程中执行避免阻塞事件循环
+                compressed_body = await asyncio.get_running_loop().run_in_executor(
+                    None, gzip.compress, body, 3
+                )
+
+            # 整体超时兜底，避免上游挂起时长期占用工具调用
+            if compress:
+                request = self.client.post(
+                    f"{self.base_url}/chat/completions",
+                    content=compressed_body,
+                    headers=_GZIP_HEADERS
+                )
+            else:
+                request = self.client.post(f"{self.base_url}/chat/completions", content=body)
+            response = await asyncio.wait_for(request, timeout=config.REQUEST_TIMEOUT)
+            try:
+                response.raise_for_status()
+                return response
+            except httpx.HTTPStatusError as e:
+                if compress and e.response.status_code == 415:
+                    # 上游不支持压缩的请求体，记住该地址并立即改发未压缩请求
+                    logger.warning(f"API不支持gzip请求体，改用未压缩请求: {self.base_url}")
+                    _GZIP_UNSUPPORTED.add(self.base_url)
+                    continue
+                if e.response.status_code not in _RETRYABLE_STATUS_CODES or attempt >= config.MAX_RETRIES:
+                    raise
+                delay = _retry_delay(e.response, attempt)
+
+            attempt += 1
+            logger.warning(f"API返回 HTTP {response.status_code}，{delay:.1f} 秒后进行第 {attempt} 次重试")
+            await asyncio.sleep(delay)
+
     async def close(self):
-        """关闭HTTP客户端连接"""
-        await self.client.aclose()
+        """
+        释放API客户端
+
+        不关闭任何HTTP客户端：外部传入的客户端由调用方自行关闭，
+        共享客户端由 close_shared_clients 统一关闭；保留该方法以支持 async with 用法
+        """
 
     async def __aenter__(self):
         """异步上下文管理器入口"""
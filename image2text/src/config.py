@@ -4,6 +4,7 @@
 """
 
 import os
+from functools import lru_cache
 from typing import Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field, ConfigDict
@@ -55,6 +56,18 @@ class Config(BaseSettings):
         default=3,
         description="最大重试次数"
     )
+    RESPONSE_CACHE_TTL: int = Field(
+        default=600,
+        description="相同图片和提示词的识别结果缓存时间（秒），0表示不缓存"
+    )
+    COMPRESS_REQUESTS: bool = Field(
+        default=False,
+        description="是否对API请求体进行gzip压缩（上游返回415时自动对该地址关闭）"
+    )
+    HTTP2: bool = Field(
+        default=True,
+        description="API客户端是否启用HTTP/2（未安装h2时自动回退到HTTP/1.1）"
+    )
 
     model_config = ConfigDict(
         env_file = ".env",
@@ -62,6 +75,19 @@ class Config(BaseSettings):
         env_prefix = "IMAGE2TEXT_"  # 环境变量前缀
     )
 
+    @classmethod
+    @lru_cache(maxsize=1)
+    def from_env(cls) -> "Config":
+        """
+        从环境变量和 .env 文件读取配置，结果在进程内缓存
+
+        环境变量变化后需先调用 Config.from_env.cache_clear() 再重新读取
+
+        Returns:
+            配置实例
+        """
+        return cls()
+
 
 # 全局配置实例
-config = Config()
\ No newline at end of file
+config = Config.from_env()
\ No newline at end of file
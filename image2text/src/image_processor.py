@@ -3,16 +3,161 @@
 负责图片验证、格式转换和文本提取
 """
 
+import asyncio
 import base64
-import imghdr
+import binascii
 import os
 import re
+import sys
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 from api_client import APIClient
 from config import config
 
 
+# 默认提示词
+DEFAULT_PROMPT = "请详细描述这张图片的内容，包括文字和视觉元素"
+DEFAULT_BATCH_PROMPT = "请按顺序逐张详细描述这些图片的内容，包括文字和视觉元素"
+
+# base64字符集加最多两个结尾填充符，一次匹配同时校验字符和填充位置
+_BASE64_RE = re.compile(r'[A-Za-z0-9+/]*={0,2}', re.ASCII)
+
+# 图片文件头签名表：(魔数, 格式)
+_IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+)
+
+
+def _detect_image_type(header: bytes) -> Optional[str]:
+    """
+    通过文件头魔数识别图片格式，只需要图片的前32个字节
+
+    Args:
+        header: 图片数据开头的字节
+
+    Returns:
+        图片格式名（如 png、jpeg、webp），无法识别时返回None
+    """
+    # WEBP 的签名分布在偏移 0 和 8 两处
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    for magic, image_type in _IMAGE_SIGNATURES:
+        if header.startswith(magic):
+            return image_type
+    return None
+
+
+if sys.version_info >= (3, 11):
+    def _strict_b64decode(data: str) -> bytes:
+        """
+        严格模式解码base64，校验与解码在同一次C调用中完成
+
+        Args:
+            data: base64编码的数据
+
+        Returns:
+            解码后的字节
+
+        Raises:
+            binascii.Error: 含有非法字符或填充不正确
+        """
+        return binascii.a2b_base64(data, strict_mode=True)
+else:
+    def _strict_b64decode(data: str) -> bytes:
+        """
+        严格模式解码base64（Python 3.11 以下没有 strict_mode，退回 validate=True）
+
+        Args:
+            data: base64编码的数据
+
+        Returns:
+            解码后的字节
+
+        Raises:
+            binascii.Error: 含有非法字符或填充不正确
+        """
+        return base64.b64decode(data, validate=True)
+
+
+def _b64_decoded_size(data: str) -> int:
+    """
+    由base64字符串长度推算解码后的字节数，无需实际解码
+
+    Args:
+        data: base64编码的数据（不含 data: 前缀）
+
+    Returns:
+        解码后的字节数
+    """
+    n = len(data)
+    padding = data.count('=', max(0, n - 2))
+    return (n // 4) * 3 - padding
+
+
+# 分块读取文件的块大小，取3的倍数保证各块的base64编码可以直接拼接
+_READ_CHUNK_SIZE = 57 * 1024
+
+# 文件路径长度上限，超过该长度的输入只可能是base64数据
+_PATH_LENGTH_LIMIT = 1024
+
+# 图片文件 -> base64 编码结果的LRU缓存，键为 (路径, 修改时间, 文件大小)，文件变化后自动失效
+# 按编码后的字节数限制总量，避免大图片占满内存
+_FILE_CACHE: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_FILE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_file_cache_bytes = 0
+# 图片预处理在工作线程中执行，缓存的读写和字节计数都需要在锁内进行
+_FILE_CACHE_LOCK = threading.Lock()
+
+
+def _file_cache_get(key: Tuple[str, int, int]) -> Optional[str]:
+    """
+    读取文件编码缓存，命中时将条目移到最近使用的位置
+
+    Args:
+        key: (路径, 修改时间纳秒, 文件大小)
+
+    Returns:
+        缓存的base64数据，未命中时返回None
+    """
+    with _FILE_CACHE_LOCK:
+        image_data = _FILE_CACHE.get(key)
+        if image_data is not None:
+            _FILE_CACHE.move_to_end(key)
+        return image_data
+
+
+def _file_cache_put(key: Tuple[str, int, int], image_data: str):
+    """
+    写入文件编码缓存，超出字节预算时淘汰最久未使用的条目
+
+    Args:
+        key: (路径, 修改时间纳秒, 文件大小)
+        image_data: base64编码的图片数据
+    """
+    global _file_cache_bytes
+    if len(image_data) > _FILE_CACHE_MAX_BYTES:
+        return
+
+    with _FILE_CACHE_LOCK:
+        previous = _FILE_CACHE.pop(key, None)
+        if previous is not None:
+            _file_cache_bytes -= len(previous)
+
+        _FILE_CACHE[key] = image_data
+        _file_cache_bytes += len(image_data)
+        while _file_cache_bytes > _FILE_CACHE_MAX_BYTES:
+            _, evicted = _FILE_CACHE.popitem(last=False)
+            _file_cache_bytes -= len(evicted)
+
+
 class ImageProcessor:
     """图片处理器"""
 
@@ -49,9 +194,14 @@ class ImageProcessor:
         if not data or len(data) % 4 != 0:
             return False
 
-        # 检查是否只包含base64允许的字符
-        base64_pattern = re.compile(r'^[A-Za-z0-9+/]*={0,2}$')
-        return bool(base64_pattern.match(data))
+        # 短输入可能是文件路径，完整匹配；
+        # 长输入不可能是路径，只抽查首尾，整段数据由 _validate_image 严格解码校验
+        if len(data) <= _PATH_LENGTH_LIMIT:
+            return _BASE64_RE.fullmatch(data) is not None
+        return (
+            _BASE64_RE.fullmatch(data, 0, 16) is not None
+            and _BASE64_RE.fullmatch(data, len(data) - 4) is not None
+        )
 
     def _is_file_path(self, data: str) -> bool:
         """
@@ -64,22 +214,26 @@ class ImageProcessor:
             是否为文件路径
         """
         # 检查是否为文件路径（包含路径分隔符或文件扩展名）
-        if not data or len(data) > 1024:  # 限制路径长度
+        if not data or len(data) > _PATH_LENGTH_LIMIT:  # 限制路径长度
             return False
 
-        # 检查是否包含路径特征
-        has_path_separators = '/' in data or '\\' in data
-        has_file_extension = '.' in data and len(data.split('.')[-1]) <= 10
+        # 检查是否包含路径分隔符（绝对路径 /xxx 和相对路径 ./xxx、../xxx 都在此命中）
+        if '/' in data or '\\' in data:
+            return True
 
-        # 检查是否为绝对路径或相对路径
-        is_absolute_path = data.startswith('/') or (len(data) > 2 and data[1] == ':')
-        is_relative_path = data.startswith('./') or data.startswith('../')
+        # 检查文件扩展名，只从右侧切分一次，不拆分整个字符串
+        _, dot, extension = data.rpartition('.')
+        if dot and len(extension) <= 10:
+            return True
 
-        return has_path_separators or has_file_extension or is_absolute_path or is_relative_path
+        # 检查Windows盘符路径（如 C:xxx）
+        return len(data) > 2 and data[1] == ':'
 
     def _read_image_file(self, file_path: str) -> str:
         """
-        读取图片文件并转换为base64编码
+        读取图片文件并转换为base64编码（已完成大小和格式校验）
+
+        相同路径且未修改的文件直接返回缓存结果，避免重复读盘和编码
 
         Args:
             file_path: 图片文件路径
@@ -100,91 +254,192 @@ class ImageProcessor:
                 raise ValueError(f"路径不是文件: {file_path}")
 
             # 检查文件大小
-            file_size = path.stat().st_size
+            stat = path.stat()
+            file_size = stat.st_size
             if file_size > config.MAX_IMAGE_SIZE:
                 raise ValueError(f"图片文件超过大小限制: {file_size} > {config.MAX_IMAGE_SIZE}")
 
-            # 读取文件内容
-            with open(path, 'rb') as f:
-                image_bytes = f.read()
-
-            # 验证是否为有效图片
-            image_type = imghdr.what(None, image_bytes)
-            if not image_type:
-                raise ValueError("无法识别的图片格式")
-
-            mime_type = f"image/{image_type}"
-            if mime_type not in config.SUPPORTED_FORMATS:
-                raise ValueError(f"不支持的图片格式: {mime_type}")
+            cache_key = (str(path), stat.st_mtime_ns, file_size)
+            cached = _file_cache_get(cache_key)
+            if cached is not None:
+                return cached
 
-            # 转换为base64
-            return base64.b64encode(image_bytes).decode('utf-8')
+            with open(path, 'rb') as f:
+                # 只读取文件头验证是否为有效图片
+                image_type = _detect_image_type(f.read(32))
+                if not image_type:
+                    raise ValueError("无法识别的图片格式")
+
+                mime_type = f"image/{image_type}"
+                if mime_type not in config.SUPPORTED_FORMATS:
+                    raise ValueError(f"不支持的图片格式: {mime_type}")
+
+                # 分块读取并转换为base64，不在内存中保留完整的原始字节
+                f.seek(0)
+                encoded = bytearray()
+                while True:
+                    chunk = f.read(_READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    encoded += base64.b64encode(chunk)
+
+            image_data = encoded.decode('ascii')
+            _file_cache_put(cache_key, image_data)
+            return image_data
 
         except (OSError, IOError) as e:
             raise ValueError(f"读取文件失败: {str(e)}")
 
-    async def extract_text(self, image_input: str, prompt: Optional[str] = None) -> str:
+    def _prepare_image(self, image_input: str) -> str:
         """
-        从图片中提取文本内容
+        将输入规范化为经过校验的base64图片数据
 
         Args:
             image_input: base64编码的图片数据或图片文件路径
-            prompt: 可选的提示词
 
         Returns:
-            提取的文本内容
+            base64编码的图片数据
+
+        Raises:
+            ValueError: 输入无效、图片过大或格式不受支持
         """
         # 判断输入类型并处理
+        if image_input.startswith('data:'):
+            # data URL，校验后原样透传给API
+            return self._prepare_data_url(image_input)
+
         if self._is_base64(image_input):
-            # base64编码数据
-            image_data = image_input
-        elif self._is_file_path(image_input):
-            # 文件路径，读取并转换为base64
-            image_data = self._read_image_file(image_input)
-        else:
-            raise ValueError("输入必须是base64编码的图片数据或有效的图片文件路径")
+            # 检查图片大小（由长度推算），超限的数据在解码前就被拒绝
+            image_size = _b64_decoded_size(image_input)
+            if image_size > config.MAX_IMAGE_SIZE:
+                raise ValueError(f"图片大小超过限制: {image_size} > {config.MAX_IMAGE_SIZE}")
 
-        # 验证图片格式
-        if not self._validate_image(image_data):
+            # 严格解码整段数据并验证图片格式
+            if not self._validate_image(image_input):
+                raise ValueError("不支持的图片格式或图片数据无效")
+            return image_input
+
+        if self._is_file_path(image_input):
+            # 文件路径，读取并转换为base64（读取时已完成大小和格式校验）
+            return self._read_image_file(image_input)
+
+        raise ValueError("输入必须是base64编码的图片数据或有效的图片文件路径")
+
+    def _prepare_data_url(self, data_url: str) -> str:
+        """
+        校验 data URL 形式的图片输入
+
+        大小由base64长度推算，超限时无需解码即可拒绝；数据经严格解码校验后原样返回，
+        API客户端直接使用，无需剥离和重新拼接前缀
+
+        Args:
+            data_url: 形如 data:image/png;base64,... 的图片数据
+
+        Returns:
+            原始的 data URL
+
+        Raises:
+            ValueError: 声明的类型不受支持、数据无效或图片过大
+        """
+        header, separator, payload = data_url.partition(',')
+        mime_type = header[len('data:'):].split(';', 1)[0]
+        if not separator or not header.endswith(';base64') or mime_type not in config.SUPPORTED_FORMATS:
+            raise ValueError("不支持的图片格式或图片数据无效")
+
+        if not self._is_base64(payload):
             raise ValueError("不支持的图片格式或图片数据无效")
 
-        # 检查图片大小
-        image_size = len(base64.b64decode(image_data))
+        # 检查图片大小（由base64长度推算解码后的字节数）
+        image_size = _b64_decoded_size(payload)
         if image_size > config.MAX_IMAGE_SIZE:
             raise ValueError(f"图片大小超过限制: {image_size} > {config.MAX_IMAGE_SIZE}")
 
+        # 验证图片格式
+        if not self._validate_image(payload):
+            raise ValueError("不支持的图片格式或图片数据无效")
+
+        return data_url
+
+    async def extract_text(self, image_input: str, prompt: Optional[str] = None) -> str:
+        """
+        从图片中提取文本内容
+
+        Args:
+            image_input: base64编码的图片数据或图片文件路径
+            prompt: 可选的提示词
+
+        Returns:
+            提取的文本内容
+        """
+        # 解码、校验和读文件都是同步操作，放到线程中执行，避免大图片阻塞事件循环
+        image_data = await asyncio.get_running_loop().run_in_executor(None, self._prepare_image, image_input)
+
         # 调用API进行文本提取
-        prompt = prompt or "请详细描述这张图片的内容，包括文字和视觉元素"
+        prompt = prompt or DEFAULT_PROMPT
         result = await self.api_client.vision_completion(image_data, prompt)
 
         return result.strip()
 
+    async def extract_text_batch(self, image_inputs: List[str], prompt: Optional[str] = None) -> str:
+        """
+        在一次API调用中从多张图片提取文本内容
+
+        Args:
+            image_inputs: base64编码的图片数据或图片文件路径列表
+            prompt: 可选的提示词
+
+        Returns:
+            提取的文本内容
+        """
+        image_data_list = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: [self._prepare_image(image_input) for image_input in image_inputs]
+        )
+
+        prompt = prompt or DEFAULT_BATCH_PROMPT
+        result = await self.api_client.vision_completion_batch(image_data_list, prompt)
+
+        return result.strip()
+
     def _validate_image(self, image_data: str) -> bool:
         """
         验证图片数据的有效性
 
+        大小由base64长度推算，超限的数据不做解码；其余数据在一次C调用中严格解码，
+        任意位置的非法字符都会被拒绝，再由文件头识别格式
+
         Args:
             image_data: base64编码的图片数据
 
         Returns:
             是否有效
         """
+        if _b64_decoded_size(image_data) > config.MAX_IMAGE_SIZE:
+            return False
+
         try:
-            # 解码base64数据
-            image_bytes = base64.b64decode(image_data)
+            image_bytes = _strict_b64decode(image_data)
+        except Exception:
+            return False
 
-            # 检测图片格式
-            image_type = imghdr.what(None, image_bytes)
+        return self._validate_image_bytes(image_bytes) is not None
 
-            # 检查支持的格式
-            if not image_type:
-                return False
+    def _validate_image_bytes(self, image_bytes: bytes) -> Optional[str]:
+        """
+        基于已解码的图片字节验证格式
 
-            mime_type = f"image/{image_type}"
-            return mime_type in config.SUPPORTED_FORMATS
+        Args:
+            image_bytes: 原始图片字节
 
-        except Exception:
-            return False
+        Returns:
+            支持的MIME类型；格式无法识别或不受支持时返回None
+        """
+        # 格式识别只依赖文件头，无需扫描整张图片
+        image_type = _detect_image_type(image_bytes[:32])
+        if not image_type:
+            return None
+
+        mime_type = f"image/{image_type}"
+        return mime_type if mime_type in config.SUPPORTED_FORMATS else None
 
     def _get_image_info(self, image_data: str) -> dict:
         """
@@ -198,7 +453,7 @@ class ImageProcessor:
         """
         try:
             image_bytes = base64.b64decode(image_data)
-            image_type = imghdr.what(None, image_bytes)
+            image_type = _detect_image_type(image_bytes[:32])
 
             return {
                 "format": image_type,
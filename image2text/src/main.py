@@ -5,13 +5,17 @@ MCP服务器主模块
 
 import argparse
 import base64
+import contextlib
+import functools
 import logging
-from typing import Optional
+from types import MappingProxyType
+from typing import List, Optional
 
 from mcp.server.fastmcp import FastMCP
 
+from api_client import MAX_CACHED_CLIENTS, clear_response_cache, close_shared_clients
 from config import config
-from image_processor import ImageProcessor
+from image_processor import DEFAULT_PROMPT, ImageProcessor
 
 
 # 配置日志
@@ -29,41 +33,83 @@ mcp = FastMCP(
 )
 
 
-@mcp.tool()
-async def extract_text_from_image(
+# 各分析类型对应的提示词，模块加载时构建一次
+_ANALYSIS_PROMPTS = MappingProxyType({
+    "general": "请详细描述这张图片的内容，包括主要元素、场景和氛围",
+    "text": "请提取图片中的所有文字内容，保持原有格式",
+    "objects": "请识别并列出图片中的所有物体及其位置",
+    "scene": "请描述图片中的场景、环境和背景信息"
+})
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_CLIENTS)
+def _get_processor(base_url: str, api_key: str, model_id: str) -> ImageProcessor:
+    """
+    获取缓存的图片处理器，相同配置的调用复用同一个处理器及其连接池
+
+    Args:
+        base_url: API基础地址
+        api_key: API密钥
+        model_id: 模型ID
+
+    Returns:
+        图片处理器实例
+    """
+    return ImageProcessor(
+        base_url=base_url,
+        api_key=api_key,
+        model_id=model_id
+    )
+
+
+def _resolve_processor(
+    api_base_url: Optional[str],
+    api_key: Optional[str],
+    model_id: Optional[str]
+) -> ImageProcessor:
+    """
+    用配置中的默认值补全工具参数，并获取对应的图片处理器
+
+    Args:
+        api_base_url: API基础地址（可选）
+        api_key: API密钥（可选）
+        model_id: 模型ID（可选）
+
+    Returns:
+        图片处理器实例
+    """
+    return _get_processor(
+        api_base_url or config.DEFAULT_API_BASE,
+        api_key or config.DEFAULT_API_KEY or "",
+        model_id or config.DEFAULT_MODEL_ID
+    )
+
+
+async def _do_extract(
     image_data: str,
-    api_base_url: Optional[str] = None,
-    api_key: Optional[str] = None,
-    model_id: Optional[str] = None,
-    prompt: Optional[str] = None
+    api_base_url: Optional[str],
+    api_key: Optional[str],
+    model_id: Optional[str],
+    prompt: str
 ) -> str:
     """
-    从图片中提取文本内容
+    提取图片文本的公共流程，供各个工具直接调用
 
     Args:
-        image_data: 图片的base64编码数据或图片文件路径（如 /Users/bytedance/Demo/doc/assets/test.png）
-        api_base_url: API基础地址（可选，通过header传递）
-        api_key: API密钥（可选，通过header传递）
-        model_id: 模型ID（可选，通过header传递）
-        prompt: 自定义提示词（可选）
+        image_data: 图片的base64编码数据或图片文件路径
+        api_base_url: API基础地址（可选）
+        api_key: API密钥（可选）
+        model_id: 模型ID（可选）
+        prompt: 提示词
 
     Returns:
-        提取的文本内容
+        提取的文本内容，失败时返回错误信息
     """
-    logger.info("收到图片文本提取请求")
-
     try:
-        # 创建图片处理器
-        processor = ImageProcessor(
-            base_url=api_base_url or config.DEFAULT_API_BASE,
-            api_key=api_key or config.DEFAULT_API_KEY or "",
-            model_id=model_id or config.DEFAULT_MODEL_ID
-        )
+        # 获取图片处理器（相同配置复用）
+        processor = _resolve_processor(api_base_url, api_key, model_id)
 
         # 提取文本内容
-        # 如果没有提供提示词，使用默认提示词
-        if prompt is None:
-            prompt = "请详细描述这张图片的内容，包括文字和视觉元素"
         result = await processor.extract_text(image_data, prompt)
 
         logger.info("图片文本提取成功")
@@ -79,6 +125,57 @@ async def extract_text_from_image(
         return error_msg
 
 
+def _build_app():
+    """
+    构建HTTP应用，并在应用关闭时释放共享的HTTP客户端
+
+    Returns:
+        Starlette应用实例
+    """
+    app = mcp.streamable_http_app()
+    session_lifespan = app.router.lifespan_context
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with session_lifespan(app):
+            try:
+                yield
+            finally:
+                await close_shared_clients()
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+@mcp.tool()
+async def extract_text_from_image(
+    image_data: str,
+    api_base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    model_id: Optional[str] = None,
+    prompt: Optional[str] = None
+) -> str:
+    """
+    从图片中提取文本内容
+
+    Args:
+        image_data: 图片的base64编码数据或图片文件路径（如 /Users/bytedance/Demo/doc/assets/test.png）
+        api_base_url: API基础地址（可选，通过header传递）
+        api_key: API密钥（可选，通过header传递）
+        model_id: 模型ID（可选，通过header传递）
+        prompt: 自定义提示词（可选）
+
+    Returns:
+        提取的文本内容
+    """
+    logger.info("收到图片文本提取请求")
+
+    # 如果没有提供提示词，使用默认提示词
+    if prompt is None:
+        prompt = DEFAULT_PROMPT
+    return await _do_extract(image_data, api_base_url, api_key, model_id, prompt)
+
+
 @mcp.tool()
 async def analyze_image_content(
     image_data: str,
@@ -102,17 +199,10 @@ async def analyze_image_content(
     """
     logger.info(f"收到图片分析请求，类型: {analysis_type}")
 
-    # 根据分析类型设置不同的提示词
-    prompts = {
-        "general": "请详细描述这张图片的内容，包括主要元素、场景和氛围",
-        "text": "请提取图片中的所有文字内容，保持原有格式",
-        "objects": "请识别并列出图片中的所有物体及其位置",
-        "scene": "请描述图片中的场景、环境和背景信息"
-    }
+    # 根据分析类型选择提示词，未知类型使用通用提示词
+    prompt = _ANALYSIS_PROMPTS.get(analysis_type) or _ANALYSIS_PROMPTS["general"]
 
-    prompt = prompts.get(analysis_type, prompts["general"])
-
-    return await extract_text_from_image(
+    return await _do_extract(
         image_data=image_data,
         api_base_url=api_base_url,
         api_key=api_key,
@@ -121,6 +211,59 @@ async def analyze_image_content(
     )
 
 
+@mcp.tool()
+async def batch_extract_text(
+    images: List[str],
+    prompt: Optional[str] = None,
+    api_base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    model_id: Optional[str] = None
+) -> str:
+    """
+    在一次模型调用中从多张图片提取文本内容
+
+    Args:
+        images: 图片的base64编码数据或图片文件路径列表（单次最多16张）
+        prompt: 自定义提示词（可选）
+        api_base_url: API基础地址（可选）
+        api_key: API密钥（可选）
+        model_id: 模型ID（可选）
+
+    Returns:
+        提取的文本内容
+    """
+    logger.info(f"收到批量图片文本提取请求，图片数量: {len(images)}")
+
+    try:
+        processor = _resolve_processor(api_base_url, api_key, model_id)
+        result = await processor.extract_text_batch(images, prompt)
+
+        logger.info("批量图片文本提取成功")
+        return result
+
+    except ValueError as e:
+        error_msg = f"参数错误: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+    except Exception as e:
+        error_msg = f"处理失败: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+
+
+@mcp.tool()
+async def clear_cache() -> dict:
+    """
+    清空图片识别结果缓存
+
+    Returns:
+        被清除的缓存条目数
+    """
+    cleared = clear_response_cache()
+    logger.info(f"已清空识别结果缓存，共 {cleared} 条")
+    return {"cleared": cleared}
+
+
 @mcp.tool()
 async def get_supported_formats() -> dict:
     """
@@ -174,7 +317,7 @@ def main():
         # 启动HTTP服务器
         import uvicorn
         uvicorn.run(
-            mcp.streamable_http_app,
+            _build_app(),
             host=args.host,
             port=args.port,
             log_level=args.log_level.lower()
@@ -2,138 +2,222 @@
 API客户端模块单元测试
 """
 
+import asyncio
+import gzip
 import pytest
 import httpx
-from unittest.mock import AsyncMock, patch, MagicMock
-from src.api_client import APIClient
+import orjson
+from typing import Awaitable, Callable, List
+from unittest.mock import AsyncMock, patch
+from src.api_client import APIClient, MAX_BATCH_IMAGES, MAX_CACHED_CLIENTS, _CLIENT_CACHE, clear_response_cache, _GZIP_UNSUPPORTED, _http2_enabled, _retry_delay, close_shared_clients
+
+
+# 错误路径复用的异常实例，断言只关心异常类型和消息
+_NETWORK_ERROR = httpx.RequestError("Network error")
+
+
+class _MockUpstream:
+    """
+    传输层替身：按顺序返回预设的响应或抛出预设的异常，并记录收到的请求
+
+    队列只剩最后一项时会重复使用该项，便于构造持续失败的场景
+    """
+
+    def __init__(self):
+        self.requests: List[httpx.Request] = []
+        self._queue: List[Callable[[httpx.Request], Awaitable[httpx.Response]]] = []
+
+    def reset(self):
+        """清空预设结果和请求记录"""
+        self.requests.clear()
+        self._queue.clear()
+
+    def add_response(self, status_code: int = 200, json=None, headers=None):
+        """预设一个响应，每次命中都构造新的响应对象"""
+        async def respond(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(status_code, content=orjson.dumps(json or {}), headers=headers)
+        self._queue.append(respond)
+
+    def add_exception(self, exc: Exception):
+        """预设一个在发送请求时抛出的异常"""
+        async def fail(request: httpx.Request) -> httpx.Response:
+            raise exc
+        self._queue.append(fail)
+
+    def add_callback(self, callback: Callable[[httpx.Request], Awaitable[httpx.Response]]):
+        """预设一个自定义的异步处理函数"""
+        self._queue.append(callback)
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        respond = self._queue.pop(0) if len(self._queue) > 1 else self._queue[0]
+        return await respond(request)
+
+
+@pytest.fixture(scope="module")
+def upstream():
+    """整个模块共用的上游替身"""
+    return _MockUpstream()
 
 
 class TestAPIClient:
     """测试API客户端"""
 
-    @pytest.fixture
-    def api_client(self):
-        """创建API客户端实例"""
+    @pytest.fixture(autouse=True)
+    def clear_cache(self, upstream):
+        """每个用例前后清空识别结果缓存和上游替身状态，避免用例之间互相影响"""
+        clear_response_cache()
+        upstream.reset()
+        yield
+        clear_response_cache()
+
+    @pytest.fixture(scope="module")
+    def api_client(self, upstream):
+        """创建API客户端实例（整个模块共用，请求经由 MockTransport 交给上游替身）"""
         return APIClient(
             base_url="https://test.api.com",
             api_key="test_key",
-            model_id="test_model"
+            model_id="test_model",
+            client=httpx.AsyncClient(
+                transport=httpx.MockTransport(upstream.handler),
+                headers={"Authorization": "Bearer test_key"}
+            )
         )
 
-    @pytest.mark.asyncio
-    async def test_successful_vision_completion(self, api_client):
+    async def test_successful_vision_completion(self, api_client, upstream):
         """测试成功的视觉理解调用"""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        upstream.add_response(json={
             "choices": [{
                 "message": {
                     "content": "这是一张测试图片"
                 }
             }]
-        }
+        })
 
-        with patch.object(api_client.client, 'post', new_callable=AsyncMock) as mock_post:
-            mock_post.return_value = mock_response
-
-            result = await api_client.vision_completion(
-                image_data="test_base64_data",
-                prompt="描述这张图片"
-            )
+        result = await api_client.vision_completion(
+            image_data="test_base64_data",
+            prompt="描述这张图片"
+        )
 
-            assert result == "这是一张测试图片"
-            mock_post.assert_called_once()
+        assert result == "这是一张测试图片"
+        assert len(upstream.requests) == 1
 
-            # 验证调用参数
-            call_args = mock_post.call_args
-            assert call_args[0][0] == "https://test.api.com/chat/completions"
-            payload = call_args[1]["json"]
-            assert payload["model"] == "test_model"
-            assert payload["messages"][0]["content"][0]["text"] == "描述这张图片"
+        # 验证实际发出的请求
+        request = upstream.requests[0]
+        assert request.method == "POST"
+        assert str(request.url) == "https://test.api.com/chat/completions"
+        assert request.headers["Authorization"] == "Bearer test_key"
+        payload = orjson.loads(request.content)
+        assert payload["model"] == "test_model"
+        assert payload["messages"][0]["content"][0]["text"] == "描述这张图片"
 
-    @pytest.mark.asyncio
-    async def test_invalid_api_key(self, api_client):
+    async def test_invalid_api_key(self, api_client, upstream):
         """测试无效的API密钥"""
-        mock_response = MagicMock()
-        mock_response.status_code = 401
+        upstream.add_response(401)
 
-        http_error = httpx.HTTPStatusError(
-            "401 Unauthorized",
-            request=MagicMock(),
-            response=mock_response
-        )
-
-        with patch.object(api_client.client, 'post', new_callable=AsyncMock) as mock_post:
-            mock_post.side_effect = http_error
-
-            with pytest.raises(Exception, match="API密钥无效"):
-                await api_client.vision_completion("test_data")
+        with pytest.raises(Exception, match="API密钥无效"):
+            await api_client.vision_completion("test_data")
 
-    @pytest.mark.asyncio
-    async def test_rate_limit_error(self, api_client):
+    async def test_rate_limit_error(self, api_client, upstream):
         """测试频率限制错误"""
-        mock_response = MagicMock()
-        mock_response.status_code = 429
+        upstream.add_response(429, headers={"Retry-After": "0"})
 
-        http_error = httpx.HTTPStatusError(
-            "429 Too Many Requests",
-            request=MagicMock(),
-            response=mock_response
-        )
+        with pytest.raises(Exception, match="API调用频率超限"):
+            await api_client.vision_completion("test_data")
 
-        with patch.object(api_client.client, 'post', new_callable=AsyncMock) as mock_post:
-            mock_post.side_effect = http_error
+    async def test_bad_request_error_message(self, api_client, upstream):
+        """测试400错误时解析上游返回的错误信息"""
+        upstream.add_response(400, json={"error": {"message": "图片过大"}})
 
-            with pytest.raises(Exception, match="API调用频率超限"):
-                await api_client.vision_completion("test_data")
+        with pytest.raises(Exception, match="API请求错误: 图片过大"):
+            await api_client.vision_completion("test_data")
 
-    @pytest.mark.asyncio
-    async def test_network_error(self, api_client):
+    async def test_network_error(self, api_client, upstream):
         """测试网络错误"""
-        network_error = httpx.RequestError("Network error")
-
-        with patch.object(api_client.client, 'post', new_callable=AsyncMock) as mock_post:
-            mock_post.side_effect = network_error
+        upstream.add_exception(_NETWORK_ERROR)
 
-            with pytest.raises(Exception, match="网络请求失败"):
-                await api_client.vision_completion("test_data")
+        with pytest.raises(Exception, match="网络请求失败"):
+            await api_client.vision_completion("test_data")
 
-    @pytest.mark.asyncio
-    async def test_invalid_response_format(self, api_client):
+    async def test_invalid_response_format(self, api_client, upstream):
         """测试无效的响应格式"""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        upstream.add_response(json={
             "invalid": "format"  # 缺少choices字段
-        }
-
-        with patch.object(api_client.client, 'post', new_callable=AsyncMock) as mock_post:
-            mock_post.return_value = mock_response
+        })
 
-            with pytest.raises(Exception, match="API返回格式无效"):
-                await api_client.vision_completion("test_data")
+        with pytest.raises(Exception, match="API返回格式无效"):
+            await api_client.vision_completion("test_data")
 
-    @pytest.mark.asyncio
-    async def test_empty_choices(self, api_client):
+    async def test_empty_choices(self, api_client, upstream):
         """测试空的choices数组"""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        upstream.add_response(json={
             "choices": []  # 空数组
-        }
+        })
 
-        with patch.object(api_client.client, 'post', new_callable=AsyncMock) as mock_post:
-            mock_post.return_value = mock_response
+        with pytest.raises(Exception, match="API返回格式无效"):
+            await api_client.vision_completion("test_data")
 
-            with pytest.raises(Exception, match="API返回格式无效"):
-                await api_client.vision_completion("test_data")
+    async def test_client_close(self):
+        """测试关闭API客户端不会关闭外部传入的客户端，由调用方自行管理"""
+        http_client = httpx.AsyncClient()
+        async with APIClient(
+            base_url="https://test.api.com",
+            api_key="test_key",
+            model_id="test_model",
+            client=http_client
+        ) as api_client:
+            pass
+        await api_client.close()
 
-    @pytest.mark.asyncio
-    async def test_client_close(self, api_client):
-        """测试客户端关闭"""
+        assert not http_client.is_closed
+        await http_client.aclose()
+
+    async def test_shared_client_not_closed(self):
+        """测试关闭单个API客户端不会关闭共享连接池"""
+        api_client = APIClient("https://test.api.com", "test_key", "test_model")
         with patch.object(api_client.client, 'aclose', new_callable=AsyncMock) as mock_close:
             await api_client.close()
-            mock_close.assert_called_once()
+            mock_close.assert_not_called()
+
+    def test_shared_client_reused(self):
+        """测试相同地址和密钥的API客户端复用同一个HTTP客户端"""
+        first = APIClient("https://share.api.com/", "key_a", "model_1")
+        second = APIClient("https://share.api.com", "key_a", "model_2")
+        other = APIClient("https://share.api.com", "key_b", "model_1")
+
+        assert first.client is second.client
+        assert first.client is not other.client
+
+    def test_shared_client_cache_bounded(self):
+        """测试共享客户端缓存超出上限时淘汰最久未使用的客户端"""
+        first = APIClient("https://bounded.api.com", "key_0", "model").client
+        for i in range(1, MAX_CACHED_CLIENTS + 1):
+            APIClient("https://bounded.api.com", f"key_{i}", "model")
+
+        assert len(_CLIENT_CACHE) <= MAX_CACHED_CLIENTS
+        assert ("https://bounded.api.com", "key_0") not in _CLIENT_CACHE
+        assert APIClient("https://bounded.api.com", "key_0", "model").client is not first
+
+    async def test_evicted_shared_client_is_closed(self):
+        """测试被淘汰的共享客户端在请求超时时间后关闭，已有的API客户端改用新的共享客户端"""
+        api_client = APIClient("https://evict.api.com", "key_0", "model")
+        first = api_client.client
+        with patch("src.api_client.config.REQUEST_TIMEOUT", 0):
+            for i in range(1, MAX_CACHED_CLIENTS + 1):
+                APIClient("https://evict.api.com", f"key_{i}", "model")
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+        assert first.is_closed
+        assert not api_client.client.is_closed
+
+    async def test_close_shared_clients(self):
+        """测试统一关闭共享客户端后会重新创建"""
+        client = APIClient("https://close.api.com", "key", "model").client
+        await close_shared_clients()
+
+        assert client.is_closed
+        assert APIClient("https://close.api.com", "key", "model").client is not client
 
     def test_client_initialization(self):
         """测试客户端初始化"""
@@ -146,4 +230,201 @@ class TestAPIClient:
         assert client.base_url == "https://api.example.com"
         assert client.api_key == "test_key_123"
         assert client.model_id == "gpt-4-vision"
-        assert client.client.timeout.connect == 30  # 默认超时时间
\ No newline at end of file
+        assert client.client.timeout.connect == 30  # 默认超时时间
+
+    async def test_concurrent_identical_requests_coalesced(self, api_client, upstream):
+        """测试并发的相同请求只触发一次上游调用"""
+        async def slow_response(request):
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, content=orjson.dumps({"choices": [{"message": {"content": "合并结果"}}]}))
+
+        upstream.add_callback(slow_response)
+
+        results = await asyncio.gather(
+            api_client.vision_completion("same_data", "提示词"),
+            api_client.vision_completion("same_data", "提示词"),
+            api_client.vision_completion("other_data", "提示词"),
+        )
+
+        assert results == ["合并结果"] * 3
+        assert len(upstream.requests) == 2
+        assert api_client._inflight == {}
+
+    async def test_follower_retries_when_leader_cancelled(self, api_client, upstream):
+        """测试发起方被取消时，等待中的相同请求重新发起调用而不是随之失败"""
+        async def slow_response(request):
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, content=orjson.dumps({"choices": [{"message": {"content": "重试结果"}}]}))
+
+        upstream.add_callback(slow_response)
+
+        leader = asyncio.ensure_future(api_client.vision_completion("same_data", "提示词"))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(api_client.vision_completion("same_data", "提示词"))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == "重试结果"
+        assert leader.cancelled()
+        assert len(upstream.requests) == 2
+        assert api_client._inflight == {}
+
+    async def test_vision_completion_batch_payload(self, api_client, upstream):
+        """测试批量请求把所有图片放入同一条消息"""
+        upstream.add_response(json={"choices": [{"message": {"content": "批量结果"}}]})
+
+        result = await api_client.vision_completion_batch(["img_a", "data:image/png;base64,img_b"], "逐张描述")
+
+        assert result == "批量结果"
+        assert len(upstream.requests) == 1
+        content = orjson.loads(upstream.requests[0].content)["messages"][0]["content"]
+        assert content[0] == {"type": "text", "text": "逐张描述"}
+        assert [item["image_url"]["url"] for item in content[1:]] == [
+            "data:image/jpeg;base64,img_a",
+            "data:image/png;base64,img_b",
+        ]
+
+    async def test_vision_completion_batch_limits(self, api_client):
+        """测试批量请求的图片数量校验"""
+        with pytest.raises(ValueError, match="图片列表不能为空"):
+            await api_client.vision_completion_batch([])
+
+        with pytest.raises(ValueError, match="单次最多提交"):
+            await api_client.vision_completion_batch(["img"] * (MAX_BATCH_IMAGES + 1))
+
+    def test_http2_enabled(self):
+        """测试HTTP/2开关及缺少h2时的回退"""
+        with patch('src.api_client.config') as mock_config, \
+                patch('src.api_client.importlib.util.find_spec') as mock_find_spec:
+            mock_config.HTTP2 = True
+            mock_find_spec.return_value = object()
+            assert _http2_enabled() is True
+
+            mock_find_spec.return_value = None
+            assert _http2_enabled() is False
+
+            mock_config.HTTP2 = False
+            mock_find_spec.return_value = object()
+            assert _http2_enabled() is False
+
+    @staticmethod
+    def _make_response(status_code, body=None, headers=None):
+        """构造带请求对象的真实响应，便于触发 raise_for_status"""
+        return httpx.Response(
+            status_code,
+            content=orjson.dumps(body or {}),
+            headers=headers,
+            request=httpx.Request("POST", "https://test.api.com/chat/completions")
+        )
+
+    async def test_retry_on_server_error(self, api_client, upstream):
+        """测试上游临时故障时重试并最终成功"""
+        upstream.add_response(503)
+        upstream.add_response(429, headers={"Retry-After": "0"})
+        upstream.add_response(json={"choices": [{"message": {"content": "重试成功"}}]})
+
+        with patch('src.api_client.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+            result = await api_client.vision_completion("test_data")
+
+        assert result == "重试成功"
+        assert len(upstream.requests) == 3
+        assert mock_sleep.call_count == 2
+        assert mock_sleep.call_args_list[1][0][0] == 0
+
+    async def test_retry_exhausted(self, api_client, upstream):
+        """测试重试次数用尽后返回最后一次的错误"""
+        upstream.add_response(502)
+
+        with patch('src.api_client.asyncio.sleep', new_callable=AsyncMock):
+            with pytest.raises(Exception, match="API调用失败: HTTP 502"):
+                await api_client.vision_completion("test_data")
+
+        assert len(upstream.requests) == 1 + 3  # 首次请求 + MAX_RETRIES 次重试
+
+    async def test_no_retry_on_client_error(self, api_client, upstream):
+        """测试不可重试的状态码直接失败"""
+        upstream.add_response(401)
+
+        with patch('src.api_client.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+            with pytest.raises(Exception, match="API密钥无效"):
+                await api_client.vision_completion("test_data")
+
+        assert len(upstream.requests) == 1
+        mock_sleep.assert_not_called()
+
+    async def test_request_timeout(self, api_client, upstream):
+        """测试上游挂起时的整体超时"""
+        async def hanging_response(request):
+            await asyncio.sleep(10)
+
+        upstream.add_callback(hanging_response)
+
+        with patch('src.api_client.config.REQUEST_TIMEOUT', 0.01):
+            with pytest.raises(Exception, match="API请求超时"):
+                await api_client.vision_completion("test_data")
+
+    def test_retry_delay(self):
+        """测试重试等待时间的计算"""
+        assert _retry_delay(self._make_response(429, headers={"Retry-After": "5"}), 0) == 5
+        assert _retry_delay(self._make_response(429, headers={"Retry-After": "3600"}), 0) == 30
+        assert _retry_delay(
+            self._make_response(503, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0
+        ) == 0
+
+        delay = _retry_delay(self._make_response(503), 2)
+        assert 4 <= delay < 5
+
+    async def test_gzip_request_body(self, api_client, upstream):
+        """测试开启压缩后请求体使用gzip发送"""
+        _GZIP_UNSUPPORTED.discard(api_client.base_url)
+        upstream.add_response(json={"choices": [{"message": {"content": "ok"}}]})
+
+        with patch('src.api_client.config.COMPRESS_REQUESTS', True):
+            await api_client.vision_completion("gzip_data", "提示词")
+
+        request = upstream.requests[0]
+        assert request.headers["Content-Encoding"] == "gzip"
+        payload = orjson.loads(gzip.decompress(request.content))
+        assert payload["messages"][0]["content"][1]["image_url"]["url"].endswith("gzip_data")
+
+    async def test_gzip_fallback_on_415(self, api_client, upstream):
+        """测试上游返回415时改发未压缩请求，并记住该地址"""
+        _GZIP_UNSUPPORTED.discard(api_client.base_url)
+        upstream.add_response(415)
+        upstream.add_response(json={"choices": [{"message": {"content": "未压缩"}}]})
+
+        try:
+            with patch('src.api_client.config.COMPRESS_REQUESTS', True):
+                result = await api_client.vision_completion("plain_data", "提示词")
+
+            assert result == "未压缩"
+            assert len(upstream.requests) == 2
+            assert "Content-Encoding" not in upstream.requests[1].headers
+            assert api_client.base_url in _GZIP_UNSUPPORTED
+        finally:
+            _GZIP_UNSUPPORTED.discard(api_client.base_url)
+
+    async def test_response_cache_hit(self, api_client, upstream):
+        """测试相同请求命中结果缓存，不再访问上游"""
+        upstream.add_response(json={"choices": [{"message": {"content": "缓存结果"}}]})
+
+        first = await api_client.vision_completion("cached_data", "提示词")
+        second = await api_client.vision_completion("cached_data", "提示词")
+        other_model = APIClient("https://test.api.com", "test_key", "other_model", client=api_client.client)
+        await other_model.vision_completion("cached_data", "提示词")
+        other_key = APIClient("https://test.api.com", "other_key", "test_model", client=api_client.client)
+        await other_key.vision_completion("cached_data", "提示词")
+
+        assert first == second == "缓存结果"
+        assert len(upstream.requests) == 3  # 不同模型、不同密钥都不共用缓存
+        assert clear_response_cache() == 3
+
+    async def test_response_cache_disabled(self, api_client, upstream):
+        """测试 RESPONSE_CACHE_TTL 为0时不缓存"""
+        upstream.add_response(json={"choices": [{"message": {"content": "结果"}}]})
+
+        with patch('src.api_client.config.RESPONSE_CACHE_TTL', 0):
+            await api_client.vision_completion("uncached_data", "提示词")
+            await api_client.vision_completion("uncached_data", "提示词")
+
+        assert len(upstream.requests) == 2
@@ -29,12 +29,27 @@ class TestConfig:
             "IMAGE2TEXT_MAX_IMAGE_SIZE": "5242880"  # 5MB
         }
 
-        with patch.dict(os.environ, env_vars):
-            test_config = Config()
-            assert test_config.DEFAULT_API_BASE == "https://custom.api.com"
-            assert test_config.DEFAULT_API_KEY == "test_key"
-            assert test_config.SERVER_PORT == 8080
-            assert test_config.MAX_IMAGE_SIZE == 5242880
+        Config.from_env.cache_clear()
+        try:
+            with patch.dict(os.environ, env_vars):
+                test_config = Config.from_env()
+                assert test_config.DEFAULT_API_BASE == "https://custom.api.com"
+                assert test_config.DEFAULT_API_KEY == "test_key"
+                assert test_config.SERVER_PORT == 8080
+                assert test_config.MAX_IMAGE_SIZE == 5242880
+        finally:
+            Config.from_env.cache_clear()
+
+    def test_from_env_cached(self):
+        """测试配置只读取一次，清空缓存后重新读取"""
+        assert Config.from_env() is Config.from_env()
+
+        Config.from_env.cache_clear()
+        try:
+            with patch.dict(os.environ, {"IMAGE2TEXT_SERVER_PORT": "9000"}):
+                assert Config.from_env().SERVER_PORT == 9000
+        finally:
+            Config.from_env.cache_clear()
 
     def test_supported_formats(self):
         """测试支持的格式"""
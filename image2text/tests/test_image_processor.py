@@ -4,32 +4,51 @@
 
 import pytest
 import base64
-import tempfile
+import binascii
+import threading
 import os
+from io import BytesIO
 from pathlib import Path
-from unittest.mock import AsyncMock, patch, MagicMock
-from src.image_processor import ImageProcessor
+from unittest.mock import AsyncMock, patch
+from PIL import Image
+from src.image_processor import ImageProcessor, _b64_decoded_size, _detect_image_type, _strict_b64decode
 from src.config import config
 
 
+# 1x1像素的PNG图片数据及其base64编码，模块加载时用Pillow生成并只编码一次
+_png_buffer = BytesIO()
+Image.new("RGB", (1, 1)).save(_png_buffer, "PNG")
+_PNG_BYTES = _png_buffer.getvalue()
+_VALID_B64 = base64.b64encode(_PNG_BYTES).decode('ascii')
+
+
+def _repeat_b64(raw: bytes, count: int) -> str:
+    """
+    构造至少包含 count 份 raw 的base64数据，无需对大块数据整体编码
+
+    raw 重复3次后长度为3的倍数，其编码可以直接首尾拼接，
+    因此只编码一个小块，再用字符串重复得到整段数据
+    """
+    block = base64.b64encode(raw * 3).decode('ascii')
+    return block * -(-count // 3)
+
+
 class TestImageProcessor:
     """测试图片处理器"""
 
-    @pytest.fixture
+    @pytest.fixture(scope="session")
     def processor(self):
-        """创建图片处理器实例"""
+        """创建图片处理器实例（整个测试会话共用，各用例通过 patch.object 隔离状态）"""
         return ImageProcessor(
             base_url="https://test.api.com",
             api_key="test_key",
             model_id="test_model"
         )
 
-    @pytest.fixture
+    @pytest.fixture(scope="session")
     def valid_base64_image(self):
         """创建有效的base64图片数据"""
-        # 创建一个1x1像素的PNG图片数据
-        png_data = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02\x00\x00\x00\x90wS\xde\x00\x00\x00\x0cIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd4c\x00\x00\x00\x00IEND\xaeB`\x82'
-        return base64.b64encode(png_data).decode('utf-8')
+        return _VALID_B64
 
     @pytest.fixture
     def invalid_base64_data(self):
@@ -37,23 +56,12 @@ class TestImageProcessor:
         return "invalid_base64_string_!!!"
 
     @pytest.fixture
-    def temp_image_file(self, valid_base64_image):
-        """创建临时图片文件"""
-        # 解码base64数据
-        image_bytes = base64.b64decode(valid_base64_image)
+    def temp_image_file(self, tmp_path):
+        """创建临时图片文件（由 pytest 的 tmp_path 负责清理）"""
+        image_path = tmp_path / "image.png"
+        image_path.write_bytes(_PNG_BYTES)
+        return str(image_path)
 
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-            tmp_file.write(image_bytes)
-            tmp_file_path = tmp_file.name
-
-        yield tmp_file_path
-
-        # 清理临时文件
-        if os.path.exists(tmp_file_path):
-            os.unlink(tmp_file_path)
-
-    @pytest.mark.asyncio
     async def test_extract_text_success(self, processor, valid_base64_image):
         """测试成功的文本提取"""
         with patch.object(processor.api_client, 'vision_completion', new_callable=AsyncMock) as mock_api:
@@ -64,7 +72,6 @@ class TestImageProcessor:
             assert result == "这是一张测试图片"
             mock_api.assert_called_once_with(valid_base64_image, "请详细描述这张图片的内容，包括文字和视觉元素")
 
-    @pytest.mark.asyncio
     async def test_extract_text_with_custom_prompt(self, processor, valid_base64_image):
         """测试自定义提示词的文本提取"""
         custom_prompt = "请识别图片中的文字"
@@ -77,32 +84,74 @@ class TestImageProcessor:
             assert result == "图片中的文字内容"
             mock_api.assert_called_once_with(valid_base64_image, custom_prompt)
 
-    @pytest.mark.asyncio
+    async def test_extract_text_data_url_passthrough(self, processor, valid_base64_image):
+        """测试 data URL 输入校验后原样透传，且只严格解码一次图片数据"""
+        data_url = f"data:image/png;base64,{valid_base64_image}"
+
+        with patch.object(processor.api_client, 'vision_completion', new_callable=AsyncMock) as mock_api, \
+                patch('src.image_processor._strict_b64decode', wraps=_strict_b64decode) as mock_decode:
+            mock_api.return_value = "结果"
+
+            result = await processor.extract_text(data_url)
+
+            assert result == "结果"
+            mock_api.assert_called_once_with(data_url, "请详细描述这张图片的内容，包括文字和视觉元素")
+            mock_decode.assert_called_once_with(valid_base64_image)
+
+    async def test_extract_text_data_url_unsupported_type(self, processor, valid_base64_image):
+        """测试声明了不支持类型的 data URL"""
+        with pytest.raises(ValueError, match="不支持的图片格式或图片数据无效"):
+            await processor.extract_text(f"data:image/gif;base64,{valid_base64_image}")
+
+    async def test_extract_text_data_url_not_an_image(self, processor):
+        """测试内容不是图片的 data URL"""
+        payload = base64.b64encode(b'not an image').decode('utf-8')
+        with pytest.raises(ValueError, match="不支持的图片格式或图片数据无效"):
+            await processor.extract_text(f"data:image/png;base64,{payload}")
+
     async def test_extract_text_invalid_image(self, processor, invalid_base64_data):
         """测试无效图片数据"""
         with pytest.raises(ValueError, match="输入必须是base64编码的图片数据或有效的图片文件路径"):
             await processor.extract_text(invalid_base64_data)
 
-    @pytest.mark.asyncio
     async def test_extract_text_oversized_image(self, processor, valid_base64_image):
         """测试超大图片"""
-        # 创建一个超过大小限制的大图片数据，基于有效图片格式
-        # 先获取有效图片的解码数据
-        valid_bytes = base64.b64decode(valid_base64_image)
-
-        # 计算需要重复多少次才能达到超过10MB的大小
-        target_size = config.MAX_IMAGE_SIZE + 1024  # 稍微超过限制
-        repeat_count = (target_size // len(valid_bytes)) + 1
-
-        # 创建大图片数据
-        large_bytes = valid_bytes * repeat_count
-        large_data = base64.b64encode(large_bytes).decode('utf-8')
+        # 大小由base64长度推算，直接构造解码后稍微超过限制的合法base64字符串即可，
+        # 无需真正编码大块图片数据
+        needed_b64_len = ((config.MAX_IMAGE_SIZE + 1024 + 2) // 3) * 4
+        large_data = "A" * needed_b64_len
 
         # Mock API调用以避免实际网络请求
         with patch.object(processor.api_client, 'vision_completion', return_value="mocked result"):
             with pytest.raises(ValueError, match="图片大小超过限制.*"):
                 await processor.extract_text(large_data)
 
+    @pytest.mark.parametrize("data", ["QUJD!", "QUJ=D", "QQ==QQ==", "=QUJD", "QUJDRA"])
+    def test_strict_b64decode_rejects_malformed(self, data):
+        """测试严格模式解码拒绝非法字符和错误填充"""
+        with pytest.raises(binascii.Error):
+            _strict_b64decode(data)
+
+    def test_repeat_b64_matches_full_encoding(self):
+        """测试拼接得到的base64与整体编码一致"""
+        assert _repeat_b64(_PNG_BYTES, 7) == base64.b64encode(_PNG_BYTES * 9).decode('ascii')
+
+    @pytest.mark.parametrize("raw", [b"", b"a", b"ab", b"abc", b"abcd", b"\x00" * 1000])
+    def test_b64_decoded_size(self, raw):
+        """测试由base64长度推算的字节数与实际解码一致"""
+        assert _b64_decoded_size(base64.b64encode(raw).decode('ascii')) == len(raw)
+
+    async def test_extract_text_oversized_rejected_before_decode(self, processor, valid_base64_image):
+        """测试超大的base64数据在解码前就被拒绝"""
+        valid_bytes = _PNG_BYTES
+        large_data = _repeat_b64(valid_bytes, config.MAX_IMAGE_SIZE // len(valid_bytes) + 1)
+
+        with patch('src.image_processor._strict_b64decode') as mock_decode:
+            with pytest.raises(ValueError, match="图片大小超过限制"):
+                await processor.extract_text(large_data)
+
+        mock_decode.assert_not_called()
+
     def test_validate_image_valid_png(self, processor, valid_base64_image):
         """测试有效的PNG图片验证"""
         is_valid = processor._validate_image(valid_base64_image)
@@ -120,6 +169,57 @@ class TestImageProcessor:
         is_valid = processor._validate_image(corrupted_data)
         assert is_valid is False
 
+    def test_validate_image_oversized(self, processor):
+        """测试超过大小限制的数据按长度推算直接判定无效"""
+        oversized = "A" * ((config.MAX_IMAGE_SIZE // 3 + 1) * 4)
+        with patch('src.image_processor._strict_b64decode') as mock_decode:
+            assert processor._validate_image(oversized) is False
+        mock_decode.assert_not_called()
+
+    def test_validate_image_oversized_not_decoded(self, processor):
+        """测试超限数据由长度推算直接拒绝，不做解码"""
+        needed_b64_len = ((config.MAX_IMAGE_SIZE + 3) // 3) * 4
+        oversized = "A" * needed_b64_len
+        with patch('src.image_processor._strict_b64decode', wraps=_strict_b64decode) as mock_decode:
+            assert processor._validate_image(oversized) is False
+        mock_decode.assert_not_called()
+
+    def test_prepare_image_strict_decodes_full_payload(self, processor):
+        """测试处理base64输入时对整段数据严格解码一次"""
+        image_data = _repeat_b64(_PNG_BYTES, 30)
+        with patch('src.image_processor._strict_b64decode', wraps=_strict_b64decode) as mock_decode:
+            assert processor._prepare_image(image_data) == image_data
+        mock_decode.assert_called_once_with(image_data)
+
+    def test_validate_image_bytes_returns_mime(self, processor, valid_base64_image):
+        """测试基于原始字节的格式验证返回MIME类型"""
+        image_bytes = _PNG_BYTES
+        assert processor._validate_image_bytes(image_bytes) == "image/png"
+        assert processor._validate_image_bytes(b'not an image') is None
+
+    async def test_extract_text_decodes_base64_once(self, processor, valid_base64_image):
+        """测试base64输入在提取流程中只解码一次"""
+        with patch.object(processor.api_client, 'vision_completion', new_callable=AsyncMock) as mock_api, \
+                patch('src.image_processor._strict_b64decode', wraps=_strict_b64decode) as mock_decode:
+            mock_api.return_value = "结果"
+
+            await processor.extract_text(valid_base64_image)
+
+            mock_decode.assert_called_once()
+
+    @pytest.mark.parametrize("header, expected", [
+        (b'\x89PNG\r\n\x1a\n' + b'\x00' * 8, "png"),
+        (b'\xff\xd8\xff\xe0\x00\x10JFIF', "jpeg"),
+        (b'RIFF\x24\x00\x00\x00WEBPVP8 ', "webp"),
+        (b'GIF89a\x01\x00', "gif"),
+        (b'RIFF\x24\x00\x00\x00WAVEfmt ', None),
+        (b'not an image', None),
+        (b'', None),
+    ])
+    def test_detect_image_type(self, header, expected):
+        """测试基于文件头魔数的格式识别"""
+        assert _detect_image_type(header) == expected
+
     def test_get_image_info_valid(self, processor, valid_base64_image):
         """测试获取有效图片信息"""
         info = processor._get_image_info(valid_base64_image)
@@ -144,6 +244,25 @@ class TestImageProcessor:
         """测试无效的base64检测"""
         assert processor._is_base64("not base64!!!") is False
         assert processor._is_base64("/path/to/image.png") is False
+        assert processor._is_base64("QUJD") is True
+        assert processor._is_base64("QQ==") is True
+        assert processor._is_base64("Q===") is False  # 填充符最多两个
+        assert processor._is_base64("Q=JD") is False  # 填充符只能出现在结尾
+
+    def test_is_base64_long_input(self, processor, valid_base64_image):
+        """测试超过路径长度的输入只按首尾字符判断"""
+        long_data = valid_base64_image * 40
+        assert len(long_data) > 1024
+        assert processor._is_base64(long_data) is True
+        assert processor._is_base64(long_data[:-4] + "!!!!") is False
+
+    async def test_extract_text_rejects_corrupted_long_base64(self, processor, valid_base64_image):
+        """测试中间夹杂非法字符的长base64数据在解码时被拒绝"""
+        long_data = valid_base64_image * 40
+        corrupted = long_data[:600] + "!!!!" + long_data[604:]
+
+        with pytest.raises(ValueError, match="不支持的图片格式或图片数据无效"):
+            await processor.extract_text(corrupted)
 
     def test_is_file_path_valid(self, processor):
         """测试有效的文件路径检测"""
@@ -152,12 +271,17 @@ class TestImageProcessor:
         assert processor._is_file_path("../assets/logo.png") is True
         assert processor._is_file_path("C:\\Users\\test\\image.jpg") is True
 
+    def test_is_file_path_bare_filename_and_long_input(self, processor, valid_base64_image):
+        """测试无分隔符的文件名与超长输入的路径检测"""
+        assert processor._is_file_path("image.png") is True
+        assert processor._is_file_path("C:image") is True
+        assert processor._is_file_path("a" * 1025 + ".png") is False
+
     def test_is_file_path_invalid(self, processor, valid_base64_image):
         """测试无效的文件路径检测"""
         assert processor._is_file_path(valid_base64_image) is False
         assert processor._is_file_path("not a path") is False
 
-    @pytest.mark.asyncio
     async def test_extract_text_from_file_path(self, processor, temp_image_file):
         """测试从文件路径提取文本"""
         with patch.object(processor.api_client, 'vision_completion', new_callable=AsyncMock) as mock_api:
@@ -171,46 +295,122 @@ class TestImageProcessor:
             assert len(call_args) == 2  # image_data和prompt
             assert processor._is_base64(call_args[0]) is True
 
-    @pytest.mark.asyncio
+    def test_read_image_file_chunked_encoding(self, processor, tmp_path):
+        """测试跨越多个读取块的文件编码结果与整体编码一致"""
+        # 构造超过两个读取块且长度不是3的倍数的文件
+        image_bytes = _PNG_BYTES + os.urandom(120 * 1024 + 1)
+        image_path = tmp_path / "chunked.png"
+        image_path.write_bytes(image_bytes)
+
+        assert processor._read_image_file(str(image_path)) == base64.b64encode(image_bytes).decode('ascii')
+
+    def test_read_image_file_uses_cache(self, processor, temp_image_file):
+        """测试同一未修改文件的重复读取命中缓存"""
+        first = processor._read_image_file(temp_image_file)
+
+        with patch('builtins.open', side_effect=AssertionError("不应再次读取文件")):
+            second = processor._read_image_file(temp_image_file)
+
+        assert second == first
+
+    def test_read_image_file_cache_invalidated_on_change(self, processor, temp_image_file, valid_base64_image):
+        """测试文件内容变化后缓存失效"""
+        first = processor._read_image_file(temp_image_file)
+
+        # 追加数据改变文件大小，使缓存键变化
+        with open(temp_image_file, 'ab') as f:
+            f.write(b'\x00' * 3)
+
+        second = processor._read_image_file(temp_image_file)
+        assert second != first
+        assert base64.b64decode(second) == _PNG_BYTES + b'\x00' * 3
+
+    def test_file_cache_concurrent_access(self):
+        """测试多线程并发读写文件编码缓存时字节计数保持准确且不超过上限"""
+        import src.image_processor as image_processor
+
+        def worker(worker_id):
+            for i in range(500):
+                key = (f"/tmp/{worker_id}-{i % 20}.png", i, 0)
+                image_processor._file_cache_put(key, "x" * (i % 7 + 1))
+                image_processor._file_cache_get(key)
+
+        with patch.object(image_processor, "_FILE_CACHE_MAX_BYTES", 64):
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            cached_bytes = sum(len(data) for data in image_processor._FILE_CACHE.values())
+            assert image_processor._file_cache_bytes == cached_bytes <= 64
+
+        image_processor._FILE_CACHE.clear()
+        image_processor._file_cache_bytes = 0
+
     async def test_extract_text_from_nonexistent_file(self, processor):
         """测试不存在的文件路径"""
         with pytest.raises(ValueError, match="文件不存在"):
             await processor.extract_text("/nonexistent/image.png")
 
-    @pytest.mark.asyncio
-    async def test_extract_text_from_invalid_file(self, processor):
+    async def test_extract_text_from_invalid_file(self, processor, tmp_path):
         """测试无效的文件路径"""
         # 创建临时文本文件
-        with tempfile.NamedTemporaryFile(suffix='.txt', delete=False) as tmp_file:
-            tmp_file.write(b"this is not an image")
-            tmp_file_path = tmp_file.name
-
-        try:
-            with pytest.raises(ValueError, match="无法识别的图片格式"):
-                await processor.extract_text(tmp_file_path)
-        finally:
-            os.unlink(tmp_file_path)
-
-    @pytest.mark.asyncio
-    async def test_extract_text_oversized_file(self, processor):
+        text_path = tmp_path / "not_image.txt"
+        text_path.write_bytes(b"this is not an image")
+
+        with pytest.raises(ValueError, match="无法识别的图片格式"):
+            await processor.extract_text(str(text_path))
+
+    async def test_extract_text_oversized_file(self, processor, tmp_path):
         """测试超大文件"""
-        # 创建大文件
-        large_content = b"x" * (config.MAX_IMAGE_SIZE + 1024)
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-            tmp_file.write(large_content)
-            tmp_file_path = tmp_file.name
-
-        try:
-            with pytest.raises(ValueError, match="图片文件超过大小限制"):
-                await processor.extract_text(tmp_file_path)
-        finally:
-            os.unlink(tmp_file_path)
-
-    @pytest.mark.asyncio
+        # 大小检查只依赖文件元数据，用 truncate 创建稀疏文件，无需真正写入10MB数据
+        large_path = tmp_path / "large.png"
+        with open(large_path, 'wb') as f:
+            f.truncate(config.MAX_IMAGE_SIZE + 1024)
+
+        with pytest.raises(ValueError, match="图片文件超过大小限制"):
+            await processor.extract_text(str(large_path))
+
     async def test_api_client_error_handling(self, processor, valid_base64_image):
         """测试API客户端错误处理"""
         with patch.object(processor.api_client, 'vision_completion', new_callable=AsyncMock) as mock_api:
             mock_api.side_effect = Exception("API调用失败")
 
             with pytest.raises(Exception, match="API调用失败"):
-                await processor.extract_text(valid_base64_image)
\ No newline at end of file
+                await processor.extract_text(valid_base64_image)
+
+    async def test_extract_text_batch(self, processor, valid_base64_image, temp_image_file):
+        """测试批量提取会校验每张图片并一次性提交"""
+        with patch.object(processor.api_client, 'vision_completion_batch', new_callable=AsyncMock) as mock_api:
+            mock_api.return_value = " 批量结果 "
+
+            result = await processor.extract_text_batch([valid_base64_image, temp_image_file], "逐张描述")
+
+            assert result == "批量结果"
+            image_data_list, prompt = mock_api.call_args[0]
+            assert image_data_list == [valid_base64_image, valid_base64_image]
+            assert prompt == "逐张描述"
+
+    async def test_extract_text_batch_invalid_image(self, processor, valid_base64_image, invalid_base64_data):
+        """测试批量提取中任意一张图片无效时整体报错"""
+        with pytest.raises(ValueError, match="输入必须是base64编码的图片数据或有效的图片文件路径"):
+            await processor.extract_text_batch([valid_base64_image, invalid_base64_data])
+
+    async def test_extract_text_prepares_image_in_thread(self, processor, valid_base64_image):
+        """测试图片预处理在工作线程中执行"""
+        main_thread = threading.get_ident()
+        prepare_threads = []
+        original_prepare = processor._prepare_image
+
+        def tracking_prepare(image_input):
+            prepare_threads.append(threading.get_ident())
+            return original_prepare(image_input)
+
+        with patch.object(processor, '_prepare_image', side_effect=tracking_prepare), \
+                patch.object(processor.api_client, 'vision_completion', new_callable=AsyncMock) as mock_api:
+            mock_api.return_value = "结果"
+
+            await processor.extract_text(valid_base64_image)
+
+        assert prepare_threads and prepare_threads[0] != main_thread
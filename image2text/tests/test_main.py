@@ -4,166 +4,88 @@
 
 import pytest
 import base64
-from unittest.mock import AsyncMock, patch, MagicMock
-from src.main import extract_text_from_image, analyze_image_content, get_supported_formats
+from io import BytesIO
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from PIL import Image
+from src.main import extract_text_from_image, analyze_image_content, batch_extract_text, clear_cache, get_supported_formats, _get_processor
+
+
+# 1x1像素的PNG图片数据及其base64编码，模块加载时用Pillow生成并只编码一次
+_png_buffer = BytesIO()
+Image.new("RGB", (1, 1)).save(_png_buffer, "PNG")
+_PNG_BYTES = _png_buffer.getvalue()
+_VALID_B64 = base64.b64encode(_PNG_BYTES).decode('ascii')
 
 
 class TestMainModule:
     """测试主模块功能"""
 
-    @pytest.fixture
+    @pytest.fixture(autouse=True)
+    def clear_processor_cache(self):
+        """每个用例前后清空处理器缓存，避免复用其他用例的mock"""
+        _get_processor.cache_clear()
+        yield
+        _get_processor.cache_clear()
+
+    @pytest.fixture(autouse=True)
+    def processor_class(self, monkeypatch):
+        """每个用例自动用mock替换 ImageProcessor 类，用例只需配置其返回值"""
+        processor_class = MagicMock()
+        monkeypatch.setattr("src.main.ImageProcessor", processor_class)
+        return processor_class
+
+    @pytest.fixture(scope="session")
     def valid_base64_image(self):
         """创建有效的base64图片数据"""
-        # 创建一个1x1像素的PNG图片数据
-        png_data = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02\x00\x00\x00\x90wS\xde\x00\x00\x00\x0cIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd4c\x00\x00\x00\x00IEND\xaeB`\x82'
-        return base64.b64encode(png_data).decode('utf-8')
+        return _VALID_B64
 
-    @pytest.mark.asyncio
-    async def test_extract_text_success(self, valid_base64_image):
+    async def test_extract_text_success(self, processor_class, valid_base64_image):
         """测试成功的文本提取"""
-        with patch('src.main.ImageProcessor') as mock_processor_class:
-            mock_processor = AsyncMock()
-            mock_processor.extract_text.return_value = "这是一张测试图片"
-            mock_processor_class.return_value = mock_processor
+        mock_processor = SimpleNamespace(extract_text=AsyncMock(return_value="这是一张测试图片"))
+        processor_class.return_value = mock_processor
 
-            result = await extract_text_from_image(valid_base64_image)
+        result = await extract_text_from_image(valid_base64_image)
 
-            assert result == "这是一张测试图片"
-            mock_processor.extract_text.assert_called_once_with(
-                valid_base64_image,
-                "请详细描述这张图片的内容，包括文字和视觉元素"
-            )
+        assert result == "这是一张测试图片"
+        mock_processor.extract_text.assert_called_once_with(
+            valid_base64_image,
+            "请详细描述这张图片的内容，包括文字和视觉元素"
+        )
 
-    @pytest.mark.asyncio
-    async def test_extract_text_with_custom_params(self, valid_base64_image):
+    async def test_extract_text_with_custom_params(self, processor_class, valid_base64_image):
         """测试自定义参数的文本提取"""
-        with patch('src.main.ImageProcessor') as mock_processor_class:
-            mock_processor = AsyncMock()
-            mock_processor.extract_text.return_value = "自定义结果"
-            mock_processor_class.return_value = mock_processor
-
-            result = await extract_text_from_image(
-                image_data=valid_base64_image,
-                api_base_url="https://custom.api.com",
-                api_key="custom_key",
-                model_id="custom_model",
-                prompt="自定义提示词"
-            )
-
-            assert result == "自定义结果"
-            mock_processor_class.assert_called_once_with(
-                base_url="https://custom.api.com",
-                api_key="custom_key",
-                model_id="custom_model"
-            )
-            mock_processor.extract_text.assert_called_once_with(
-                valid_base64_image,
-                "自定义提示词"
-            )
-
-    @pytest.mark.asyncio
-    async def test_extract_text_error_handling(self, valid_base64_image):
+        mock_processor = SimpleNamespace(extract_text=AsyncMock(return_value="自定义结果"))
+        processor_class.return_value = mock_processor
+
+        result = await extract_text_from_image(
+            image_data=valid_base64_image,
+            api_base_url="https://custom.api.com",
+            api_key="custom_key",
+            model_id="custom_model",
+            prompt="自定义提示词"
+        )
+
+        assert result == "自定义结果"
+        processor_class.assert_called_once_with(
+            base_url="https://custom.api.com",
+            api_key="custom_key",
+            model_id="custom_model"
+        )
+        mock_processor.extract_text.assert_called_once_with(
+            valid_base64_image,
+            "自定义提示词"
+        )
+
+    async def test_extract_text_error_handling(self, processor_class, valid_base64_image):
         """测试错误处理"""
-        with patch('src.main.ImageProcessor') as mock_processor_class:
-            mock_processor = AsyncMock()
-            mock_processor.extract_text.side_effect = ValueError("无效的图片格式")
-            mock_processor_class.return_value = mock_processor
-
-            result = await extract_text_from_image(valid_base64_image)
-
-            assert "参数错误: 无效的图片格式" in result
-
-    @pytest.mark.asyncio
-    async def test_analyze_image_general(self, valid_base64_image):
-        """测试通用图片分析"""
-        with patch('src.main.extract_text_from_image', new_callable=AsyncMock) as mock_extract:
-            mock_extract.return_value = "这是一张风景照片"
-
-            result = await analyze_image_content(
-                image_data=valid_base64_image,
-                analysis_type="general"
-            )
-
-            assert result == "这是一张风景照片"
-            mock_extract.assert_called_once()
-
-            # 验证调用的参数
-            call_args = mock_extract.call_args
-            assert call_args[1]["prompt"] == "请详细描述这张图片的内容，包括主要元素、场景和氛围"
-
-    @pytest.mark.asyncio
-    async def test_analyze_image_text(self, valid_base64_image):
-        """测试文本分析"""
-        with patch('src.main.extract_text_from_image', new_callable=AsyncMock) as mock_extract:
-            mock_extract.return_value = "图片中的文字内容"
-
-            result = await analyze_image_content(
-                image_data=valid_base64_image,
-                analysis_type="text"
-            )
-
-            assert result == "图片中的文字内容"
-            mock_extract.assert_called_once()
-
-            # 验证调用的参数
-            call_args = mock_extract.call_args
-            assert call_args[1]["prompt"] == "请提取图片中的所有文字内容，保持原有格式"
-
-    @pytest.mark.asyncio
-    async def test_analyze_image_objects(self, valid_base64_image):
-        """测试物体识别"""
-        with patch('src.main.extract_text_from_image', new_callable=AsyncMock) as mock_extract:
-            mock_extract.return_value = "识别到的物体列表"
-
-            result = await analyze_image_content(
-                image_data=valid_base64_image,
-                analysis_type="objects"
-            )
-
-            assert result == "识别到的物体列表"
-            mock_extract.assert_called_once()
-
-            # 验证调用的参数
-            call_args = mock_extract.call_args
-            assert call_args[1]["prompt"] == "请识别并列出图片中的所有物体及其位置"
-
-    @pytest.mark.asyncio
-    async def test_analyze_image_scene(self, valid_base64_image):
-        """测试场景分析"""
-        with patch('src.main.extract_text_from_image', new_callable=AsyncMock) as mock_extract:
-            mock_extract.return_value = "场景描述信息"
-
-            result = await analyze_image_content(
-                image_data=valid_base64_image,
-                analysis_type="scene"
-            )
-
-            assert result == "场景描述信息"
-            mock_extract.assert_called_once()
-
-            # 验证调用的参数
-            call_args = mock_extract.call_args
-            assert call_args[1]["prompt"] == "请描述图片中的场景、环境和背景信息"
-
-    @pytest.mark.asyncio
-    async def test_analyze_image_unknown_type(self, valid_base64_image):
-        """测试未知的分析类型"""
-        with patch('src.main.extract_text_from_image', new_callable=AsyncMock) as mock_extract:
-            mock_extract.return_value = "默认分析结果"
-
-            result = await analyze_image_content(
-                image_data=valid_base64_image,
-                analysis_type="unknown_type"
-            )
-
-            assert result == "默认分析结果"
-            mock_extract.assert_called_once()
-
-            # 验证使用了默认提示词
-            call_args = mock_extract.call_args
-            assert call_args[1]["prompt"] == "请详细描述这张图片的内容，包括主要元素、场景和氛围"
-
-    @pytest.mark.asyncio
+        mock_processor = SimpleNamespace(extract_text=AsyncMock(side_effect=ValueError("无效的图片格式")))
+        processor_class.return_value = mock_processor
+
+        result = await extract_text_from_image(valid_base64_image)
+
+        assert "参数错误: 无效的图片格式" in result
+
     async def test_get_supported_formats(self):
         """测试获取支持的格式"""
         with patch('src.main.config') as mock_config:
@@ -174,4 +96,103 @@ class TestMainModule:
 
             assert result["supported_formats"] == ["image/jpeg", "image/png"]
             assert result["max_image_size"] == 5 * 1024 * 1024
-            assert result["max_image_size_mb"] == 5.0
\ No newline at end of file
+            assert result["max_image_size_mb"] == 5.0
+
+    async def test_processor_reused_for_same_config(self, processor_class, valid_base64_image):
+        """测试相同配置的多次调用复用同一个图片处理器"""
+        mock_processor = SimpleNamespace(extract_text=AsyncMock(return_value="结果"))
+        processor_class.return_value = mock_processor
+
+        await extract_text_from_image(valid_base64_image, api_key="key")
+        await extract_text_from_image(valid_base64_image, api_key="key")
+
+        processor_class.assert_called_once()
+        assert mock_processor.extract_text.call_count == 2
+
+    async def test_batch_extract_text(self, processor_class, valid_base64_image):
+        """测试批量文本提取工具"""
+        mock_processor = SimpleNamespace(extract_text_batch=AsyncMock(return_value="批量结果"))
+        processor_class.return_value = mock_processor
+
+        result = await batch_extract_text([valid_base64_image, valid_base64_image], prompt="逐张描述")
+
+        assert result == "批量结果"
+        mock_processor.extract_text_batch.assert_called_once_with(
+            [valid_base64_image, valid_base64_image],
+            "逐张描述"
+        )
+
+    async def test_batch_extract_text_error_handling(self, processor_class, valid_base64_image):
+        """测试批量文本提取的参数错误处理"""
+        mock_processor = SimpleNamespace(extract_text_batch=AsyncMock(side_effect=ValueError("图片列表不能为空")))
+        processor_class.return_value = mock_processor
+
+        result = await batch_extract_text([])
+
+        assert result == "参数错误: 图片列表不能为空"
+
+    async def test_analyze_image_reuses_processor(self, processor_class, valid_base64_image):
+        """测试分析工具直接复用处理器，不再经过提取工具重复解析参数"""
+        mock_processor = SimpleNamespace(extract_text=AsyncMock(return_value="场景描述"))
+        processor_class.return_value = mock_processor
+
+        result = await analyze_image_content(valid_base64_image, analysis_type="scene")
+
+        assert result == "场景描述"
+        mock_processor.extract_text.assert_called_once_with(
+            valid_base64_image,
+            "请描述图片中的场景、环境和背景信息"
+        )
+
+    async def test_analyze_image_error_handling(self, processor_class, valid_base64_image):
+        """测试分析工具的错误处理"""
+        mock_processor = SimpleNamespace(extract_text=AsyncMock(side_effect=RuntimeError("上游异常")))
+        processor_class.return_value = mock_processor
+
+        result = await analyze_image_content(valid_base64_image)
+
+        assert result == "处理失败: 上游异常"
+
+    async def test_clear_cache(self):
+        """测试清空识别结果缓存工具"""
+        with patch('src.main.clear_response_cache', return_value=3) as mock_clear:
+            result = await clear_cache()
+
+        assert result == {"cleared": 3}
+        mock_clear.assert_called_once()
+
+
+@pytest.fixture(scope="class")
+def mock_extract():
+    """同一个测试类共用一次 _do_extract 的patch"""
+    with patch('src.main._do_extract', new_callable=AsyncMock) as mock_extract:
+        yield mock_extract
+
+
+class TestAnalyzeImagePrompts:
+    """测试各分析类型使用的提示词"""
+
+    @pytest.fixture(autouse=True)
+    def reset_mock_extract(self, mock_extract):
+        """每个用例前重置调用记录"""
+        mock_extract.reset_mock()
+
+    @pytest.mark.parametrize("analysis_type,expected_prompt", [
+        ("general", "请详细描述这张图片的内容，包括主要元素、场景和氛围"),
+        ("text", "请提取图片中的所有文字内容，保持原有格式"),
+        ("objects", "请识别并列出图片中的所有物体及其位置"),
+        ("scene", "请描述图片中的场景、环境和背景信息"),
+        ("unknown_type", "请详细描述这张图片的内容，包括主要元素、场景和氛围"),  # 未知类型使用默认提示词
+    ], ids=["general", "text", "objects", "scene", "unknown_type"])
+    async def test_analyze_image_prompt(self, mock_extract, analysis_type, expected_prompt):
+        """测试分析类型对应的提示词"""
+        mock_extract.return_value = f"{analysis_type}结果"
+
+        result = await analyze_image_content(
+            image_data=_VALID_B64,
+            analysis_type=analysis_type
+        )
+
+        assert result == f"{analysis_type}结果"
+        mock_extract.assert_called_once()
+        assert mock_extract.call_args[1]["prompt"] == expected_prompt
@@ -14,20 +14,34 @@
 
 import argparse
 import asyncio
+import atexit
+import functools
+import importlib.util
+import logging
+import logging.handlers
+import queue
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional
 
-import akshare as ak
 import httpx
+import numpy as np
 import pandas as pd
-import uvicorn
 
 from mcp.server.fastmcp import FastMCP
 
 
+# 模块日志，级别在直接运行时通过 --log-level 设置；未启用的级别不会格式化日志内容
+logger = logging.getLogger("stock_mcp")
+
 # 初始化 FastMCP 服务器，用于股票数据工具
-# json_response=False: 使用 SSE 流式响应而非 JSON
-# stateless_http=False: 使用有状态模式，保持连接状态
+# json_response=True: 直接返回 JSON 响应而非 SSE 流，响应由 pydantic-core 序列化，
+#   中文按 UTF-8 原样输出，不会转义为 \uXXXX
+# stateless_http=True: 使用无状态模式，不保存会话状态
 mcp = FastMCP(name="stock", json_response=True, stateless_http=True)
 
 # 服务常量配置
@@ -36,6 +50,140 @@ REQUEST_TIMEOUT = 30.0               # 请求超时时间（秒）
 DEFAULT_PERIOD = "daily"             # 默认数据周期
 DEFAULT_INTRADAY_PERIOD = "60"       # 默认分时数据间隔（分钟）
 RECENT_DAYS = 20                      # 近期历史数据天数
+CODE_NAME_CACHE_TTL = 3600           # 股票代码名称对照表缓存时间（秒）
+AKSHARE_MAX_WORKERS = 4              # 同时进行的 akshare 调用数上限（数据源按 IP 限流）
+MAX_RESPONSE_ROWS = 500              # 历史行情单次返回的最大行数，超出时只保留最近的记录
+
+# akshare 专用线程池，与默认线程池隔离并限制并发，进程退出时不等待未完成的调用
+_AK_POOL = ThreadPoolExecutor(max_workers=AKSHARE_MAX_WORKERS, thread_name_prefix="akshare")
+atexit.register(_AK_POOL.shutdown, wait=False)
+# 超出并发上限的调用在事件循环中排队，而不是堆积在线程池队列里；
+# 信号量在运行中的事件循环内创建，见 _get_ak_sem
+_ak_sem: Optional[asyncio.Semaphore] = None
+_ak_sem_loop: Optional[asyncio.AbstractEventLoop] = None
+# 单个接口的并发上限：同花顺资金流接口每次调用都要翻很多页，限流更严格，
+# 同一接口最多同时进行 2 个调用，避免批量查询时占满全部线程
+_AK_ENDPOINT_LIMITS: Dict[str, int] = {
+    name: 2
+    for name in ("stock_fund_flow_individual", "stock_fund_flow_concept", "stock_fund_flow_industry")
+}
+# 各接口的信号量，首次调用该接口时在运行中的事件循环内创建，见 _get_endpoint_sem
+_ak_endpoint_sems: Dict[str, asyncio.Semaphore] = {}
+_ak_endpoint_sems_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# akshare 模块，导入较慢，首次调用时才在工作线程中导入
+_ak = None
+
+# 东方财富K线接口（stock_zh_a_hist 实际请求的地址），历史行情直接请求该接口
+EASTMONEY_KLINE_URL = "https://push2his.eastmoney.com/api/qt/stock/kline/get"
+_KLINE_PERIODS = {"daily": "101", "weekly": "102", "monthly": "103"}
+_KLINE_ADJUSTS = {"": "0", "qfq": "1", "hfq": "2"}
+_KLINE_COLUMNS = ["日期", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "振幅", "涨跌幅", "涨跌额", "换手率"]
+# 共享的 HTTP 客户端，首次请求时创建，复用连接避免重复握手
+_http_client: Optional[httpx.AsyncClient] = None
+
+AKSHARE_CACHE_MAXSIZE = 256          # akshare 结果缓存最大条目数
+# 各 akshare 接口结果的缓存时间（秒），未列出的接口不缓存；
+# stock_zh_a_hist 和资金流接口的缓存时间随参数或交易时段变化，见 _akshare_cache_ttl
+_AK_CACHE_TTL: Dict[str, float] = {
+    "stock_individual_info_em": 300,
+    "stock_cyq_em": 300,
+    "stock_hot_rank_em": 30,
+    "stock_lhb_detail_em": 300,
+}
+# 资金流接口: "即时" 数据只缓存几秒，N日排行缓存1分钟
+_FUND_FLOW_FUNCS = frozenset({"stock_fund_flow_individual", "stock_fund_flow_concept", "stock_fund_flow_industry"})
+FUND_FLOW_REALTIME_TTL = 3
+FUND_FLOW_RANK_TTL = 60
+# akshare 结果缓存: (接口名, 参数) -> (过期时间, 数据框)，按最近使用顺序淘汰
+_AK_CACHE: "OrderedDict[tuple, tuple[float, pd.DataFrame]]" = OrderedDict()
+# 正在进行的可缓存调用: (接口名, 参数) -> 结果 Future，相同参数的并发请求共用一次上游调用
+_AK_INFLIGHT: Dict[tuple, asyncio.Future] = {}
+
+# 股票代码名称对照表缓存: (获取时间, 数据框, 代码到名称的映射)
+_code_name_cache: Optional[tuple[float, pd.DataFrame, Dict[str, str]]] = None
+# 对照表刷新锁，并发查询时只有一个协程去拉取数据；在运行中的事件循环内创建，见 _get_code_name_lock
+_code_name_lock: Optional[asyncio.Lock] = None
+_code_name_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# A 股代码格式：6位 ASCII 数字
+_SYMBOL_RE = re.compile(r'[0-9]{6}')
+
+# 各交易所的代码前缀及对应的 (简称, 全称)，沪深按前3位、北交所按首位查找
+_SZ_MARKET = ("深圳", "深圳证券交易所")
+_SH_MARKET = ("上海", "上海证券交易所")
+_BJ_MARKET = ("北京", "北京证券交易所")
+_MARKET_BY_PREFIX3 = {
+    **dict.fromkeys(('000', '001', '002', '003', '300'), _SZ_MARKET),
+    **dict.fromkeys(('600', '601', '603', '688'), _SH_MARKET),
+}
+_MARKET_BY_PREFIX1 = dict.fromkeys(('8', '4'), _BJ_MARKET)
+_UNKNOWN_MARKET = ("未知", "未知交易所")
+
+# 涨跌标识和符号前缀，按 np.sign 结果加 1 后的下标 (下跌, 持平, 上涨) 排列
+_SIGN_EMOJI = ("📉", "➡️", "📈")
+_SIGN_PREFIX = ("", "", "+")
+
+# 各工具固定不变的表头和提示文字，导入时拼好，调用时直接引用
+_HEADER_SEARCH = "序号  代码    股票名称        市场\n" + "-" * 35 + "\n"
+_HEADER_HOT_RANK = "排名  代码    股票名称      最新价    涨跌幅    人气值\n" + "-" * 55 + "\n"
+_HEADER_FUND_FLOW_REALTIME = "排名  代码    股票名称      最新价    涨跌幅    主力净流入\n" + "-" * 60 + "\n"
+_HEADER_FUND_FLOW_RANK = "排名  代码    股票名称      涨跌幅    主力净流入    成交额\n" + "-" * 65 + "\n"
+_HEADER_CONCEPT_FLOW = "排名  概念名称          涨跌幅    净流入    公司数  领涨股\n" + "-" * 65 + "\n"
+_HEADER_INDUSTRY_FLOW = "排名  行业名称          涨跌幅    净流入    公司数  领涨股\n" + "-" * 65 + "\n"
+_HEADER_BOARD_OVERVIEW = "排名  板块名称          涨跌幅    成交额    净流入    涨/跌    领涨股\n" + "-" * 80 + "\n"
+_HEADER_LHB_BY_DATE = (
+    "-" * 80 + "\n"
+    + "序号  代码    股票名称      涨跌幅    净买额    成交额占比  上榜原因\n"
+    + "-" * 80 + "\n"
+)
+_HEADER_LHB = "代码    股票名称      上榜日      涨跌幅    净买额    上榜原因\n" + "-" * 75 + "\n"
+
+_TIP_HOT_RANK = (
+    "\n💡 热度说明:\n"
+    "- 排名基于东方财富网股吧的关注度和讨论热度\n"
+    "- 热度高的股票通常受到更多投资者关注\n"
+    "- 建议结合基本面和技术面进行综合分析\n"
+)
+_TIP_CONCEPT_FLOW = (
+    "\n💡 投资提示:\n"
+    "- 概念板块资金流向反映市场热点和投资偏好\n"
+    "- 净流入较大的概念通常受到资金追捧\n"
+    "- 建议关注领涨股的基本面和技术面\n"
+)
+_TIP_INDUSTRY_FLOW = (
+    "\n💡 投资建议:\n"
+    "- 行业资金流向体现产业投资趋势\n"
+    "- 净流入较大的行业可能存在投资机会\n"
+    "- 建议结合宏观经济和政策导向分析\n"
+)
+_TIP_BOARD_OVERVIEW = (
+    "\n💡 投资策略:\n"
+    "- 关注净流入较大且涨幅居前的板块\n"
+    "- 注意领涨股的持续性和基本面支撑\n"
+    "- 结合宏观政策和行业景气度进行配置\n"
+    "- 控制仓位，注意风险管理\n"
+)
+_TIP_LHB = (
+    "\n💡 投资提示:\n"
+    "- 龙虎榜反映大资金动向和市场关注度\n"
+    "- 净买额为正表示大资金看好，为负表示大资金减持\n"
+    "- 关注上榜原因，异常波动可能存在风险\n"
+    "- 建议结合基本面和技术面进行综合分析\n"
+)
+
+# 各参数的合法取值：元组保留错误提示中的展示顺序，frozenset 用于成员判断
+_PERIOD_CHOICES = ("daily", "weekly", "monthly")
+_INTRADAY_CHOICES = ("1", "5", "15", "30", "60")
+_ADJUST_CHOICES = ("", "qfq", "hfq")
+_FUND_FLOW_CHOICES = ("即时", "3日排行", "5日排行", "10日排行", "20日排行")
+_VALID_PERIODS = frozenset(_PERIOD_CHOICES)
+_VALID_INTRADAY = frozenset(_INTRADAY_CHOICES)
+_VALID_ADJUSTS = frozenset(_ADJUST_CHOICES)
+_VALID_FUND_FLOW = frozenset(_FUND_FLOW_CHOICES)
+
+# 当天日期缓存: (下一个本地零点的时间戳, 近期开始日期, 今天)，日期格式 YYYYMMDD
+_TODAY_CACHE: Optional[tuple[float, str, str]] = None
 
 
 def validate_stock_symbol(symbol: str) -> bool:
@@ -55,15 +203,59 @@ def validate_stock_symbol(symbol: str) -> bool:
         >>> validate_stock_symbol("12345")
         False
     """
-    # 检查是否为空或长度不等于6
-    if not symbol or len(symbol) != 6:
-        return False
-    
-    # 检查是否全为数字
-    if not symbol.isdigit():
-        return False
-        
-    return True
+    return bool(symbol) and _SYMBOL_RE.fullmatch(symbol) is not None
+
+
+def _classify_market(code: str) -> tuple[str, str]:
+    """根据股票代码前缀判断所属交易所
+
+    Args:
+        code (str): 6位股票代码
+
+    Returns:
+        tuple[str, str]: (市场简称, 交易所全称)，如 ("深圳", "深圳证券交易所")
+    """
+    return _MARKET_BY_PREFIX3.get(code[:3]) or _MARKET_BY_PREFIX1.get(code[:1], _UNKNOWN_MARKET)
+
+
+def _validate(
+    symbol: Optional[str] = None,
+    period: Optional[str] = None,
+    adjust: Optional[str] = None,
+    intraday: bool = False,
+    flow_type: Optional[str] = None
+) -> Optional[str]:
+    """校验工具函数的公共参数
+
+    依次校验股票代码、数据周期、复权方式和资金流查询类型，值为 None 的参数跳过校验。
+
+    Args:
+        symbol (Optional[str]): 股票代码
+        period (Optional[str]): 数据周期，intraday 为 True 时按分时间隔校验
+        adjust (Optional[str]): 复权方式
+        intraday (bool): period 是否为分时间隔（分钟）
+        flow_type (Optional[str]): 资金流查询类型（即时或N日排行）
+
+    Returns:
+        Optional[str]: 第一个不合法参数对应的错误信息，全部合法时返回 None
+    """
+    if symbol is not None and not validate_stock_symbol(symbol):
+        return f"错误: 股票代码格式无效。请输入6位数字代码，如 '000001'，当前输入: '{symbol}'"
+
+    if period is not None:
+        if intraday:
+            if period not in _VALID_INTRADAY:
+                return f"错误: 分时间隔无效。支持的间隔: {', '.join(_INTRADAY_CHOICES)} 分钟，当前输入: '{period}'"
+        elif period not in _VALID_PERIODS:
+            return f"错误: 数据周期无效。支持的周期: {', '.join(_PERIOD_CHOICES)}，当前输入: '{period}'"
+
+    if adjust is not None and adjust not in _VALID_ADJUSTS:
+        return f"错误: 复权方式无效。支持的方式: {', '.join(_ADJUST_CHOICES)}，当前输入: '{adjust}'"
+
+    if flow_type is not None and flow_type not in _VALID_FUND_FLOW:
+        return f"错误: 查询类型无效。支持的类型: {', '.join(_FUND_FLOW_CHOICES)}，当前输入: '{flow_type}'"
+
+    return None
 
 
 def format_date_string(date_str: str) -> str:
@@ -97,6 +289,7 @@ def get_recent_date_range() -> tuple[str, str]:
     """获取近期日期范围
     
     计算从今天往前推 RECENT_DAYS 天的日期范围，用于近期历史数据查询。
+    结果按天缓存，同一天内的调用直接复用。
     
     Returns:
         tuple[str, str]: (开始日期, 结束日期) 格式为 YYYYMMDD
@@ -105,23 +298,174 @@ def get_recent_date_range() -> tuple[str, str]:
         >>> get_recent_date_range()  # 假设今天是 2024-12-13
         ('20241210', '20241213')
     """
-    # 获取今天的日期
-    today = datetime.now()
-    
+    _, start_str, end_str = _today_cache()
+    return start_str, end_str
+
+
+def _today_str() -> str:
+    """获取今天的日期字符串 (YYYYMMDD)，同一天内直接返回缓存结果
+
+    Returns:
+        str: 今天的日期，格式为 YYYYMMDD
+    """
+    return _today_cache()[2]
+
+
+def _now_str() -> str:
+    """获取当前时间字符串 (YYYY-MM-DD HH:MM:SS)，同一秒内的调用共用一次格式化结果
+
+    Returns:
+        str: 当前本地时间
+    """
+    return _format_epoch_second(int(time.time()))
+
+
+@functools.lru_cache(maxsize=1)
+def _format_epoch_second(epoch_sec: int) -> str:
+    """按秒格式化时间戳，只缓存最近一秒的结果
+
+    Args:
+        epoch_sec (int): 秒级 Unix 时间戳
+
+    Returns:
+        str: 格式为 YYYY-MM-DD HH:MM:SS 的本地时间
+    """
+    return datetime.fromtimestamp(epoch_sec).strftime('%Y-%m-%d %H:%M:%S')
+
+def _today_cache() -> tuple[float, str, str]:
+    """获取当天日期缓存，跨过本地零点后重新计算
+
+    Returns:
+        tuple[float, str, str]: (下一个本地零点的时间戳, 近期开始日期, 今天)
+    """
+    global _TODAY_CACHE
+
+    cached = _TODAY_CACHE
+    now_ts = time.time()
+    if cached is not None and now_ts < cached[0]:
+        return cached
+
+    today = datetime.fromtimestamp(now_ts)
     # 计算开始日期（往前推 RECENT_DAYS 天）
     start_date = today - timedelta(days=RECENT_DAYS)
-    
-    # 格式化为 YYYYMMDD 字符串
-    start_str = start_date.strftime("%Y%m%d")
-    end_str = today.strftime("%Y%m%d")
-    
-    return start_str, end_str
+    next_midnight = datetime.combine(today.date() + timedelta(days=1), datetime.min.time())
+
+    cached = (next_midnight.timestamp(), start_date.strftime("%Y%m%d"), today.strftime("%Y%m%d"))
+    _TODAY_CACHE = cached
+    return cached
+
+
+def is_trading_time(now: Optional[datetime] = None) -> bool:
+    """判断当前是否处于 A 股交易时段
+
+    交易时段为工作日 9:30-11:30 和 13:00-15:00，不考虑节假日。
+
+    Args:
+        now (Optional[datetime]): 要判断的时间，默认为当前时间
+
+    Returns:
+        bool: 处于交易时段返回 True，否则返回 False
+    """
+    now = now or datetime.now()
+    if now.weekday() >= 5:
+        return False
+    hhmm = now.hour * 100 + now.minute
+    return 930 <= hhmm < 1130 or 1300 <= hhmm < 1500
+
+
+def _akshare_cache_ttl(func_name: str, kwargs: Dict[str, Any]) -> float:
+    """获取 akshare 接口结果的缓存时间
+
+    Args:
+        func_name (str): akshare 函数名称
+        kwargs (Dict[str, Any]): 调用参数
+
+    Returns:
+        float: 缓存时间（秒），0 表示不缓存
+    """
+    if func_name == "stock_zh_a_hist":
+        # 交易时段内行情持续变化，只做短时缓存
+        return 60 if is_trading_time() else 900
+    if func_name in _FUND_FLOW_FUNCS:
+        return FUND_FLOW_REALTIME_TTL if kwargs.get("symbol", "即时") == "即时" else FUND_FLOW_RANK_TTL
+    return _AK_CACHE_TTL.get(func_name, 0)
+
+
+def _get_ak():
+    """按需导入 akshare
+
+    akshare 会连带导入大量依赖，启动时不导入，只在第一次调用数据接口时导入。
+
+    Returns:
+        module: akshare 模块
+    """
+    global _ak
+    if _ak is None:
+        import akshare
+        _ak = akshare
+    return _ak
+
+
+def _call_akshare(func_name: str, kwargs: Dict[str, Any]) -> Any:
+    """在工作线程中查找并执行 akshare 函数
+
+    Args:
+        func_name (str): akshare 函数名称
+        kwargs (Dict[str, Any]): 传递给 akshare 函数的参数
+
+    Returns:
+        Any: akshare 函数的返回值，函数不存在时返回 None
+    """
+    try:
+        func = getattr(_get_ak(), func_name)
+    except AttributeError:
+        # akshare 函数不存在；只包住查找这一步，函数内部抛出的 AttributeError 按普通调用失败处理
+        logger.error("错误: akshare 中不存在函数 %s", func_name)
+        return None
+    return func(**kwargs)
+
+
+def _ak_cache_get(key: tuple) -> Optional[pd.DataFrame]:
+    """读取 akshare 结果缓存
+
+    Args:
+        key (tuple): 缓存键 (接口名, 排序后的参数)
+
+    Returns:
+        Optional[pd.DataFrame]: 未过期时返回数据框的浅拷贝（避免调用方修改影响缓存），
+            未命中或已过期返回 None
+    """
+    cached = _AK_CACHE.get(key)
+    if cached is None:
+        return None
+    if cached[0] <= time.monotonic():
+        del _AK_CACHE[key]
+        return None
+    _AK_CACHE.move_to_end(key)
+    return cached[1].copy(deep=False)
+
+
+def _ak_cache_put(key: tuple, df: pd.DataFrame, ttl: float) -> None:
+    """写入 akshare 结果缓存，超出 AKSHARE_CACHE_MAXSIZE 时淘汰最久未使用的条目
+
+    Args:
+        key (tuple): 缓存键 (接口名, 排序后的参数)
+        df (pd.DataFrame): 接口返回的数据框
+        ttl (float): 缓存时间（秒）
+    """
+    _AK_CACHE[key] = (time.monotonic() + ttl, df)
+    _AK_CACHE.move_to_end(key)
+    while len(_AK_CACHE) > AKSHARE_CACHE_MAXSIZE:
+        _AK_CACHE.popitem(last=False)
 
 
 async def safe_akshare_call(func_name: str, **kwargs) -> Optional[pd.DataFrame]:
     """安全调用 akshare 函数
     
     封装 akshare 函数调用，提供统一的错误处理和超时控制。
+    调用在专用线程池中执行，同时进行的调用数不超过 AKSHARE_MAX_WORKERS。
+    配置了缓存时间的接口（见 _akshare_cache_ttl），相同参数的结果在有效期内直接复用；
+    缓存未命中时，相同参数的并发调用只请求一次上游，其余调用等待并共用结果。
     
     Args:
         func_name (str): akshare 函数名称
@@ -133,26 +477,461 @@ async def safe_akshare_call(func_name: str, **kwargs) -> Optional[pd.DataFrame]:
     Example:
         >>> data = await safe_akshare_call("stock_zh_a_hist", symbol="000001")
     """
+    ttl = _akshare_cache_ttl(func_name, kwargs)
+    if ttl <= 0:
+        return await _fetch_akshare(func_name, kwargs)
+
+    cache_key = (func_name, tuple(sorted(kwargs.items())))
+    while True:
+        # 命中缓存时直接在事件循环中返回，不经过线程池
+        cached = _ak_cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        pending = _AK_INFLIGHT.get(cache_key)
+        if pending is None:
+            break
+        # 相同参数的调用正在进行，等待它的结果。asyncio.wait 不会取消被等待的 Future，
+        # 也不会把发起方的取消传给等待者；发起方被取消时重新检查缓存和在途表，必要时由本调用重新获取
+        await asyncio.wait({pending})
+        if not pending.cancelled():
+            result = pending.result()
+            return result.copy(deep=False) if isinstance(result, pd.DataFrame) else result
+
+    pending = asyncio.get_running_loop().create_future()
+    _AK_INFLIGHT[cache_key] = pending
     try:
-        # 获取 akshare 函数
-        ak_func = getattr(ak, func_name)
-        
-        # 在线程池中执行同步的 akshare 调用
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, lambda: ak_func(**kwargs))
-        
-        return result
-        
-    except AttributeError:
-        # akshare 函数不存在
-        print(f"错误: akshare 中不存在函数 {func_name}")
+        result = await _fetch_akshare(func_name, kwargs)
+    except asyncio.CancelledError:
+        pending.cancel()
+        raise
+    except BaseException as e:
+        pending.set_exception(e)
+        # 标记异常已被读取，避免无人等待时输出 "exception was never retrieved"
+        pending.exception()
+        raise
+    else:
+        if isinstance(result, pd.DataFrame):
+            _ak_cache_put(cache_key, result, ttl)
+        pending.set_result(result)
+    finally:
+        del _AK_INFLIGHT[cache_key]
+
+    return result.copy(deep=False) if isinstance(result, pd.DataFrame) else result
+
+
+def _get_ak_sem() -> asyncio.Semaphore:
+    """获取当前事件循环的 akshare 全局并发信号量
+
+    Python 3.10 以前 asyncio.Semaphore 在创建时绑定当前事件循环，在模块导入时创建会
+    绑定到错误的循环。因此在首次使用时于运行中的循环内创建，事件循环变化时重新创建。
+
+    Returns:
+        asyncio.Semaphore: 名额为 AKSHARE_MAX_WORKERS 的信号量
+    """
+    global _ak_sem, _ak_sem_loop
+
+    loop = asyncio.get_running_loop()
+    if _ak_sem is None or _ak_sem_loop is not loop:
+        _ak_sem = asyncio.Semaphore(AKSHARE_MAX_WORKERS)
+        _ak_sem_loop = loop
+    return _ak_sem
+
+
+def _get_endpoint_sem(func_name: str) -> Optional[asyncio.Semaphore]:
+    """获取单个 akshare 接口的并发信号量
+
+    信号量在首次调用该接口时于运行中的事件循环内创建（原因见 _get_ak_sem），
+    事件循环变化时全部重新创建。
+
+    Args:
+        func_name (str): akshare 函数名称
+
+    Returns:
+        Optional[asyncio.Semaphore]: 接口的信号量，未限制并发的接口返回 None
+    """
+    global _ak_endpoint_sems_loop
+
+    limit = _AK_ENDPOINT_LIMITS.get(func_name)
+    if limit is None:
         return None
-        
+
+    loop = asyncio.get_running_loop()
+    if _ak_endpoint_sems_loop is not loop:
+        _ak_endpoint_sems.clear()
+        _ak_endpoint_sems_loop = loop
+    sem = _ak_endpoint_sems.get(func_name)
+    if sem is None:
+        sem = _ak_endpoint_sems[func_name] = asyncio.Semaphore(limit)
+    return sem
+
+
+async def _fetch_akshare(func_name: str, kwargs: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """在专用线程池中执行 akshare 调用，不经过缓存
+
+    Args:
+        func_name (str): akshare 函数名称
+        kwargs (Dict[str, Any]): 传递给 akshare 函数的参数
+
+    Returns:
+        Optional[pd.DataFrame]: 成功时返回数据框，失败时返回 None
+    """
+    try:
+        # 限制同时进行的调用数；有接口名额的先取接口名额再取全局名额，排队等待接口名额时不占用全局名额
+        endpoint_sem = _get_endpoint_sem(func_name)
+        if endpoint_sem is None:
+            async with _get_ak_sem():
+                return await _run_akshare(func_name, kwargs)
+        async with endpoint_sem, _get_ak_sem():
+            return await _run_akshare(func_name, kwargs)
+
+    except Exception as e:
+        # 网络错误、数据错误等
+        logger.error("调用 %s 失败: %s", func_name, e)
+        return None
+
+
+async def _run_akshare(func_name: str, kwargs: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """执行一次 akshare 调用，调用方负责并发限制和异常处理
+
+    Args:
+        func_name (str): akshare 函数名称
+        kwargs (Dict[str, Any]): 传递给 akshare 函数的参数
+
+    Returns:
+        Optional[pd.DataFrame]: akshare 函数的返回值，函数不存在时返回 None
+    """
+    result = None
+    if func_name == "stock_zh_a_hist":
+        # 历史行情优先直接请求东方财富接口，失败时再走 akshare
+        result = await _direct_eastmoney_kline(**kwargs)
+    if result is None:
+        # 在专用线程池中执行同步的 akshare 调用（含首次导入）
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_AK_POOL, functools.partial(_call_akshare, func_name, kwargs))
+    return result
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """获取共享的 HTTP 客户端
+
+    安装了 h2 时启用 HTTP/2，否则使用 HTTP/1.1。
+
+    Returns:
+        httpx.AsyncClient: 共享的异步 HTTP 客户端
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=40, keepalive_expiry=30),
+            timeout=REQUEST_TIMEOUT,
+            headers={"User-Agent": USER_AGENT},
+        )
+    return _http_client
+
+
+async def _direct_eastmoney_kline(
+    symbol: str,
+    period: str = DEFAULT_PERIOD,
+    start_date: str = "19700101",
+    end_date: str = "20500101",
+    adjust: str = ""
+) -> Optional[pd.DataFrame]:
+    """直接请求东方财富K线接口获取历史行情
+
+    与 akshare 的 stock_zh_a_hist 请求同一个接口、返回相同的列，
+    但通过共享的异步客户端发送，不占用线程池且复用连接。
+
+    Args:
+        symbol (str): 股票代码
+        period (str, optional): 数据周期 (daily/weekly/monthly). Defaults to DEFAULT_PERIOD.
+        start_date (str, optional): 开始日期 (YYYYMMDD). Defaults to "19700101".
+        end_date (str, optional): 结束日期 (YYYYMMDD). Defaults to "20500101".
+        adjust (str, optional): 复权方式 (""/qfq/hfq). Defaults to "".
+
+    Returns:
+        Optional[pd.DataFrame]: 历史行情数据框；参数不受支持或请求、解析失败时返回 None，
+            由调用方改用 akshare
+    """
+    if period not in _KLINE_PERIODS or adjust not in _KLINE_ADJUSTS:
+        return None
+
+    params = {
+        "fields1": "f1,f2,f3,f4,f5,f6",
+        "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
+        "ut": "7eea3edcaed734bea9cbfc24409ed989",
+        "klt": _KLINE_PERIODS[period],
+        "fqt": _KLINE_ADJUSTS[adjust],
+        "secid": f"{1 if symbol.startswith('6') else 0}.{symbol}",
+        "beg": start_date,
+        "end": end_date,
+    }
+    try:
+        response = await _get_http_client().get(EASTMONEY_KLINE_URL, params=params)
+        response.raise_for_status()
+        data = response.json().get("data") or {}
+        klines = data.get("klines") or []
+        if not klines:
+            return pd.DataFrame()
+
+        df = pd.DataFrame([line.split(",") for line in klines], columns=_KLINE_COLUMNS)
     except Exception as e:
-        # 其他异常（网络错误、数据错误等）
-        print(f"调用 {func_name} 失败: {str(e)}")
+        logger.warning("直接获取 %s 历史行情失败，改用 akshare: %s", symbol, e)
         return None
 
+    # 与 akshare 返回的列和类型保持一致
+    df["日期"] = pd.to_datetime(df["日期"], errors="coerce").dt.date
+    df.insert(1, "股票代码", symbol)
+    numeric_columns = _KLINE_COLUMNS[1:]
+    df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors="coerce")
+    return df
+
+
+def _get_code_name_lock() -> asyncio.Lock:
+    """获取当前事件循环的对照表刷新锁
+
+    Python 3.10 以前 asyncio.Lock 在创建时绑定当前事件循环，在模块导入时创建会绑定到
+    错误的循环，发生争用时报 "attached to a different loop"。因此在首次使用时于运行中的
+    循环内创建，事件循环变化时重新创建。
+
+    Returns:
+        asyncio.Lock: 对照表刷新锁
+    """
+    global _code_name_lock, _code_name_lock_loop
+
+    loop = asyncio.get_running_loop()
+    if _code_name_lock is None or _code_name_lock_loop is not loop:
+        _code_name_lock = asyncio.Lock()
+        _code_name_lock_loop = loop
+    return _code_name_lock
+
+
+async def _get_code_name_df() -> Optional[tuple[pd.DataFrame, Dict[str, str]]]:
+    """获取股票代码名称对照表（带缓存）
+
+    对照表包含全部 A 股，每天最多变化一次，缓存 CODE_NAME_CACHE_TTL 秒，
+    避免每次查询都重新下载。并发查询在锁上排队，只触发一次下载。
+    缓存时额外生成 name_lower 列，供名称搜索做不区分大小写的匹配。
+
+    Returns:
+        Optional[tuple[pd.DataFrame, Dict[str, str]]]: (对照表, 代码到名称的映射)，
+            获取失败或数据为空时返回 None
+    """
+    global _code_name_cache
+
+    cached = _code_name_cache
+    if cached is not None and time.monotonic() - cached[0] < CODE_NAME_CACHE_TTL:
+        return cached[1], cached[2]
+
+    async with _get_code_name_lock():
+        # 等锁期间可能已被其他协程刷新
+        cached = _code_name_cache
+        if cached is not None and time.monotonic() - cached[0] < CODE_NAME_CACHE_TTL:
+            return cached[1], cached[2]
+
+        df = await safe_akshare_call("stock_info_a_code_name")
+        if df is None or df.empty:
+            return None
+
+        code_to_name = dict(zip(df['code'], df['name']))
+        # 预先生成小写名称列，名称搜索不区分大小写（如 "st" 可匹配 "ST"）
+        df['name_lower'] = df['name'].str.lower()
+        _code_name_cache = (time.monotonic(), df, code_to_name)
+        return df, code_to_name
+
+
+def _format_cell(value: Any) -> str:
+    """格式化单个单元格的值
+
+    Args:
+        value (Any): 单元格的值
+
+    Returns:
+        str: 缺失值返回 "N/A"，浮点数保留两位小数，其他值转为字符串
+    """
+    if pd.isna(value):
+        return "N/A"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+@functools.lru_cache(maxsize=4096)
+def _pad_display(text: str, width: int) -> str:
+    """按终端显示宽度在右侧补齐空格
+
+    中文等全角字符占两列，直接用 f"{text:10s}" 会按字符数补齐导致表格错位。
+    股票和板块名称在各排行榜中反复出现，按 (文本, 宽度) 缓存结果。
+
+    Args:
+        text (str): 待补齐的文本
+        width (int): 目标显示宽度
+
+    Returns:
+        str: 补齐后的文本，超过目标宽度时原样返回
+    """
+    used = sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+    return text + " " * (width - used)
+
+
+def _latest_value(df: pd.DataFrame, column: str, default: Any = 0) -> Any:
+    """读取数据框指定列最后一行的值
+
+    Args:
+        df (pd.DataFrame): 数据框
+        column (str): 列名
+        default (Any, optional): 列不存在时的默认值. Defaults to 0.
+
+    Returns:
+        Any: 最后一行的值，列不存在时返回默认值
+    """
+    return df[column].iat[-1] if column in df.columns else default
+
+
+def _text_values(df: pd.DataFrame, column: str, default: str = "N/A") -> list[str]:
+    """一次性取出文本列的全部值
+
+    Args:
+        df (pd.DataFrame): 数据框
+        column (str): 列名
+        default (str, optional): 列不存在时的默认值. Defaults to "N/A".
+
+    Returns:
+        list[str]: 转为字符串后的列值
+    """
+    if column not in df.columns:
+        return [default] * len(df)
+    return df[column].astype(str).tolist()
+
+
+def _column_values(df: pd.DataFrame, column: str, default: Any = 0) -> tuple[np.ndarray, np.ndarray]:
+    """一次性取出数值列的浮点数值和原始值
+
+    字符串列（如 "1.23%"）先去掉百分号再转换，无法转换的位置数值为 NaN。
+
+    Args:
+        df (pd.DataFrame): 数据框
+        column (str): 列名
+        default (Any, optional): 列不存在时的默认值. Defaults to 0.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (浮点数值, 原始值)
+    """
+    series = df[column] if column in df.columns else pd.Series([default] * len(df), index=df.index)
+    # 数值列直接取底层数组，float64 列不产生拷贝；只有字符串列才需要解析
+    numeric = series
+    if not pd.api.types.is_numeric_dtype(series):
+        numeric = pd.to_numeric(series.astype(str).str.rstrip('%'), errors='coerce')
+    return numeric.to_numpy(dtype=float, na_value=np.nan), series.to_numpy()
+
+
+def _coerce_numeric(df: pd.DataFrame, column: str) -> None:
+    """把可能带百分号的字符串列原地转换为浮点数
+
+    在格式化前整列转换一次，表格和统计直接使用数值；列不存在或已是数值类型时不处理。
+
+    Args:
+        df (pd.DataFrame): 数据框
+        column (str): 列名
+    """
+    if column in df.columns and not pd.api.types.is_numeric_dtype(df[column]):
+        df[column] = _column_values(df, column)[0]
+
+def _sign_counts(df: pd.DataFrame, column: str) -> tuple[int, int, int]:
+    """统计数值列中正数、负数和零的个数
+
+    一次 np.sign + np.bincount 完成三类计数，缺失值和无法转换为数值的不计入。
+
+    Args:
+        df (pd.DataFrame): 数据框
+        column (str): 列名
+
+    Returns:
+        tuple[int, int, int]: (正数个数, 负数个数, 零的个数)
+    """
+    values = _column_values(df, column)[0]
+    values = values[~np.isnan(values)]
+    counts = np.bincount(np.sign(values).astype(np.int8) + 1, minlength=3)
+    return int(counts[2]), int(counts[0]), int(counts[1])
+
+def _flow_stats(df: pd.DataFrame, column: str) -> tuple[int, int, float]:
+    """统计资金流向列的净流入个数、净流出个数和合计值
+
+    与 _sign_counts 共用一次列转换，计数和求和都在同一个数组上完成。
+
+    Args:
+        df (pd.DataFrame): 数据框
+        column (str): 列名
+
+    Returns:
+        tuple[int, int, float]: (净流入个数, 净流出个数, 合计值)
+    """
+    values = _column_values(df, column)[0]
+    values = values[~np.isnan(values)]
+    counts = np.bincount(np.sign(values).astype(np.int8) + 1, minlength=3)
+    return int(counts[2]), int(counts[0]), float(values.sum())
+
+def _format_numbers(df: pd.DataFrame, column: str, spec: str, width: int, scale: float = 1) -> list[str]:
+    """按格式说明格式化数值列
+
+    Args:
+        df (pd.DataFrame): 数据框
+        column (str): 列名
+        spec (str): 数值的格式说明，如 "7.2f"
+        width (int): 无法转换为数值时原值右对齐的宽度
+        scale (float, optional): 格式化前数值除以的倍数，如 1e8 表示以亿为单位. Defaults to 1.
+
+    Returns:
+        list[str]: 每行格式化后的文本
+    """
+    values, raw = _column_values(df, column)
+    return [
+        format(value, spec) if value == value else f"{str(original):>{width}s}"
+        for value, original in zip((values / scale).tolist(), raw)
+    ]
+
+
+def _format_signed(
+    df: pd.DataFrame,
+    column: str,
+    width: int,
+    precision: int = 2,
+    unit: str = "",
+    suffixes: tuple[str, str, str] = ("", "", ""),
+    scale: float = 1
+) -> list[str]:
+    """格式化带涨跌方向的数值列
+
+    正数带 "+" 号，并按 (下跌, 持平, 上涨) 在单位后追加 suffixes 中的标识；
+    无法转换为数值的原值右对齐显示。
+
+    Args:
+        df (pd.DataFrame): 数据框
+        column (str): 列名
+        width (int): 数值部分的宽度（含符号）
+        precision (int, optional): 小数位数. Defaults to 2.
+        unit (str, optional): 数值后的单位，如 "%"、"亿". Defaults to "".
+        suffixes (tuple[str, str, str], optional): 下跌、持平、上涨时的后缀. Defaults to 无后缀.
+        scale (float, optional): 格式化前数值除以的倍数. Defaults to 1.
+
+    Returns:
+        list[str]: 每行格式化后的文本
+    """
+    values, raw = _column_values(df, column)
+    values = values / scale
+    # 一次性算出每行的方向下标，循环内按下标查表而不是逐行比较大小；NaN 行走原值分支
+    direction = (np.sign(np.nan_to_num(values)).astype(np.int8) + 1).tolist()
+    # 正数的 "+" 号占一位，数值部分少一位以保持列宽
+    templates = tuple(
+        f"{prefix}{{:{width - len(prefix)}.{precision}f}}{unit}{suffix}"
+        for prefix, suffix in zip(_SIGN_PREFIX, suffixes)
+    )
+    return [
+        templates[d].format(value) if value == value else f"{str(original):>{width + len(unit)}s}"
+        for value, original, d in zip(values.tolist(), raw, direction)
+    ]
+
 
 def format_dataframe_to_string(df: pd.DataFrame, title: str = "数据") -> str:
     """将 DataFrame 格式化为可读字符串
@@ -174,28 +953,46 @@ def format_dataframe_to_string(df: pd.DataFrame, title: str = "数据") -> str:
     if df is None or df.empty:
         return f"=== {title} ===\n暂无数据\n"
     
-    # 构建格式化字符串
-    result = f"=== {title} ===\n"
-    
-    # 遍历每一行数据
-    for _, row in df.iterrows():
-        # 构建单行数据字符串
-        row_data = []
-        for col, value in row.items():
-            # 格式化数值
-            if pd.isna(value):
-                formatted_value = "N/A"
-            elif isinstance(value, float):
-                formatted_value = f"{value:.2f}"
-            else:
-                formatted_value = str(value)
-            
-            row_data.append(f"{col}: {formatted_value}")
-        
-        # 添加到结果中
-        result += ", ".join(row_data) + "\n"
+    # 按列整体格式化，避免 iterrows 为每一行构造 Series
+    formatted_columns = []
+    for i, col in enumerate(df.columns):
+        series = df.iloc[:, i]
+        if pd.api.types.is_float_dtype(series):
+            # 浮点列保留两位小数，缺失值显示为 N/A
+            values = series.map("{:.2f}".format).where(series.notna(), "N/A")
+        else:
+            values = series.map(_format_cell)
+        prefix = f"{col}: "
+        formatted_columns.append([prefix + value for value in values])
     
-    return result
+    # 逐行拼接后一次性 join，避免字符串反复相加
+    lines = [f"=== {title} ==="]
+    lines.extend(", ".join(row) for row in zip(*formatted_columns))
+    return "\n".join(lines) + "\n"
+
+
+def format_dataframe_to_table(df: pd.DataFrame, title: str = "数据") -> str:
+    """将 DataFrame 格式化为对齐的文本表格
+
+    使用 pandas 自带的 to_string 输出，列名只出现一次，适合列数较多的数值数据。
+
+    Args:
+        df (pd.DataFrame): 要格式化的数据框
+        title (str, optional): 数据标题. Defaults to "数据".
+
+    Returns:
+        str: 格式化后的字符串
+
+    Example:
+        >>> df = pd.DataFrame({"日期": ["2024-12-13"], "收盘": [10.50]})
+        >>> format_dataframe_to_table(df, "股票数据")
+        "=== 股票数据 ===\n        日期    收盘\n2024-12-13 10.50\n"
+    """
+    if df is None or df.empty:
+        return f"=== {title} ===\n暂无数据\n"
+
+    table = df.to_string(index=False, float_format=lambda x: f"{x:.2f}", na_rep="N/A")
+    return f"=== {title} ===\n{table}\n"
 
 
 @mcp.tool()
@@ -231,6 +1028,7 @@ async def get_stock_history(
             - 日期、股票代码、开盘价、收盘价、最高价、最低价
             - 成交量（手）、成交额（元）、振幅（%）、涨跌幅（%）
             - 涨跌额（元）、换手率（%）
+            超过 MAX_RESPONSE_ROWS 条时只显示最近的 MAX_RESPONSE_ROWS 条
 
     Raises:
         无直接异常抛出，所有错误都转换为错误信息字符串返回
@@ -242,28 +1040,18 @@ async def get_stock_history(
         >>> await get_stock_history("600519", "weekly")
         "=== 600519 历史行情数据 ===\\n日期: 2024-12-09, 开盘: 1650.00, ..."
     """
-    # 第一步：验证股票代码格式
-    if not validate_stock_symbol(symbol):
-        return f"错误: 股票代码格式无效。请输入6位数字代码，如 '000001'，当前输入: '{symbol}'"
-
-    # 第二步：验证数据周期参数
-    valid_periods = ["daily", "weekly", "monthly"]
-    if period not in valid_periods:
-        return f"错误: 数据周期无效。支持的周期: {', '.join(valid_periods)}，当前输入: '{period}'"
+    # 第一步：验证股票代码、数据周期和复权方式
+    if err := _validate(symbol=symbol, period=period, adjust=adjust):
+        return err
 
-    # 第三步：验证复权方式参数
-    valid_adjusts = ["", "qfq", "hfq"]
-    if adjust not in valid_adjusts:
-        return f"错误: 复权方式无效。支持的方式: {', '.join(valid_adjusts)}，当前输入: '{adjust}'"
-
-    # 第四步：格式化日期参数
+    # 第二步：格式化日期参数
     try:
         formatted_start = format_date_string(start_date) if start_date else ""
         formatted_end = format_date_string(end_date) if end_date else ""
     except ValueError as e:
         return f"错误: {str(e)}"
 
-    # 第五步：构建 akshare 调用参数
+    # 第三步：构建 akshare 调用参数
     ak_params = {
         "symbol": symbol,
         "period": period,
@@ -276,11 +1064,11 @@ async def get_stock_history(
     if formatted_end:
         ak_params["end_date"] = formatted_end
 
-    # 第六步：调用 akshare 获取数据
-    print(f"正在获取股票 {symbol} 的历史行情数据...")
+    # 第四步：调用 akshare 获取数据
+    logger.info("正在获取股票 %s 的历史行情数据...", symbol)
     df = await safe_akshare_call("stock_zh_a_hist", **ak_params)
 
-    # 第七步：检查数据获取结果
+    # 第五步：检查数据获取结果
     if df is None:
         return f"错误: 无法获取股票 {symbol} 的历史数据。请检查股票代码是否正确或稍后重试。"
 
@@ -288,20 +1076,26 @@ async def get_stock_history(
         date_info = f"（{formatted_start} 到 {formatted_end}）" if formatted_start or formatted_end else ""
         return f"暂无数据: 股票 {symbol} 在指定时间范围内{date_info}没有交易数据。"
 
-    # 第八步：格式化数据并返回
+    # 第六步：格式化数据并返回
     title = f"{symbol} 历史行情数据（{period}）"
     if formatted_start or formatted_end:
         title += f" - {formatted_start or '开始'} 至 {formatted_end or '最新'}"
 
-    result = format_dataframe_to_string(df, title)
+    # 不限日期范围时可能返回上市以来的全部记录，只格式化最近的部分以限制响应大小
+    total_rows = len(df)
+    if total_rows > MAX_RESPONSE_ROWS:
+        df = df.iloc[-MAX_RESPONSE_ROWS:]
+
+    parts = [format_dataframe_to_string(df, title)]
 
     # 添加数据统计信息
-    result += f"\n数据统计: 共 {len(df)} 条记录"
-    if not df.empty:
-        latest_date = df.iloc[-1]['日期'] if '日期' in df.columns else "未知"
-        result += f"，最新日期: {latest_date}"
+    parts.append(f"\n数据统计: 共 {total_rows} 条记录")
+    if total_rows > MAX_RESPONSE_ROWS:
+        parts.append(f"（仅显示最近 {MAX_RESPONSE_ROWS} 条，可指定日期范围查询更早的数据）")
+    latest_date = df['日期'].iat[-1] if '日期' in df.columns else "未知"
+    parts.append(f"，最新日期: {latest_date}")
 
-    return result
+    return "".join(parts)
 
 
 @mcp.tool()
@@ -344,40 +1138,30 @@ async def get_stock_intraday(
         >>> await get_stock_intraday("600519", period="30")
         "=== 600519 分时数据 (30分钟) ===\\n时间: 09:30:00, 开盘: 1650.00, ..."
     """
-    # 第一步：验证股票代码格式
-    if not validate_stock_symbol(symbol):
-        return f"错误: 股票代码格式无效。请输入6位数字代码，如 '000001'，当前输入: '{symbol}'"
-
-    # 第二步：验证分时间隔参数
-    valid_periods = ["1", "5", "15", "30", "60"]
-    if period not in valid_periods:
-        return f"错误: 分时间隔无效。支持的间隔: {', '.join(valid_periods)} 分钟，当前输入: '{period}'"
-
-    # 第三步：验证复权方式参数
-    valid_adjusts = ["", "qfq", "hfq"]
-    if adjust not in valid_adjusts:
-        return f"错误: 复权方式无效。支持的方式: {', '.join(valid_adjusts)}，当前输入: '{adjust}'"
+    # 第一步：验证股票代码、分时间隔和复权方式
+    if err := _validate(symbol=symbol, period=period, adjust=adjust, intraday=True):
+        return err
 
-    # 第四步：1分钟数据的特殊处理
+    # 第二步：1分钟数据的特殊处理
     if period == "1" and adjust:
         return "警告: 1分钟数据不支持复权，已自动设置为不复权模式。"
 
-    # 第五步：格式化日期参数
+    # 第三步：格式化日期参数
     try:
         if date:
             formatted_date = format_date_string(date)
         else:
             # 如果没有指定日期，使用今天的日期
-            formatted_date = datetime.now().strftime("%Y%m%d")
+            formatted_date = _today_str()
     except ValueError as e:
         return f"错误: {str(e)}"
 
-    # 第六步：构建时间范围（akshare 需要开始和结束时间）
+    # 第四步：构建时间范围（akshare 需要开始和结束时间）
     # 对于单日查询，设置为当天的交易时间范围
     start_datetime = f"{formatted_date} 09:30:00"  # 开盘时间
     end_datetime = f"{formatted_date} 15:00:00"    # 收盘时间
 
-    # 第七步：构建 akshare 调用参数
+    # 第五步：构建 akshare 调用参数
     ak_params = {
         "symbol": symbol,
         "start_date": start_datetime,
@@ -386,36 +1170,36 @@ async def get_stock_intraday(
         "adjust": adjust if period != "1" else ""  # 1分钟数据强制不复权
     }
 
-    # 第八步：调用 akshare 获取分时数据
-    print(f"正在获取股票 {symbol} 的分时数据（{period}分钟间隔）...")
+    # 第六步：调用 akshare 获取分时数据
+    logger.info("正在获取股票 %s 的分时数据（%s分钟间隔）...", symbol, period)
     df = await safe_akshare_call("stock_zh_a_hist_min_em", **ak_params)
 
-    # 第九步：检查数据获取结果
+    # 第七步：检查数据获取结果
     if df is None:
         return f"错误: 无法获取股票 {symbol} 的分时数据。请检查股票代码是否正确或稍后重试。"
 
     if df.empty:
         return f"暂无数据: 股票 {symbol} 在 {formatted_date} 没有分时交易数据。可能是非交易日或数据尚未更新。"
 
-    # 第十步：格式化数据并返回
+    # 第八步：格式化数据并返回
     title = f"{symbol} 分时数据 ({period}分钟间隔)"
     if date:
         title += f" - {formatted_date}"
 
-    result = format_dataframe_to_string(df, title)
+    parts = [format_dataframe_to_string(df, title)]
 
     # 添加数据统计信息
-    result += f"\n数据统计: 共 {len(df)} 个时间点"
-    if not df.empty and '时间' in df.columns:
+    parts.append(f"\n数据统计: 共 {len(df)} 个时间点")
+    if '时间' in df.columns:
         first_time = df.iloc[0]['时间']
         last_time = df.iloc[-1]['时间']
-        result += f"，时间范围: {first_time} - {last_time}"
+        parts.append(f"，时间范围: {first_time} - {last_time}")
 
     # 添加特殊提示
     if period == "1":
-        result += "\n注意: 1分钟数据仅包含近5个交易日且不支持复权。"
+        parts.append("\n注意: 1分钟数据仅包含近5个交易日且不支持复权。")
 
-    return result
+    return "".join(parts)
 
 
 @mcp.tool()
@@ -423,6 +1207,7 @@ async def get_recent_history(symbol: str, adjust: str = "") -> str:
     """获取股票近期历史行情
 
     快速获取指定股票近20天的历史交易数据，便于了解股票近期走势。
+    行情数据与股票代码名称对照表并发获取，标题中附带股票名称。
     这是 MCP 工具函数，为 AI 模型提供快速的近期行情查询能力。
 
     Args:
@@ -446,19 +1231,14 @@ async def get_recent_history(symbol: str, adjust: str = "") -> str:
         >>> await get_recent_history("600519", "qfq")
         "=== 600519 近期历史行情（前复权） ===\\n日期: 2024-12-11, 收盘: 1645.50, ..."
     """
-    # 第一步：验证股票代码格式
-    if not validate_stock_symbol(symbol):
-        return f"错误: 股票代码格式无效。请输入6位数字代码，如 '000001'，当前输入: '{symbol}'"
-
-    # 第二步：验证复权方式参数
-    valid_adjusts = ["", "qfq", "hfq"]
-    if adjust not in valid_adjusts:
-        return f"错误: 复权方式无效。支持的方式: {', '.join(valid_adjusts)}，当前输入: '{adjust}'"
+    # 第一步：验证股票代码和复权方式
+    if err := _validate(symbol=symbol, adjust=adjust):
+        return err
 
-    # 第三步：获取近期日期范围
+    # 第二步：获取近期日期范围
     start_date, end_date = get_recent_date_range()
 
-    # 第四步：构建 akshare 调用参数
+    # 第三步：构建 akshare 调用参数
     ak_params = {
         "symbol": symbol,
         "period": "daily",  # 固定使用日线数据
@@ -467,69 +1247,73 @@ async def get_recent_history(symbol: str, adjust: str = "") -> str:
         "adjust": adjust
     }
 
-    # 第五步：调用 akshare 获取数据
-    print(f"正在获取股票 {symbol} 的近期历史行情（{start_date} - {end_date}）...")
-    df = await safe_akshare_call("stock_zh_a_hist", **ak_params)
+    # 第四步：并发获取行情数据和代码名称对照表（对照表带缓存，用于标题中的股票名称）
+    logger.info("正在获取股票 %s 的近期历史行情（%s - %s）...", symbol, start_date, end_date)
+    df, code_name = await asyncio.gather(
+        safe_akshare_call("stock_zh_a_hist", **ak_params),
+        _get_code_name_df(),
+        return_exceptions=True
+    )
 
-    # 第六步：检查数据获取结果
-    if df is None:
+    # 第五步：检查数据获取结果
+    if df is None or isinstance(df, BaseException):
         return f"错误: 无法获取股票 {symbol} 的近期历史数据。请检查股票代码是否正确或稍后重试。"
 
     if df.empty:
         return f"暂无数据: 股票 {symbol} 在近{RECENT_DAYS}天内没有交易数据。可能是连续非交易日。"
 
-    # 第七步：格式化数据标题
-    title = f"{symbol} 近期历史行情（近{RECENT_DAYS}天）"
+    # 第六步：格式化数据标题
+    # 对照表获取失败时只是标题中不显示名称
+    name = None if code_name is None or isinstance(code_name, BaseException) else code_name[1].get(symbol)
+    title = f"{symbol} {name}" if name else symbol
+    title += f" 近期历史行情（近{RECENT_DAYS}天）"
     if adjust:
         adjust_name = {"qfq": "前复权", "hfq": "后复权"}[adjust]
         title += f" - {adjust_name}"
 
-    # 第八步：格式化基础数据
-    result = format_dataframe_to_string(df, title)
+    # 第七步：格式化基础数据
+    parts = [format_dataframe_to_string(df, title)]
 
-    # 第九步：添加简单的趋势分析
+    # 第八步：添加简单的趋势分析
     if len(df) >= 2 and '收盘' in df.columns and '涨跌幅' in df.columns:
-        result += "\n=== 趋势分析 ===\n"
-
-        # 获取最新和前一交易日的数据
-        latest = df.iloc[-1]
-        previous = df.iloc[-2] if len(df) >= 2 else None
+        parts.append("\n=== 趋势分析 ===\n")
 
-        # 最新交易日信息
-        latest_date = latest['日期'] if '日期' in df.columns else "最新"
-        latest_close = latest['收盘']
-        latest_change = latest['涨跌幅']
+        # 一次性取出底层数组，避免逐行 .iloc 和标签访问带来的标量装箱开销
+        closes = df['收盘'].to_numpy()
+        latest_date = df['日期'].iat[-1] if '日期' in df.columns else "最新"
+        latest_close = float(closes[-1])
+        latest_change = float(df['涨跌幅'].to_numpy()[-1])
 
-        result += f"最新交易日（{latest_date}）: 收盘价 {latest_close:.2f}元"
+        parts.append(f"最新交易日（{latest_date}）: 收盘价 {latest_close:.2f}元")
 
         # 涨跌幅分析
         if latest_change > 0:
-            result += f"，上涨 {latest_change:.2f}% 📈\n"
+            parts.append(f"，上涨 {latest_change:.2f}% 📈\n")
         elif latest_change < 0:
-            result += f"，下跌 {abs(latest_change):.2f}% 📉\n"
+            parts.append(f"，下跌 {abs(latest_change):.2f}% 📉\n")
         else:
-            result += f"，平盘 {latest_change:.2f}% ➡️\n"
+            parts.append(f"，平盘 {latest_change:.2f}% ➡️\n")
 
         # 近期走势分析
-        if previous is not None:
-            prev_close = previous['收盘']
-            price_change = latest_close - prev_close
-            change_pct = (price_change / prev_close) * 100
-
-            if change_pct > 0:
-                trend = "上升趋势"
-            elif change_pct < 0:
-                trend = "下降趋势"
-            else:
-                trend = "横盘整理"
+        prev_close = float(closes[-2])
+        price_change = latest_close - prev_close
+        change_pct = (price_change / prev_close) * 100
+
+        if change_pct > 0:
+            trend = "上升趋势"
+        elif change_pct < 0:
+            trend = "下降趋势"
+        else:
+            trend = "横盘整理"
 
-            result += f"较前一交易日: {trend}，价格变化 {price_change:+.2f}元 ({change_pct:+.2f}%)\n"
+        parts.append(f"较前一交易日: {trend}，价格变化 {price_change:+.2f}元 ({change_pct:+.2f}%)\n")
 
         # 成交量分析（如果有数据）
         if '成交量' in df.columns:
-            avg_volume = df['成交量'].mean()
-            latest_volume = latest['成交量']
-            volume_ratio = latest_volume / avg_volume if avg_volume > 0 else 1
+            vols = df['成交量'].to_numpy()
+            avg_volume = float(vols.mean())
+            latest_volume = vols[-1]
+            volume_ratio = float(latest_volume) / avg_volume if avg_volume > 0 else 1.0
 
             if volume_ratio > 1.5:
                 volume_desc = "放量"
@@ -538,15 +1322,14 @@ async def get_recent_history(symbol: str, adjust: str = "") -> str:
             else:
                 volume_desc = "正常"
 
-            result += f"成交量: {latest_volume}手，相对近期平均 {volume_desc} ({volume_ratio:.1f}倍)\n"
+            parts.append(f"成交量: {latest_volume}手，相对近期平均 {volume_desc} ({volume_ratio:.1f}倍)\n")
 
-    # 第十步：添加数据统计信息
-    result += f"\n数据统计: 共 {len(df)} 个交易日"
-    if not df.empty:
-        date_range = f"{df.iloc[0]['日期']} 至 {df.iloc[-1]['日期']}" if '日期' in df.columns else "未知范围"
-        result += f"，时间范围: {date_range}"
+    # 第九步：添加数据统计信息
+    parts.append(f"\n数据统计: 共 {len(df)} 个交易日")
+    date_range = f"{df.iloc[0]['日期']} 至 {df.iloc[-1]['日期']}" if '日期' in df.columns else "未知范围"
+    parts.append(f"，时间范围: {date_range}")
 
-    return result
+    return "".join(parts)
 
 
 @mcp.tool()
@@ -574,11 +1357,11 @@ async def get_stock_info(symbol: str) -> str:
         "=== 000002 股票基本信息 ===\\n股票简称: 万科A, 最新价: 7.05元\\n..."
     """
     # 第一步：验证股票代码格式
-    if not validate_stock_symbol(symbol):
-        return f"错误: 股票代码格式无效。请输入6位数字代码，如 '000001'，当前输入: '{symbol}'"
+    if err := _validate(symbol=symbol):
+        return err
 
     # 第二步：调用 akshare 获取个股信息
-    print(f"正在获取股票 {symbol} 的基本信息...")
+    logger.info("正在获取股票 %s 的基本信息...", symbol)
     df = await safe_akshare_call("stock_individual_info_em", symbol=symbol)
 
     # 第三步：检查数据获取结果
@@ -591,32 +1374,31 @@ async def get_stock_info(symbol: str) -> str:
     # 第四步：解析数据并格式化
     try:
         # 将 DataFrame 转换为字典，方便查找
-        info_dict = {}
-        for _, row in df.iterrows():
-            item = str(row['item']).strip()
-            value = str(row['value']).strip()
-            info_dict[item] = value
+        info_dict = dict(zip(
+            df['item'].astype(str).str.strip(),
+            df['value'].astype(str).str.strip()
+        ))
 
         # 构建格式化结果
-        result = f"=== {symbol} 股票基本信息 ===\n"
+        parts = [f"=== {symbol} 股票基本信息 ===\n"]
 
         # 基本信息
         stock_name = info_dict.get('股票简称', 'N/A')
         stock_code = info_dict.get('股票代码', symbol)
         latest_price = info_dict.get('最新', 'N/A')
 
-        result += f"股票代码: {stock_code}\n"
-        result += f"股票简称: {stock_name}\n"
+        parts.append(f"股票代码: {stock_code}\n")
+        parts.append(f"股票简称: {stock_name}\n")
 
         # 价格信息
         if latest_price != 'N/A':
             try:
                 price_float = float(latest_price)
-                result += f"最新价格: {price_float:.2f}元\n"
+                parts.append(f"最新价格: {price_float:.2f}元\n")
             except ValueError:
-                result += f"最新价格: {latest_price}元\n"
+                parts.append(f"最新价格: {latest_price}元\n")
         else:
-            result += f"最新价格: 暂无数据\n"
+            parts.append(f"最新价格: 暂无数据\n")
 
         # 股本信息
         total_shares = info_dict.get('总股本', 'N/A')
@@ -625,20 +1407,20 @@ async def get_stock_info(symbol: str) -> str:
         if total_shares != 'N/A':
             try:
                 total_shares_float = float(total_shares)
-                result += f"总股本: {total_shares_float:,.0f}股\n"
+                parts.append(f"总股本: {total_shares_float:,.0f}股\n")
             except ValueError:
-                result += f"总股本: {total_shares}股\n"
+                parts.append(f"总股本: {total_shares}股\n")
         else:
-            result += f"总股本: 暂无数据\n"
+            parts.append(f"总股本: 暂无数据\n")
 
         if float_shares != 'N/A':
             try:
                 float_shares_float = float(float_shares)
-                result += f"流通股: {float_shares_float:,.0f}股\n"
+                parts.append(f"流通股: {float_shares_float:,.0f}股\n")
             except ValueError:
-                result += f"流通股: {float_shares}股\n"
+                parts.append(f"流通股: {float_shares}股\n")
         else:
-            result += f"流通股: 暂无数据\n"
+            parts.append(f"流通股: 暂无数据\n")
 
         # 市值信息
         total_market_cap = info_dict.get('总市值', 'N/A')
@@ -647,49 +1429,49 @@ async def get_stock_info(symbol: str) -> str:
         if total_market_cap != 'N/A':
             try:
                 total_cap_float = float(total_market_cap)
-                result += f"总市值: {total_cap_float:,.0f}元\n"
+                parts.append(f"总市值: {total_cap_float:,.0f}元\n")
             except ValueError:
-                result += f"总市值: {total_market_cap}元\n"
+                parts.append(f"总市值: {total_market_cap}元\n")
         else:
-            result += f"总市值: 暂无数据\n"
+            parts.append(f"总市值: 暂无数据\n")
 
         if float_market_cap != 'N/A':
             try:
                 float_cap_float = float(float_market_cap)
-                result += f"流通市值: {float_cap_float:,.0f}元\n"
+                parts.append(f"流通市值: {float_cap_float:,.0f}元\n")
             except ValueError:
-                result += f"流通市值: {float_market_cap}元\n"
+                parts.append(f"流通市值: {float_market_cap}元\n")
         else:
-            result += f"流通市值: 暂无数据\n"
+            parts.append(f"流通市值: 暂无数据\n")
 
         # 行业和上市时间
         industry = info_dict.get('行业', 'N/A')
         listing_date = info_dict.get('上市时间', 'N/A')
 
-        result += f"所属行业: {industry}\n"
+        parts.append(f"所属行业: {industry}\n")
 
         if listing_date != 'N/A' and listing_date.isdigit() and len(listing_date) == 8:
             # 格式化上市时间 YYYYMMDD -> YYYY-MM-DD
             formatted_date = f"{listing_date[:4]}-{listing_date[4:6]}-{listing_date[6:8]}"
-            result += f"上市时间: {formatted_date}\n"
+            parts.append(f"上市时间: {formatted_date}\n")
         else:
-            result += f"上市时间: {listing_date}\n"
+            parts.append(f"上市时间: {listing_date}\n")
 
         # 添加其他可能的信息
         other_fields = ['市盈率', '市净率', '每股收益', '每股净资产', '净资产收益率', '毛利率']
         for field in other_fields:
             if field in info_dict and info_dict[field] != 'N/A':
-                result += f"{field}: {info_dict[field]}\n"
+                parts.append(f"{field}: {info_dict[field]}\n")
 
         # 添加数据更新时间
-        result += f"\n数据更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        result += "\n数据来源: 东方财富"
+        parts.append(f"\n数据更新时间: {_now_str()}")
+        parts.append("\n数据来源: 东方财富")
 
-        return result
+        return "".join(parts)
 
     except Exception as e:
         # 如果解析失败，返回原始数据
-        print(f"解析股票信息时发生错误: {str(e)}")
+        logger.error("解析股票信息时发生错误: %s", e)
         title = f"{symbol} 股票基本信息（原始数据）"
         return format_dataframe_to_string(df, title)
 
@@ -718,135 +1500,128 @@ async def get_stock_chip_distribution(symbol: str, adjust: str = "") -> str:
 
     Example:
         >>> await get_stock_chip_distribution("000001")
-        "=== 000001 筹码分布数据 ===\\n日期: 2024-01-11, 获利比例: 7.44%, 平均成本: 11.25元\\n..."
+        "=== 000001 筹码分布数据 ===\\n        日期  获利比例  平均成本 ...\\n2024-01-11  0.07  11.25 ...\\n..."
 
         >>> await get_stock_chip_distribution("600519", "qfq")
-        "=== 600519 筹码分布数据（前复权） ===\\n日期: 2024-01-11, 获利比例: 15.32%, ..."
+        "=== 600519 筹码分布数据（前复权） ===\\n        日期  获利比例  平均成本 ...\\n..."
     """
-    # 第一步：验证股票代码格式
-    if not validate_stock_symbol(symbol):
-        return f"错误: 股票代码格式无效。请输入6位数字代码，如 '000001'，当前输入: '{symbol}'"
+    # 第一步：验证股票代码和复权方式
+    if err := _validate(symbol=symbol, adjust=adjust):
+        return err
 
-    # 第二步：验证复权方式参数
-    valid_adjusts = ["", "qfq", "hfq"]
-    if adjust not in valid_adjusts:
-        return f"错误: 复权方式无效。支持的方式: {', '.join(valid_adjusts)}，当前输入: '{adjust}'"
-
-    # 第三步：调用 akshare 获取筹码分布数据
-    print(f"正在获取股票 {symbol} 的筹码分布数据...")
+    # 第二步：调用 akshare 获取筹码分布数据
+    logger.info("正在获取股票 %s 的筹码分布数据...", symbol)
     df = await safe_akshare_call("stock_cyq_em", symbol=symbol, adjust=adjust)
 
-    # 第四步：检查数据获取结果
+    # 第三步：检查数据获取结果
     if df is None:
         return f"错误: 无法获取股票 {symbol} 的筹码分布数据。请检查股票代码是否正确或稍后重试。"
 
     if df.empty:
         return f"暂无数据: 股票 {symbol} 的筹码分布数据暂时无法获取。"
 
-    # 第五步：格式化数据标题
+    # 第四步：格式化数据标题
     title = f"{symbol} 筹码分布数据"
     if adjust:
         adjust_name = {"qfq": "前复权", "hfq": "后复权"}[adjust]
         title += f"（{adjust_name}）"
 
-    # 第六步：格式化基础数据（显示最近10条记录）
-    recent_df = df.tail(10) if len(df) > 10 else df
-    result = format_dataframe_to_string(recent_df, title)
-
-    # 第七步：添加筹码分析
-    if not df.empty:
-        result += "\n=== 筹码分析 ===\n"
-
-        # 获取最新数据
-        latest = df.iloc[-1]
-        # latest_date = latest['日期'] if '日期' in df.columns else "最新"
-
-        # 获利比例分析
-        profit_ratio = latest.get('获利比例', 0)
-        if isinstance(profit_ratio, (int, float)):
-            profit_pct = profit_ratio * 100 if profit_ratio <= 1 else profit_ratio
-            result += f"最新获利比例: {profit_pct:.2f}%"
-
-            if profit_pct > 80:
-                profit_desc = "（高位获利盘较多，存在抛压风险）"
-            elif profit_pct > 50:
-                profit_desc = "（获利盘适中，市场情绪相对平衡）"
-            elif profit_pct > 20:
-                profit_desc = "（获利盘较少，上涨阻力相对较小）"
-            else:
-                profit_desc = "（大部分投资者处于亏损状态）"
-
-            result += profit_desc + "\n"
-
-        # 平均成本分析
-        avg_cost = latest.get('平均成本', 0)
-        if isinstance(avg_cost, (int, float)) and avg_cost > 0:
-            result += f"平均成本: {avg_cost:.2f}元\n"
-
-        # 90%成本分布分析
-        cost_90_low = latest.get('90成本-低', 0)
-        cost_90_high = latest.get('90成本-高', 0)
-        concentration_90 = latest.get('90集中度', 0)
-
-        if all(isinstance(x, (int, float)) and x > 0 for x in [cost_90_low, cost_90_high, concentration_90]):
-            cost_range_90 = cost_90_high - cost_90_low
-            result += f"90%成本分布: {cost_90_low:.2f}元 - {cost_90_high:.2f}元"
-            result += f"（区间: {cost_range_90:.2f}元）\n"
-            result += f"90%集中度: {concentration_90:.4f}"
-
-            if concentration_90 > 0.15:
-                concentration_desc = "（筹码高度集中，波动性较大）"
-            elif concentration_90 > 0.10:
-                concentration_desc = "（筹码相对集中）"
-            else:
-                concentration_desc = "（筹码分散，相对稳定）"
-
-            result += concentration_desc + "\n"
-
-        # 70%成本分布分析
-        cost_70_low = latest.get('70成本-低', 0)
-        cost_70_high = latest.get('70成本-高', 0)
-        concentration_70 = latest.get('70集中度', 0)
-
-        if all(isinstance(x, (int, float)) and x > 0 for x in [cost_70_low, cost_70_high, concentration_70]):
-            cost_range_70 = cost_70_high - cost_70_low
-            result += f"70%成本分布: {cost_70_low:.2f}元 - {cost_70_high:.2f}元"
-            result += f"（区间: {cost_range_70:.2f}元）\n"
-            result += f"70%集中度: {concentration_70:.4f}\n"
-
-        # 趋势分析（对比前一交易日）
-        if len(df) >= 2:
-            previous = df.iloc[-2]
-            prev_profit = previous.get('获利比例', 0)
-            prev_avg_cost = previous.get('平均成本', 0)
-
-            result += "\n=== 趋势变化 ===\n"
-
-            # 获利比例变化
-            if isinstance(prev_profit, (int, float)) and isinstance(profit_ratio, (int, float)):
-                profit_change = (profit_ratio - prev_profit) * 100 if profit_ratio <= 1 else profit_ratio - prev_profit
-                if abs(profit_change) > 0.01:
-                    change_direction = "上升" if profit_change > 0 else "下降"
-                    result += f"获利比例较前日{change_direction} {abs(profit_change):.2f}个百分点\n"
-
-            # 平均成本变化
-            if isinstance(prev_avg_cost, (int, float)) and isinstance(avg_cost, (int, float)) and prev_avg_cost > 0:
-                cost_change = avg_cost - prev_avg_cost
-                cost_change_pct = (cost_change / prev_avg_cost) * 100
-                if abs(cost_change_pct) > 0.1:
-                    change_direction = "上升" if cost_change > 0 else "下降"
-                    result += f"平均成本较前日{change_direction} {abs(cost_change):.2f}元 ({abs(cost_change_pct):.2f}%)\n"
-
-    # 第八步：添加数据统计信息
-    result += f"\n数据统计: 共 {len(df)} 个交易日的筹码分布数据"
-    if not df.empty:
-        start_date = df.iloc[0]['日期'] if '日期' in df.columns else "未知"
-        end_date = df.iloc[-1]['日期'] if '日期' in df.columns else "未知"
-        result += f"，时间范围: {start_date} 至 {end_date}"
-
-    result += "\n数据来源: 东方财富（近90个交易日）"
-
-    return result
+    # 第五步：格式化基础数据（显示最近10条记录）
+    # stock_cyq_em 不支持限制返回条数，只对最后10行切片（视图，不复制数据）
+    parts = [format_dataframe_to_table(df.iloc[-10:], title)]
+
+    # 第六步：添加筹码分析
+    parts.append("\n=== 筹码分析 ===\n")
+
+    # 获利比例分析
+    profit_ratio = _latest_value(df, '获利比例')
+    if isinstance(profit_ratio, (int, float)):
+        profit_pct = profit_ratio * 100 if profit_ratio <= 1 else profit_ratio
+        parts.append(f"最新获利比例: {profit_pct:.2f}%")
+
+        if profit_pct > 80:
+            profit_desc = "（高位获利盘较多，存在抛压风险）"
+        elif profit_pct > 50:
+            profit_desc = "（获利盘适中，市场情绪相对平衡）"
+        elif profit_pct > 20:
+            profit_desc = "（获利盘较少，上涨阻力相对较小）"
+        else:
+            profit_desc = "（大部分投资者处于亏损状态）"
+
+        parts.append(profit_desc + "\n")
+
+    # 平均成本分析
+    avg_cost = _latest_value(df, '平均成本')
+    if isinstance(avg_cost, (int, float)) and avg_cost > 0:
+        parts.append(f"平均成本: {avg_cost:.2f}元\n")
+
+    # 90%成本分布分析
+    cost_90_low = _latest_value(df, '90成本-低')
+    cost_90_high = _latest_value(df, '90成本-高')
+    concentration_90 = _latest_value(df, '90集中度')
+
+    if all(isinstance(x, (int, float)) and x > 0 for x in [cost_90_low, cost_90_high, concentration_90]):
+        cost_range_90 = cost_90_high - cost_90_low
+        parts.append(f"90%成本分布: {cost_90_low:.2f}元 - {cost_90_high:.2f}元")
+        parts.append(f"（区间: {cost_range_90:.2f}元）\n")
+        parts.append(f"90%集中度: {concentration_90:.4f}")
+
+        if concentration_90 > 0.15:
+            concentration_desc = "（筹码高度集中，波动性较大）"
+        elif concentration_90 > 0.10:
+            concentration_desc = "（筹码相对集中）"
+        else:
+            concentration_desc = "（筹码分散，相对稳定）"
+
+        parts.append(concentration_desc + "\n")
+
+    # 70%成本分布分析
+    cost_70_low = _latest_value(df, '70成本-低')
+    cost_70_high = _latest_value(df, '70成本-高')
+    concentration_70 = _latest_value(df, '70集中度')
+
+    if all(isinstance(x, (int, float)) and x > 0 for x in [cost_70_low, cost_70_high, concentration_70]):
+        cost_range_70 = cost_70_high - cost_70_low
+        parts.append(f"70%成本分布: {cost_70_low:.2f}元 - {cost_70_high:.2f}元")
+        parts.append(f"（区间: {cost_range_70:.2f}元）\n")
+        parts.append(f"70%集中度: {concentration_70:.4f}\n")
+
+    # 趋势分析（对比前一交易日），直接用 iat 读取最后两行的标量
+    if len(df) >= 2:
+        parts.append("\n=== 趋势变化 ===\n")
+
+        # 获利比例变化
+        if '获利比例' in df.columns and pd.api.types.is_numeric_dtype(df['获利比例']):
+            profits = df['获利比例']
+            profit_change = profits.iat[-1] - profits.iat[-2]
+            if profit_ratio <= 1:
+                profit_change *= 100
+            if abs(profit_change) > 0.01:
+                change_direction = "上升" if profit_change > 0 else "下降"
+                parts.append(f"获利比例较前日{change_direction} {abs(profit_change):.2f}个百分点\n")
+
+        # 平均成本变化
+        if (
+            '平均成本' in df.columns
+            and pd.api.types.is_numeric_dtype(df['平均成本'])
+            and df['平均成本'].iat[-2] > 0
+        ):
+            costs = df['平均成本']
+            cost_change = costs.iat[-1] - costs.iat[-2]
+            cost_change_pct = cost_change / costs.iat[-2] * 100
+            if abs(cost_change_pct) > 0.1:
+                change_direction = "上升" if cost_change > 0 else "下降"
+                parts.append(f"平均成本较前日{change_direction} {abs(cost_change):.2f}元 ({abs(cost_change_pct):.2f}%)\n")
+
+    # 第七步：添加数据统计信息
+    parts.append(f"\n数据统计: 共 {len(df)} 个交易日的筹码分布数据")
+    start_date = df['日期'].iat[0] if '日期' in df.columns else "未知"
+    end_date = df['日期'].iat[-1] if '日期' in df.columns else "未知"
+    parts.append(f"，时间范围: {start_date} 至 {end_date}")
+
+    parts.append("\n数据来源: 东方财富（近90个交易日）")
+
+    return "".join(parts)
 
 
 @mcp.tool()
@@ -885,51 +1660,41 @@ async def search_stock_code(query: str) -> str:
 
     query = query.strip()
 
-    # 第二步：获取股票代码名称对照表
-    print(f"正在查询股票: {query}")
-    df = await safe_akshare_call("stock_info_a_code_name")
+    # 第二步：获取股票代码名称对照表（带缓存）
+    logger.info("正在查询股票: %s", query)
+    table = await _get_code_name_df()
 
     # 第三步：检查数据获取结果
-    if df is None:
+    if table is None:
         return "错误: 无法获取股票代码名称数据。请稍后重试。"
 
-    if df.empty:
-        return "错误: 股票代码名称数据为空。"
+    df, code_to_name = table
 
     # 第四步：判断查询类型并进行搜索
     # 检查是否为6位数字的股票代码
     if len(query) == 6 and query.isdigit():
         # 按股票代码精确查询
-        matched = df[df['code'] == query]
+        name = code_to_name.get(query)
 
-        if not matched.empty:
-            row = matched.iloc[0]
-            code = row['code']
-            name = row['name']
+        if name is not None:
+            code = query
 
             # 判断市场
-            if code.startswith(('000', '001', '002', '003', '300')):
-                market_full = "深圳证券交易所"
-            elif code.startswith(('600', '601', '603', '688')):
-                market_full = "上海证券交易所"
-            elif code.startswith(('8', '4')):
-                market_full = "北京证券交易所"
-            else:
-                market_full = "未知交易所"
+            _, market_full = _classify_market(code)
 
-            result = f"=== 股票查询结果 ===\n"
-            result += f"股票代码: {code}\n"
-            result += f"股票名称: {name}\n"
-            result += f"所属市场: {market_full}\n"
+            parts = [f"=== 股票查询结果 ===\n"]
+            parts.append(f"股票代码: {code}\n")
+            parts.append(f"股票名称: {name}\n")
+            parts.append(f"所属市场: {market_full}\n")
 
-            return result
+            return "".join(parts)
         else:
             return f"未找到股票代码 '{query}' 对应的股票。请检查代码是否正确。"
 
     else:
         # 按股票名称模糊查询
         # 模糊匹配股票名称
-        matched = df[df['name'].str.contains(query, na=False)]
+        matched = df[df['name_lower'].str.contains(query.lower(), na=False, regex=False)]
 
         if matched.empty:
             return f"未找到包含 '{query}' 的股票。请尝试其他关键词。"
@@ -943,7 +1708,7 @@ async def search_stock_code(query: str) -> str:
         else:
             show_more = False
 
-        result = f"=== 股票查询结果 ===\n"
+        parts = [f"=== 股票查询结果 ===\n"]
 
         if len(matched) == 1:
             # 单个结果，显示详细信息
@@ -952,50 +1717,32 @@ async def search_stock_code(query: str) -> str:
             name = row['name']
 
             # 判断市场
-            if code.startswith(('000', '001', '002', '003', '300')):
-                market_full = "深圳证券交易所"
-            elif code.startswith(('600', '601', '603', '688')):
-                market_full = "上海证券交易所"
-            elif code.startswith(('8', '4')):
-                market_full = "北京证券交易所"
-            else:
-                market_full = "未知交易所"
+            _, market_full = _classify_market(code)
 
-            result += f"股票代码: {code}\n"
-            result += f"股票名称: {name}\n"
-            result += f"所属市场: {market_full}\n"
+            parts.append(f"股票代码: {code}\n")
+            parts.append(f"股票名称: {name}\n")
+            parts.append(f"所属市场: {market_full}\n")
 
         else:
             # 多个结果，显示列表
-            result += f"找到 {len(matched)} 只相关股票:\n\n"
-            result += "序号  代码    股票名称        市场\n"
-            result += "-" * 35 + "\n"
-
-            for idx, (_, row) in enumerate(matched.iterrows(), 1):
-                code = row['code']
-                name = row['name']
+            parts.append(f"找到 {len(matched)} 只相关股票:\n\n")
+            parts.append(_HEADER_SEARCH)
 
+            for idx, (code, name) in enumerate(zip(matched['code'], matched['name']), 1):
                 # 判断市场简称
-                if code.startswith(('000', '001', '002', '003', '300')):
-                    market_short = "深圳"
-                elif code.startswith(('600', '601', '603', '688')):
-                    market_short = "上海"
-                elif code.startswith(('8', '4')):
-                    market_short = "北京"
-                else:
-                    market_short = "未知"
+                market_short, _ = _classify_market(code)
 
-                result += f"{idx:2d}    {code}  {name:12s}  {market_short}\n"
+                parts.append(f"{idx:2d}    {code}  {_pad_display(str(name), 14)}  {market_short}\n")
 
             if show_more:
-                result += f"\n注意: 共找到 {original_count} 只股票，仅显示前 {max_results} 只。\n"
-                result += "请使用更具体的关键词缩小搜索范围。\n"
+                parts.append(f"\n注意: 共找到 {original_count} 只股票，仅显示前 {max_results} 只。\n")
+                parts.append("请使用更具体的关键词缩小搜索范围。\n")
 
         # 添加数据说明
-        result += f"\n数据来源: akshare (沪深京A股)"
-        result += f"\n更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        parts.append(f"\n数据来源: akshare (沪深京A股)")
+        parts.append(f"\n更新时间: {_now_str()}")
 
-        return result
+        return "".join(parts)
 
 
 @mcp.tool()
@@ -1017,7 +1764,7 @@ async def get_stock_hot_rank() -> str:
         "=== 股票热度排行榜（前100名） ===\\n1. 000001 平安银行: 10.50元 (+1.23%) 人气值: 12345\\n..."
     """
     # 第一步：调用 akshare 获取股票热度数据
-    print("正在获取股票热度排行榜...")
+    logger.info("正在获取股票热度排行榜...")
     df = await safe_akshare_call("stock_hot_rank_em")
 
     # 第二步：检查数据获取结果
@@ -1029,71 +1776,105 @@ async def get_stock_hot_rank() -> str:
 
     # 第三步：格式化数据
     title = "股票热度排行榜（前100名）"
-    result = f"=== {title} ===\n\n"
-    result += "排名  代码    股票名称      最新价    涨跌幅    人气值\n"
-    result += "-" * 55 + "\n"
-
-    # 显示前20名热门股票
-    display_count = min(20, len(df))
-    for i in range(display_count):
-        row = df.iloc[i]
-
-        # 获取基本信息
-        rank = i + 1
-        code = row.get('代码', 'N/A')
-        name = row.get('名称', 'N/A')
-        price = row.get('最新价', 0)
-        change_pct = row.get('涨跌幅', 0)
-        popularity = row.get('人气', 0)
-
-        # 格式化显示
-        # 安全格式化价格
-        price_str = f"{price:7.2f}" if isinstance(price, (int, float)) else f"{str(price):>7s}"
-        result += f"{rank:3d}   {str(code)}  {str(name):10s}  {price_str}元  "
-
-        # 涨跌幅颜色标识
-        if isinstance(change_pct, (int, float)):
-            if change_pct > 0:
-                result += f"+{change_pct:5.2f}%📈  "
-            elif change_pct < 0:
-                result += f"{change_pct:6.2f}%📉  "
-            else:
-                result += f" {change_pct:5.2f}%➡️  "
-        else:
-            result += f"{str(change_pct):>7s}   "
-
-        # 人气值处理
-        if isinstance(popularity, (int, float)):
-            result += f"{popularity:>8.0f}\n"
-        else:
-            result += f"{str(popularity):>8s}\n"
+    parts = [f"=== {title} ===\n\n"]
+    parts.append(_HEADER_HOT_RANK)
+
+    # 显示前20名热门股票：整列取值后逐行拼接，避免逐行 iloc 构造 Series
+    head = df.head(20)
+    codes = _text_values(head, '代码')
+    names = _text_values(head, '名称')
+    prices = _format_numbers(head, '最新价', "7.2f", 7)
+    changes = _format_signed(head, '涨跌幅', 6, unit="%", suffixes=_SIGN_EMOJI)
+    popularity = _format_numbers(head, '人气', ">8.0f", 8)
+    parts.extend(
+        f"{rank:3d}   {code}  {_pad_display(name, 12)}  {price}元  {change}  {pop}\n"
+        for rank, code, name, price, change, pop in zip(range(1, len(head) + 1), codes, names, prices, changes, popularity)
+    )
 
     # 第四步：添加统计信息
-    if not df.empty:
-        result += f"\n=== 热度分析 ===\n"
+    parts.append(f"\n=== 热度分析 ===\n")
 
-        # 涨跌统计
-        if '涨跌幅' in df.columns:
-            rising_count = len(df[df['涨跌幅'] > 0])
-            falling_count = len(df[df['涨跌幅'] < 0])
-            flat_count = len(df[df['涨跌幅'] == 0])
+    # 涨跌统计
+    if '涨跌幅' in df.columns:
+        rising_count, falling_count, flat_count = _sign_counts(df, '涨跌幅')
 
-            result += f"上涨股票: {rising_count}只\n"
-            result += f"下跌股票: {falling_count}只\n"
-            result += f"平盘股票: {flat_count}只\n"
+        parts.append(f"上涨股票: {rising_count}只\n")
+        parts.append(f"下跌股票: {falling_count}只\n")
+        parts.append(f"平盘股票: {flat_count}只\n")
 
-        # 热度分析
-        result += f"\n💡 热度说明:\n"
-        result += f"- 排名基于东方财富网股吧的关注度和讨论热度\n"
-        result += f"- 热度高的股票通常受到更多投资者关注\n"
-        result += f"- 建议结合基本面和技术面进行综合分析\n"
+    # 热度分析
+    parts.append(_TIP_HOT_RANK)
 
     # 第五步：添加数据说明
-    result += f"\n数据统计: 共 {len(df)} 只热门股票"
-    result += f"\n数据来源: 东方财富网股吧"
-    result += f"\n更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    parts.append(f"\n数据统计: 共 {len(df)} 只热门股票")
+    parts.append(f"\n数据来源: 东方财富网股吧")
+    parts.append(f"\n更新时间: {_now_str()}")
+
+    return "".join(parts)
+
+
+def _format_individual_fund_flow(df: pd.DataFrame, symbol: str) -> list[str]:
+    """格式化一种查询类型的个股资金流向表格和资金流分析
+
+    Args:
+        df (pd.DataFrame): stock_fund_flow_individual 返回的非空数据
+        symbol (str): 查询类型，"即时" 或 "N日排行"
+
+    Returns:
+        list[str]: 待拼接的输出片段，不含数据说明
+    """
+    title = f"个股资金流向（{symbol}）"
+    parts = [f"=== {title} ===\n\n"]
+
+    # 显示前30只股票：整列取值后逐行拼接
+    head = df.head(30)
+    ranks = range(1, len(head) + 1)
+    codes = _text_values(head, '代码')
+    names = _text_values(head, '名称')
+    changes = _format_signed(head, '涨跌幅', 6, unit="%")
+
+    if symbol == "即时":
+        parts.append(_HEADER_FUND_FLOW_REALTIME)
+
+        prices = _format_numbers(head, '最新价', "7.2f", 7)
+        main_flows = _format_signed(
+            head, '主力净流入-净额', 6, unit="亿", suffixes=("📉", "📉", "📈"), scale=100000000
+        )
+        parts.extend(
+            f"{rank:3d}   {code}  {_pad_display(name, 12)}  {price}元  {change}  {main_flow}\n"
+            for rank, code, name, price, change, main_flow in zip(ranks, codes, names, prices, changes, main_flows)
+        )
+
+    else:
+        # 排行榜数据
+        parts.append(_HEADER_FUND_FLOW_RANK)
+
+        main_flows = _format_numbers(head, '主力净流入-净额', "8.2f", 8, scale=100000000)
+        volumes = _format_numbers(head, '成交额', "6.2f", 6, scale=100000000)
+        parts.extend(
+            f"{rank:3d}   {code}  {_pad_display(name, 12)}  {change}  {main_flow}亿  {volume}亿\n"
+            for rank, code, name, change, main_flow, volume in zip(ranks, codes, names, changes, main_flows, volumes)
+        )
+
+    # 资金流分析
+    if '主力净流入-净额' in df.columns:
+        parts.append(f"\n=== 资金流分析 ===\n")
+
+        # 统计净流入和净流出股票数量，合计值在同一个数组上求和
+        if df['主力净流入-净额'].notna().any():
+            inflow_count, outflow_count, total_flow = _flow_stats(df, '主力净流入-净额')
+
+            parts.append(f"主力净流入股票: {inflow_count}只\n")
+            parts.append(f"主力净流出股票: {outflow_count}只\n")
+
+            # 总体资金流向
+            if total_flow > 0:
+                parts.append(f"整体资金流向: 净流入 {total_flow/100000000:.2f}亿元\n")
+            else:
+                parts.append(f"整体资金流向: 净流出 {abs(total_flow)/100000000:.2f}亿元\n")
+
+    return parts
 
-    return result
 
 
 @mcp.tool()
@@ -1126,12 +1907,11 @@ async def get_individual_fund_flow(symbol: str = "即时") -> str:
         "=== 个股资金流向（3日排行） ===\\n1. 600519 贵州茅台: 3日主力净流入 5.67亿元\\n..."
     """
     # 第一步：验证查询类型参数
-    valid_symbols = ["即时", "3日排行", "5日排行", "10日排行", "20日排行"]
-    if symbol not in valid_symbols:
-        return f"错误: 查询类型无效。支持的类型: {', '.join(valid_symbols)}，当前输入: '{symbol}'"
+    if err := _validate(flow_type=symbol):
+        return err
 
     # 第二步：调用 akshare 获取个股资金流数据
-    print(f"正在获取个股资金流向数据（{symbol}）...")
+    logger.info("正在获取个股资金流向数据（%s）...", symbol)
     df = await safe_akshare_call("stock_fund_flow_individual", symbol=symbol)
 
     # 第三步：检查数据获取结果
@@ -1141,113 +1921,70 @@ async def get_individual_fund_flow(symbol: str = "即时") -> str:
     if df.empty:
         return f"暂无数据: 个股资金流向数据（{symbol}）暂时无数据。"
 
-    # 第四步：格式化数据
-    title = f"个股资金流向（{symbol}）"
-    result = f"=== {title} ===\n\n"
+    # 第四步：格式化数据并添加资金流分析
+    parts = _format_individual_fund_flow(df, symbol)
 
-    # 显示前30只股票
-    display_count = min(30, len(df))
+    # 第五步：添加数据说明
+    parts.append(f"\n数据统计: 共 {len(df)} 只股票")
+    parts.append(f"\n数据来源: 同花顺资金流向")
+    parts.append(f"\n更新时间: {_now_str()}")
 
-    if symbol == "即时":
-        result += "排名  代码    股票名称      最新价    涨跌幅    主力净流入\n"
-        result += "-" * 60 + "\n"
-
-        for i in range(display_count):
-            row = df.iloc[i]
-
-            rank = i + 1
-            code = row.get('代码', 'N/A')
-            name = row.get('名称', 'N/A')
-            price = row.get('最新价', 0)
-            change_pct = row.get('涨跌幅', 0)
-            main_flow = row.get('主力净流入-净额', 0)
-
-            # 安全格式化价格
-            price_str = f"{price:7.2f}" if isinstance(price, (int, float)) else f"{str(price):>7s}"
-            result += f"{rank:3d}   {str(code)}  {str(name):10s}  {price_str}元  "
-
-            # 涨跌幅
-            if isinstance(change_pct, (int, float)):
-                if change_pct > 0:
-                    result += f"+{change_pct:5.2f}%  "
-                else:
-                    result += f"{change_pct:6.2f}%  "
-            else:
-                result += f"{str(change_pct):>7s}  "
-
-            # 主力净流入
-            if isinstance(main_flow, (int, float)):
-                if main_flow > 0:
-                    result += f"+{main_flow/100000000:.2f}亿📈\n"
-                else:
-                    result += f"{main_flow/100000000:.2f}亿📉\n"
-            else:
-                result += f"{str(main_flow):>10s}\n"
+    return "".join(parts)
 
-    else:
-        # 排行榜数据
-        result += "排名  代码    股票名称      涨跌幅    主力净流入    成交额\n"
-        result += "-" * 65 + "\n"
-
-        for i in range(display_count):
-            row = df.iloc[i]
-
-            rank = i + 1
-            code = row.get('代码', 'N/A')
-            name = row.get('名称', 'N/A')
-            change_pct = row.get('涨跌幅', 0)
-            main_flow = row.get('主力净流入-净额', 0)
-            volume = row.get('成交额', 0)
-
-            result += f"{rank:3d}   {code}  {str(name):10s}  "
-
-            # 涨跌幅
-            if isinstance(change_pct, (int, float)):
-                if change_pct > 0:
-                    result += f"+{change_pct:5.2f}%  "
-                else:
-                    result += f"{change_pct:6.2f}%  "
-            else:
-                result += f"{str(change_pct):>7s}  "
 
-            # 主力净流入
-            if isinstance(main_flow, (int, float)):
-                result += f"{main_flow/100000000:8.2f}亿  "
-            else:
-                result += f"{str(main_flow):>10s}  "
+async def _fetch_flow_all(func_name: str, symbols: tuple[str, ...]) -> Dict[str, Optional[pd.DataFrame]]:
+    """并发获取资金流接口多个查询类型的数据
 
-            # 成交额
-            if isinstance(volume, (int, float)):
-                result += f"{volume/100000000:6.2f}亿\n"
-            else:
-                result += f"{str(volume):>8s}\n"
+    各请求同时发出，并发数由 safe_akshare_call 内部的 akshare 调用上限控制。
 
-    # 第五步：添加资金流分析
-    if not df.empty and '主力净流入-净额' in df.columns:
-        result += f"\n=== 资金流分析 ===\n"
+    Args:
+        func_name (str): akshare 资金流接口名，如 "stock_fund_flow_individual"
+        symbols (tuple[str, ...]): 查询类型列表
 
-        # 统计净流入和净流出股票数量
-        main_flow_data = df['主力净流入-净额'].dropna()
-        if not main_flow_data.empty:
-            inflow_count = len(main_flow_data[main_flow_data > 0])
-            outflow_count = len(main_flow_data[main_flow_data < 0])
+    Returns:
+        Dict[str, Optional[pd.DataFrame]]: 查询类型到数据框的映射，获取失败的为 None
+    """
+    results = await asyncio.gather(*(safe_akshare_call(func_name, symbol=symbol) for symbol in symbols))
+    return dict(zip(symbols, results))
 
-            result += f"主力净流入股票: {inflow_count}只\n"
-            result += f"主力净流出股票: {outflow_count}只\n"
 
-            # 总体资金流向
-            total_flow = main_flow_data.sum()
-            if total_flow > 0:
-                result += f"整体资金流向: 净流入 {total_flow/100000000:.2f}亿元\n"
-            else:
-                result += f"整体资金流向: 净流出 {abs(total_flow)/100000000:.2f}亿元\n"
+@mcp.tool()
+async def get_individual_fund_flow_all() -> str:
+    """一次获取全部查询类型的个股资金流向数据
 
-    # 第六步：添加数据说明
-    result += f"\n数据统计: 共 {len(df)} 只股票"
-    result += f"\n数据来源: 同花顺资金流向"
-    result += f"\n更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    并发请求即时、3日、5日、10日、20日排行五种个股资金流向数据，
+    在一个响应中依次返回，耗时约等于单次查询而不是五次之和。
+    这是 MCP 工具函数，为 AI 模型提供多周期资金流对比能力。
 
-    return result
+    Returns:
+        str: 按查询类型依次排列的个股资金流向数据字符串，每段格式与
+            get_individual_fund_flow 相同；某个类型获取失败时该段为错误提示
+
+    Example:
+        >>> await get_individual_fund_flow_all()
+        "=== 个股资金流向（即时） ===\\n...\\n=== 个股资金流向（3日排行） ===\\n..."
+    """
+    # 第一步：并发获取全部查询类型的数据
+    logger.info("正在获取全部周期的个股资金流向数据...")
+    frames = await _fetch_flow_all("stock_fund_flow_individual", _FUND_FLOW_CHOICES)
+
+    # 第二步：按查询类型依次格式化
+    parts = []
+    for symbol, df in frames.items():
+        if df is None:
+            parts.append(f"=== 个股资金流向（{symbol}） ===\n错误: 无法获取个股资金流向数据（{symbol}）。请稍后重试。\n")
+        elif df.empty:
+            parts.append(f"=== 个股资金流向（{symbol}） ===\n暂无数据: 个股资金流向数据（{symbol}）暂时无数据。\n")
+        else:
+            parts.extend(_format_individual_fund_flow(df, symbol))
+            parts.append(f"\n数据统计: 共 {len(df)} 只股票\n")
+        parts.append("\n")
+
+    # 第三步：添加数据说明
+    parts.append("数据来源: 同花顺资金流向")
+    parts.append(f"\n更新时间: {_now_str()}")
+
+    return "".join(parts)
 
 
 @mcp.tool()
@@ -1277,12 +2014,11 @@ async def get_concept_fund_flow(symbol: str = "即时") -> str:
         "=== 概念资金流向（即时） ===\\n1. 人工智能: 净流入 12.34亿元 (+3.45%)\\n..."
     """
     # 第一步：验证查询类型参数
-    valid_symbols = ["即时", "3日排行", "5日排行", "10日排行", "20日排行"]
-    if symbol not in valid_symbols:
-        return f"错误: 查询类型无效。支持的类型: {', '.join(valid_symbols)}，当前输入: '{symbol}'"
+    if err := _validate(flow_type=symbol):
+        return err
 
     # 第二步：调用 akshare 获取概念资金流数据
-    print(f"正在获取概念资金流向数据（{symbol}）...")
+    logger.info("正在获取概念资金流向数据（%s）...", symbol)
     df = await safe_akshare_call("stock_fund_flow_concept", symbol=symbol)
 
     # 第三步：检查数据获取结果
@@ -1292,82 +2028,54 @@ async def get_concept_fund_flow(symbol: str = "即时") -> str:
     if df.empty:
         return f"暂无数据: 概念资金流向数据（{symbol}）暂时无数据。"
 
+    # 涨跌幅可能是带百分号的字符串，整列转换一次供表格和统计共用
+    _coerce_numeric(df, '行业-涨跌幅')
+
     # 第四步：格式化数据
     title = f"概念资金流向（{symbol}）"
-    result = f"=== {title} ===\n\n"
-    result += "排名  概念名称          涨跌幅    净流入    公司数  领涨股\n"
-    result += "-" * 65 + "\n"
-
-    # 显示前20个概念
-    display_count = min(20, len(df))
-    for i in range(display_count):
-        row = df.iloc[i]
-
-        rank = i + 1
-        concept = row.get('行业', 'N/A')
-        change_pct = row.get('行业-涨跌幅', 0)
-        net_flow = row.get('净额', 0)
-        company_count = row.get('公司家数', 0)
-        leader = row.get('领涨股', 'N/A')
-
-        result += f"{rank:3d}   {str(concept):15s}  "
-
-        # 涨跌幅
-        if isinstance(change_pct, (int, float)):
-            if change_pct > 0:
-                result += f"+{change_pct:5.2f}%  "
-            else:
-                result += f"{change_pct:6.2f}%  "
-        else:
-            result += f"{str(change_pct):>7s}  "
-
-        # 净流入
-        if isinstance(net_flow, (int, float)):
-            if net_flow > 0:
-                result += f"+{net_flow:6.2f}亿  "
-            else:
-                result += f"{net_flow:7.2f}亿  "
-        else:
-            result += f"{str(net_flow):>9s}  "
-
-        # 公司数和领涨股
-        company_str = f"{company_count:4.0f}" if isinstance(company_count, (int, float)) else str(company_count)
-        result += f"{company_str}家  {str(leader)}\n"
+    parts = [f"=== {title} ===\n\n"]
+    parts.append(_HEADER_CONCEPT_FLOW)
+
+    # 显示前20个概念：整列取值后逐行拼接
+    head = df.head(20)
+    sectors = _text_values(head, '行业')
+    changes = _format_signed(head, '行业-涨跌幅', 6, unit="%")
+    net_flows = _format_signed(head, '净额', 7, unit="亿")
+    company_counts = _format_numbers(head, '公司家数', "4.0f", 4)
+    leaders = _text_values(head, '领涨股')
+    parts.extend(
+        f"{rank:3d}   {_pad_display(sector, 16)}  {change}  {net_flow}  {company_count}家  {leader}\n"
+        for rank, sector, change, net_flow, company_count, leader
+        in zip(range(1, len(head) + 1), sectors, changes, net_flows, company_counts, leaders)
+    )
 
     # 第五步：添加概念分析
-    if not df.empty:
-        result += f"\n=== 概念分析 ===\n"
+    parts.append(f"\n=== 概念分析 ===\n")
 
-        # 统计涨跌概念数量
-        if '行业-涨跌幅' in df.columns:
-            rising_concepts = len(df[df['行业-涨跌幅'] > 0])
-            falling_concepts = len(df[df['行业-涨跌幅'] < 0])
+    # 统计涨跌概念数量
+    if '行业-涨跌幅' in df.columns:
+        rising_concepts, falling_concepts, _ = _sign_counts(df, '行业-涨跌幅')
 
-            result += f"上涨概念: {rising_concepts}个\n"
-            result += f"下跌概念: {falling_concepts}个\n"
+        parts.append(f"上涨概念: {rising_concepts}个\n")
+        parts.append(f"下跌概念: {falling_concepts}个\n")
 
-        # 资金流向统计
-        if '净额' in df.columns:
-            inflow_concepts = len(df[df['净额'] > 0])
-            outflow_concepts = len(df[df['净额'] < 0])
-            total_net_flow = df['净额'].sum()
+    # 资金流向统计
+    if '净额' in df.columns:
+        inflow_concepts, outflow_concepts, total_net_flow = _flow_stats(df, '净额')
 
-            result += f"净流入概念: {inflow_concepts}个\n"
-            result += f"净流出概念: {outflow_concepts}个\n"
-            result += f"概念板块总净流入: {total_net_flow:.2f}亿元\n"
+        parts.append(f"净流入概念: {inflow_concepts}个\n")
+        parts.append(f"净流出概念: {outflow_concepts}个\n")
+        parts.append(f"概念板块总净流入: {total_net_flow:.2f}亿元\n")
 
-        # 热门概念提示
-        result += f"\n💡 投资提示:\n"
-        result += f"- 概念板块资金流向反映市场热点和投资偏好\n"
-        result += f"- 净流入较大的概念通常受到资金追捧\n"
-        result += f"- 建议关注领涨股的基本面和技术面\n"
+    # 热门概念提示
+    parts.append(_TIP_CONCEPT_FLOW)
 
     # 第六步：添加数据说明
-    result += f"\n数据统计: 共 {len(df)} 个概念板块"
-    result += f"\n数据来源: 同花顺概念资金流"
-    result += f"\n更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    parts.append(f"\n数据统计: 共 {len(df)} 个概念板块")
+    parts.append(f"\n数据来源: 同花顺概念资金流")
+    parts.append(f"\n更新时间: {_now_str()}")
 
-    return result
+    return "".join(parts)
 
 
 @mcp.tool()
@@ -1397,12 +2105,11 @@ async def get_industry_fund_flow(symbol: str = "即时") -> str:
         "=== 行业资金流向（即时） ===\\n1. 电子信息: 净流入 8.76亿元 (+2.15%)\\n..."
     """
     # 第一步：验证查询类型参数
-    valid_symbols = ["即时", "3日排行", "5日排行", "10日排行", "20日排行"]
-    if symbol not in valid_symbols:
-        return f"错误: 查询类型无效。支持的类型: {', '.join(valid_symbols)}，当前输入: '{symbol}'"
+    if err := _validate(flow_type=symbol):
+        return err
 
     # 第二步：调用 akshare 获取行业资金流数据
-    print(f"正在获取行业资金流向数据（{symbol}）...")
+    logger.info("正在获取行业资金流向数据（%s）...", symbol)
     df = await safe_akshare_call("stock_fund_flow_industry", symbol=symbol)
 
     # 第三步：检查数据获取结果
@@ -1412,93 +2119,54 @@ async def get_industry_fund_flow(symbol: str = "即时") -> str:
     if df.empty:
         return f"暂无数据: 行业资金流向数据（{symbol}）暂时无数据。"
 
+    # 涨跌幅可能是带百分号的字符串，整列转换一次供表格和统计共用
+    _coerce_numeric(df, '行业-涨跌幅')
+
     # 第四步：格式化数据
     title = f"行业资金流向（{symbol}）"
-    result = f"=== {title} ===\n\n"
-    result += "排名  行业名称          涨跌幅    净流入    公司数  领涨股\n"
-    result += "-" * 65 + "\n"
-
-    # 显示所有行业（通常不超过100个）
-    display_count = min(30, len(df))
-    for i in range(display_count):
-        row = df.iloc[i]
-
-        rank = i + 1
-        industry = row.get('行业', 'N/A')
-        change_pct = row.get('行业-涨跌幅', 0)
-        net_flow = row.get('净额', 0)
-        company_count = row.get('公司家数', 0)
-        leader = row.get('领涨股', 'N/A')
-
-        result += f"{rank:3d}   {str(industry):15s}  "
-
-        # 涨跌幅处理（可能是字符串格式）
-        if isinstance(change_pct, str):
-            try:
-                change_pct = float(change_pct.replace('%', ''))
-            except:
-                pass
+    parts = [f"=== {title} ===\n\n"]
+    parts.append(_HEADER_INDUSTRY_FLOW)
+
+    # 显示所有行业（通常不超过100个）：整列取值后逐行拼接
+    head = df.head(30)
+    sectors = _text_values(head, '行业')
+    changes = _format_signed(head, '行业-涨跌幅', 6, unit="%")
+    net_flows = _format_signed(head, '净额', 7, unit="亿")
+    company_counts = _format_numbers(head, '公司家数', "4.0f", 4)
+    leaders = _text_values(head, '领涨股')
+    parts.extend(
+        f"{rank:3d}   {_pad_display(sector, 16)}  {change}  {net_flow}  {company_count}家  {leader}\n"
+        for rank, sector, change, net_flow, company_count, leader
+        in zip(range(1, len(head) + 1), sectors, changes, net_flows, company_counts, leaders)
+    )
 
-        if isinstance(change_pct, (int, float)):
-            if change_pct > 0:
-                result += f"+{change_pct:5.2f}%  "
-            else:
-                result += f"{change_pct:6.2f}%  "
-        else:
-            result += f"{str(change_pct):>7s}  "
+    # 第五步：添加行业分析
+    parts.append(f"\n=== 行业分析 ===\n")
 
-        # 净流入
-        if isinstance(net_flow, (int, float)):
-            if net_flow > 0:
-                result += f"+{net_flow:6.2f}亿  "
-            else:
-                result += f"{net_flow:7.2f}亿  "
-        else:
-            result += f"{str(net_flow):>9s}  "
+    # 统计涨跌行业数量
+    if '行业-涨跌幅' in df.columns:
+        rising_industries, falling_industries, _ = _sign_counts(df, '行业-涨跌幅')
 
-        # 公司数和领涨股
-        company_str = f"{company_count:4.0f}" if isinstance(company_count, (int, float)) else str(company_count)
-        result += f"{company_str}家  {str(leader)}\n"
+        parts.append(f"上涨行业: {rising_industries}个\n")
+        parts.append(f"下跌行业: {falling_industries}个\n")
 
-    # 第五步：添加行业分析
-    if not df.empty:
-        result += f"\n=== 行业分析 ===\n"
-
-        # 统计涨跌行业数量
-        if '行业-涨跌幅' in df.columns:
-            # 处理可能的字符串格式
-            change_data = df['行业-涨跌幅'].copy()
-            if change_data.dtype == 'object':
-                change_data = pd.to_numeric(change_data.astype(str).str.replace('%', ''), errors='coerce')
-
-            rising_industries = len(change_data[change_data > 0])
-            falling_industries = len(change_data[change_data < 0])
-
-            result += f"上涨行业: {rising_industries}个\n"
-            result += f"下跌行业: {falling_industries}个\n"
-
-        # 资金流向统计
-        if '净额' in df.columns:
-            inflow_industries = len(df[df['净额'] > 0])
-            outflow_industries = len(df[df['净额'] < 0])
-            total_net_flow = df['净额'].sum()
-
-            result += f"净流入行业: {inflow_industries}个\n"
-            result += f"净流出行业: {outflow_industries}个\n"
-            result += f"行业板块总净流入: {total_net_flow:.2f}亿元\n"
-
-        # 投资建议
-        result += f"\n💡 投资建议:\n"
-        result += f"- 行业资金流向体现产业投资趋势\n"
-        result += f"- 净流入较大的行业可能存在投资机会\n"
-        result += f"- 建议结合宏观经济和政策导向分析\n"
+    # 资金流向统计
+    if '净额' in df.columns:
+        inflow_industries, outflow_industries, total_net_flow = _flow_stats(df, '净额')
+
+        parts.append(f"净流入行业: {inflow_industries}个\n")
+        parts.append(f"净流出行业: {outflow_industries}个\n")
+        parts.append(f"行业板块总净流入: {total_net_flow:.2f}亿元\n")
+
+    # 投资建议
+    parts.append(_TIP_INDUSTRY_FLOW)
 
     # 第六步：添加数据说明
-    result += f"\n数据统计: 共 {len(df)} 个行业板块"
-    result += f"\n数据来源: 同花顺行业资金流"
-    result += f"\n更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    parts.append(f"\n数据统计: 共 {len(df)} 个行业板块")
+    parts.append(f"\n数据来源: 同花顺行业资金流")
+    parts.append(f"\n更新时间: {_now_str()}")
 
-    return result
+    return "".join(parts)
 
 
 @mcp.tool()
@@ -1520,7 +2188,7 @@ async def get_industry_board_overview() -> str:
         "=== 行业板块总览 ===\\n1. 电子信息: +3.45% 净流入12.34亿 领涨股: 某某科技\\n..."
     """
     # 第一步：调用 akshare 获取行业板块总览数据
-    print("正在获取行业板块总览数据...")
+    logger.info("正在获取行业板块总览数据...")
     df = await safe_akshare_call("stock_board_industry_summary_ths")
 
     # 第二步：检查数据获取结果
@@ -1530,137 +2198,83 @@ async def get_industry_board_overview() -> str:
     if df.empty:
         return "暂无数据: 行业板块总览数据暂时无数据。"
 
+    # 涨跌幅可能是带百分号的字符串，整列转换一次供表格和统计共用
+    _coerce_numeric(df, '涨跌幅')
+
     # 第三步：格式化数据
     title = "行业板块总览"
-    result = f"=== {title} ===\n\n"
-    result += "排名  板块名称          涨跌幅    成交额    净流入    涨/跌    领涨股\n"
-    result += "-" * 80 + "\n"
-
-    # 显示前30个板块
-    display_count = min(30, len(df))
-    for i in range(display_count):
-        row = df.iloc[i]
-
-        rank = i + 1
-        board = row.get('板块', 'N/A')
-        change_pct = row.get('涨跌幅', 0)
-        volume = row.get('总成交额', 0)
-        net_flow = row.get('净流入', 0)
-        up_count = row.get('上涨家数', 0)
-        down_count = row.get('下跌家数', 0)
-        leader = row.get('领涨股', 'N/A')
-        leader_change = row.get('领涨股-涨跌幅', 0)
-
-        result += f"{rank:3d}   {str(board):15s}  "
-
-        # 涨跌幅处理（可能是字符串格式）
-        if isinstance(change_pct, str):
-            try:
-                change_pct_num = float(change_pct.replace('%', ''))
-                if change_pct_num > 0:
-                    result += f"+{change_pct:>6s}📈  "
-                elif change_pct_num < 0:
-                    result += f"{change_pct:>7s}📉  "
-                else:
-                    result += f"{change_pct:>7s}➡️  "
-            except:
-                result += f"{change_pct:>8s}  "
-        else:
-            if change_pct > 0:
-                result += f"+{change_pct:5.2f}%📈  "
-            elif change_pct < 0:
-                result += f"{change_pct:6.2f}%📉  "
-            else:
-                result += f" {change_pct:5.2f}%➡️  "
+    parts = [f"=== {title} ===\n\n"]
+    parts.append(_HEADER_BOARD_OVERVIEW)
+
+    # 显示前30个板块：整列取值后逐行拼接
+    head = df.head(30)
+    boards = _text_values(head, '板块')
+    changes = _format_signed(head, '涨跌幅', 6, unit="%", suffixes=_SIGN_EMOJI)
+    volumes = _format_numbers(head, '总成交额', "7.1f", 7)
+    net_flows = _format_signed(head, '净流入', 6, precision=1, unit="亿")
+    up_counts = _format_numbers(head, '上涨家数', "3.0f", 3)
+    down_counts = _format_numbers(head, '下跌家数', "3.0f", 3)
+    leaders = _text_values(head, '领涨股')
+    leader_changes = _column_values(head, '领涨股-涨跌幅')[0].tolist()
+    # 领涨股涨跌幅为 0 或缺失时只显示名称
+    leader_strs = [
+        f"{leader}({change:+.1f}%)" if leader != 'N/A' and change == change and change != 0 else leader
+        for leader, change in zip(leaders, leader_changes)
+    ]
+    parts.extend(
+        f"{rank:3d}   {_pad_display(board, 16)}  {change}  {volume}亿  {net_flow}  {up}/{down}  {leader}\n"
+        for rank, board, change, volume, net_flow, up, down, leader
+        in zip(range(1, len(head) + 1), boards, changes, volumes, net_flows, up_counts, down_counts, leader_strs)
+    )
 
-        # 成交额
-        if isinstance(volume, (int, float)):
-            result += f"{volume:7.1f}亿  "
+    # 第四步：添加市场分析
+    parts.append(f"\n=== 市场分析 ===\n")
+
+    # 板块涨跌统计
+    if '涨跌幅' in df.columns:
+        rising_boards, falling_boards, flat_boards = _sign_counts(df, '涨跌幅')
+
+        parts.append(f"上涨板块: {rising_boards}个\n")
+        parts.append(f"下跌板块: {falling_boards}个\n")
+        parts.append(f"平盘板块: {flat_boards}个\n")
+
+        # 市场情绪
+        if rising_boards > falling_boards:
+            market_sentiment = "偏多"
+            sentiment_emoji = "📈"
+        elif rising_boards < falling_boards:
+            market_sentiment = "偏空"
+            sentiment_emoji = "📉"
         else:
-            result += f"{str(volume):>9s}  "
+            market_sentiment = "平衡"
+            sentiment_emoji = "➡️"
 
-        # 净流入
-        if isinstance(net_flow, (int, float)):
-            if net_flow > 0:
-                result += f"+{net_flow:5.1f}亿  "
-            else:
-                result += f"{net_flow:6.1f}亿  "
-        else:
-            result += f"{str(net_flow):>8s}  "
+        parts.append(f"市场情绪: {market_sentiment} {sentiment_emoji}\n")
 
-        # 涨跌家数
-        up_str = f"{up_count:3.0f}" if isinstance(up_count, (int, float)) else str(up_count)
-        down_str = f"{down_count:3.0f}" if isinstance(down_count, (int, float)) else str(down_count)
-        result += f"{up_str}/{down_str}  "
+    # 资金流向统计
+    if '净流入' in df.columns:
+        inflow_boards, outflow_boards, total_net_flow = _flow_stats(df, '净流入')
 
-        # 领涨股
-        if str(leader) != 'N/A' and isinstance(leader_change, (int, float)) and leader_change != 0:
-            result += f"{str(leader)}({leader_change:+.1f}%)\n"
-        else:
-            result += f"{str(leader)}\n"
+        parts.append(f"净流入板块: {inflow_boards}个\n")
+        parts.append(f"净流出板块: {outflow_boards}个\n")
+        parts.append(f"市场总净流入: {total_net_flow:.1f}亿元\n")
 
-    # 第四步：添加市场分析
-    if not df.empty:
-        result += f"\n=== 市场分析 ===\n"
-
-        # 板块涨跌统计
-        if '涨跌幅' in df.columns:
-            # 处理涨跌幅数据
-            change_data = df['涨跌幅'].copy()
-            if change_data.dtype == 'object':
-                change_data = pd.to_numeric(change_data.astype(str).str.replace('%', ''), errors='coerce')
-
-            rising_boards = len(change_data[change_data > 0])
-            falling_boards = len(change_data[change_data < 0])
-            flat_boards = len(change_data[change_data == 0])
-
-            result += f"上涨板块: {rising_boards}个\n"
-            result += f"下跌板块: {falling_boards}个\n"
-            result += f"平盘板块: {flat_boards}个\n"
-
-            # 市场情绪
-            if rising_boards > falling_boards:
-                market_sentiment = "偏多"
-                sentiment_emoji = "📈"
-            elif rising_boards < falling_boards:
-                market_sentiment = "偏空"
-                sentiment_emoji = "📉"
-            else:
-                market_sentiment = "平衡"
-                sentiment_emoji = "➡️"
-
-            result += f"市场情绪: {market_sentiment} {sentiment_emoji}\n"
-
-        # 资金流向统计
-        if '净流入' in df.columns:
-            inflow_boards = len(df[df['净流入'] > 0])
-            outflow_boards = len(df[df['净流入'] < 0])
-            total_net_flow = df['净流入'].sum()
-
-            result += f"净流入板块: {inflow_boards}个\n"
-            result += f"净流出板块: {outflow_boards}个\n"
-            result += f"市场总净流入: {total_net_flow:.1f}亿元\n"
-
-        # 成交活跃度
-        if '总成交额' in df.columns:
-            total_volume = df['总成交额'].sum()
-            avg_volume = df['总成交额'].mean()
-            result += f"市场总成交额: {total_volume:.1f}亿元\n"
-            result += f"板块平均成交额: {avg_volume:.1f}亿元\n"
-
-        # 投资建议
-        result += f"\n💡 投资策略:\n"
-        result += f"- 关注净流入较大且涨幅居前的板块\n"
-        result += f"- 注意领涨股的持续性和基本面支撑\n"
-        result += f"- 结合宏观政策和行业景气度进行配置\n"
-        result += f"- 控制仓位，注意风险管理\n"
+    # 成交活跃度
+    if '总成交额' in df.columns:
+        total_volume = df['总成交额'].sum()
+        avg_volume = df['总成交额'].mean()
+        parts.append(f"市场总成交额: {total_volume:.1f}亿元\n")
+        parts.append(f"板块平均成交额: {avg_volume:.1f}亿元\n")
+
+    # 投资建议
+    parts.append(_TIP_BOARD_OVERVIEW)
 
     # 第五步：添加数据说明
-    result += f"\n数据统计: 共 {len(df)} 个行业板块"
-    result += f"\n数据来源: 同花顺行业板块"
-    result += f"\n更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    parts.append(f"\n数据统计: 共 {len(df)} 个行业板块")
+    parts.append(f"\n数据来源: 同花顺行业板块")
+    parts.append(f"\n更新时间: {_now_str()}")
 
-    return result
+    return "".join(parts)
 
 
 @mcp.tool()
@@ -1694,14 +2308,13 @@ async def get_dragon_tiger_list(start_date: str = "", end_date: str = "") -> str
     """
     # 第一步：处理日期参数
     if not start_date or not end_date:
-        # 如果没有指定日期，获取最近7天的数据
-        from datetime import datetime, timedelta
-
+        # 如果没有指定日期，获取最近7天的数据；起止日期都由同一个"今天"推算，跨零点时也保持一致
+        today = _today_str()
         if not end_date:
-            end_date = datetime.now().strftime("%Y%m%d")
+            end_date = today
 
         if not start_date:
-            start_datetime = datetime.now() - timedelta(days=7)
+            start_datetime = datetime.strptime(today, "%Y%m%d") - timedelta(days=7)
             start_date = start_datetime.strftime("%Y%m%d")
 
     # 第二步：验证日期格式
@@ -1712,7 +2325,7 @@ async def get_dragon_tiger_list(start_date: str = "", end_date: str = "") -> str
         return f"错误: {str(e)}"
 
     # 第三步：调用 akshare 获取龙虎榜数据
-    print(f"正在获取龙虎榜详情数据（{start_formatted} 至 {end_formatted}）...")
+    logger.info("正在获取龙虎榜详情数据（%s 至 %s）...", start_formatted, end_formatted)
     df = await safe_akshare_call("stock_lhb_detail_em", start_date=start_date, end_date=end_date)
 
     # 第四步：检查数据获取结果
@@ -1728,156 +2341,105 @@ async def get_dragon_tiger_list(start_date: str = "", end_date: str = "") -> str
     else:
         title = f"龙虎榜详情（{start_formatted} 至 {end_formatted}）"
 
-    result = f"=== {title} ===\n\n"
+    parts = [f"=== {title} ===\n\n"]
 
     # 第六步：按日期分组显示数据
     if '上榜日' in df.columns:
-        # 按上榜日期分组
-        grouped = df.groupby('上榜日')
-
-        for date, group in grouped:
-            result += f"📅 {date} ({len(group)}只股票上榜)\n"
-            result += "-" * 80 + "\n"
-            result += "序号  代码    股票名称      涨跌幅    净买额    成交额占比  上榜原因\n"
-            result += "-" * 80 + "\n"
-
-            # 显示当日上榜股票（最多20只）
-            display_count = min(20, len(group))
-            for i in range(display_count):
-                row = group.iloc[i]
-
-                seq = i + 1
-                code = str(row.get('代码', 'N/A'))
-                name = str(row.get('名称', 'N/A'))
-                change_pct = row.get('涨跌幅', 0)
-                net_buy = row.get('龙虎榜净买额', 0)
-                volume_ratio = row.get('成交额占总成交比', 0)
-                reason = str(row.get('上榜原因', 'N/A'))
-
-                result += f"{seq:3d}   {code}  {name:10s}  "
-
-                # 涨跌幅
-                if isinstance(change_pct, (int, float)):
-                    if change_pct > 0:
-                        result += f"+{change_pct:5.2f}%📈  "
-                    elif change_pct < 0:
-                        result += f"{change_pct:6.2f}%📉  "
-                    else:
-                        result += f" {change_pct:5.2f}%➡️  "
-                else:
-                    result += f"{str(change_pct):>8s}  "
-
-                # 净买额（转换为亿元）
-                if isinstance(net_buy, (int, float)):
-                    net_buy_yi = net_buy / 100000000
-                    if net_buy_yi > 0:
-                        result += f"+{net_buy_yi:5.2f}亿  "
-                    else:
-                        result += f"{net_buy_yi:6.2f}亿  "
-                else:
-                    result += f"{str(net_buy):>8s}  "
-
-                # 成交额占比
-                if isinstance(volume_ratio, (int, float)):
-                    result += f"{volume_ratio:5.2f}%  "
-                else:
-                    result += f"{str(volume_ratio):>6s}  "
-
-                # 上榜原因（截取前15个字符）
-                reason_short = reason[:15] + "..." if len(reason) > 15 else reason
-                result += f"{reason_short}\n"
-
-            if len(group) > display_count:
-                result += f"... 还有 {len(group) - display_count} 只股票\n"
-
-            result += "\n"
+        # 按上榜日期稳定排序，用 np.unique 求出各日期的起始位置和数量，按切片分组
+        listed = df.dropna(subset=['上榜日']).sort_values('上榜日', kind='mergesort')
+        _, starts, counts = np.unique(listed['上榜日'].to_numpy(), return_index=True, return_counts=True)
+        dates = listed['上榜日'].iloc[starts].tolist()
+
+        # 每个日期最多显示20只，先选出要显示的行，再对这些行整列格式化一次
+        positions = np.arange(len(listed)) - np.repeat(starts, counts)
+        shown = listed[positions < 20]
+        codes = _text_values(shown, '代码')
+        names = _text_values(shown, '名称')
+        changes = _format_signed(shown, '涨跌幅', 6, unit="%", suffixes=_SIGN_EMOJI)
+        net_buys = _format_signed(shown, '龙虎榜净买额', 6, unit="亿", scale=100000000)
+        volume_ratios = _format_numbers(shown, '成交额占总成交比', "5.2f", 5)
+        # 上榜原因截取前15个字符
+        reasons = [r[:15] + "..." if len(r) > 15 else r for r in _text_values(shown, '上榜原因')]
+
+        offset = 0
+        for date, count in zip(dates, counts.tolist()):
+            parts.append(f"📅 {date} ({count}只股票上榜)\n")
+            parts.append(_HEADER_LHB_BY_DATE)
+
+            display_count = min(20, count)
+            end = offset + display_count
+            parts.extend(
+                f"{seq:3d}   {code}  {_pad_display(name, 12)}  {change}  {net_buy}  {volume_ratio}%  {reason}\n"
+                for seq, code, name, change, net_buy, volume_ratio, reason in zip(
+                    range(1, display_count + 1), codes[offset:end], names[offset:end], changes[offset:end],
+                    net_buys[offset:end], volume_ratios[offset:end], reasons[offset:end]
+                )
+            )
+            offset = end
+
+            if count > display_count:
+                parts.append(f"... 还有 {count - display_count} 只股票\n")
+
+            parts.append("\n")
 
     else:
         # 如果没有上榜日列，直接显示所有数据
-        result += "代码    股票名称      上榜日      涨跌幅    净买额    上榜原因\n"
-        result += "-" * 75 + "\n"
-
-        display_count = min(50, len(df))
-        for i in range(display_count):
-            row = df.iloc[i]
-
-            code = str(row.get('代码', 'N/A'))
-            name = str(row.get('名称', 'N/A'))
-            date = str(row.get('上榜日', 'N/A'))
-            change_pct = row.get('涨跌幅', 0)
-            net_buy = row.get('龙虎榜净买额', 0)
-            reason = str(row.get('上榜原因', 'N/A'))
-
-            result += f"{code}  {name:10s}  {date}  "
-
-            # 涨跌幅
-            if isinstance(change_pct, (int, float)):
-                if change_pct > 0:
-                    result += f"+{change_pct:5.2f}%  "
-                else:
-                    result += f"{change_pct:6.2f}%  "
-            else:
-                result += f"{str(change_pct):>7s}  "
+        parts.append(_HEADER_LHB)
+
+        head = df.head(50)
+        codes = _text_values(head, '代码')
+        names = _text_values(head, '名称')
+        dates = _text_values(head, '上榜日')
+        changes = _format_signed(head, '涨跌幅', 6, unit="%")
+        net_buys = _format_numbers(head, '龙虎榜净买额', "6.2f", 6, scale=100000000)
+        # 上榜原因截取前20个字符
+        reasons = [r[:20] + "..." if len(r) > 20 else r for r in _text_values(head, '上榜原因')]
+        parts.extend(
+            f"{code}  {_pad_display(name, 12)}  {date}  {change}  {net_buy}亿  {reason}\n"
+            for code, name, date, change, net_buy, reason in zip(codes, names, dates, changes, net_buys, reasons)
+        )
 
-            # 净买额
-            if isinstance(net_buy, (int, float)):
-                net_buy_yi = net_buy / 100000000
-                result += f"{net_buy_yi:6.2f}亿  "
-            else:
-                result += f"{str(net_buy):>8s}  "
+    # 第七步：添加统计分析
+    parts.append("=== 龙虎榜分析 ===\n")
 
-            # 上榜原因
-            reason_short = reason[:20] + "..." if len(reason) > 20 else reason
-            result += f"{reason_short}\n"
+    # 基本统计
+    total_stocks = len(df)
+    parts.append(f"上榜股票总数: {total_stocks}只\n")
 
-    # 第七步：添加统计分析
-    if not df.empty:
-        result += "=== 龙虎榜分析 ===\n"
-
-        # 基本统计
-        total_stocks = len(df)
-        result += f"上榜股票总数: {total_stocks}只\n"
-
-        # 涨跌统计
-        if '涨跌幅' in df.columns:
-            rising_stocks = len(df[df['涨跌幅'] > 0])
-            falling_stocks = len(df[df['涨跌幅'] < 0])
-            flat_stocks = len(df[df['涨跌幅'] == 0])
-
-            result += f"上涨股票: {rising_stocks}只 ({rising_stocks/total_stocks*100:.1f}%)\n"
-            result += f"下跌股票: {falling_stocks}只 ({falling_stocks/total_stocks*100:.1f}%)\n"
-            result += f"平盘股票: {flat_stocks}只\n"
-
-        # 资金流向统计
-        if '龙虎榜净买额' in df.columns:
-            net_inflow_stocks = len(df[df['龙虎榜净买额'] > 0])
-            net_outflow_stocks = len(df[df['龙虎榜净买额'] < 0])
-            total_net_buy = df['龙虎榜净买额'].sum() / 100000000
-
-            result += f"净买入股票: {net_inflow_stocks}只\n"
-            result += f"净卖出股票: {net_outflow_stocks}只\n"
-            result += f"龙虎榜总净买额: {total_net_buy:.2f}亿元\n"
-
-        # 上榜原因统计
-        if '上榜原因' in df.columns:
-            reason_counts = df['上榜原因'].value_counts().head(5)
-            result += f"\n主要上榜原因:\n"
-            for reason, count in reason_counts.items():
-                result += f"  {reason}: {count}只\n"
-
-        # 投资提示
-        result += f"\n💡 投资提示:\n"
-        result += f"- 龙虎榜反映大资金动向和市场关注度\n"
-        result += f"- 净买额为正表示大资金看好，为负表示大资金减持\n"
-        result += f"- 关注上榜原因，异常波动可能存在风险\n"
-        result += f"- 建议结合基本面和技术面进行综合分析\n"
+    # 涨跌统计
+    if '涨跌幅' in df.columns:
+        rising_stocks, falling_stocks, flat_stocks = _sign_counts(df, '涨跌幅')
+
+        parts.append(f"上涨股票: {rising_stocks}只 ({rising_stocks/total_stocks*100:.1f}%)\n")
+        parts.append(f"下跌股票: {falling_stocks}只 ({falling_stocks/total_stocks*100:.1f}%)\n")
+        parts.append(f"平盘股票: {flat_stocks}只\n")
+
+    # 资金流向统计
+    if '龙虎榜净买额' in df.columns:
+        net_inflow_stocks, net_outflow_stocks, total_net_buy = _flow_stats(df, '龙虎榜净买额')
+        total_net_buy /= 100000000
+
+        parts.append(f"净买入股票: {net_inflow_stocks}只\n")
+        parts.append(f"净卖出股票: {net_outflow_stocks}只\n")
+        parts.append(f"龙虎榜总净买额: {total_net_buy:.2f}亿元\n")
+
+    # 上榜原因统计
+    if '上榜原因' in df.columns:
+        # 只需要前5名：哈希计数后部分选择，不对全部原因排序
+        reason_counts = df['上榜原因'].value_counts(sort=False).nlargest(5)
+        parts.append(f"\n主要上榜原因:\n")
+        for reason, count in reason_counts.items():
+            parts.append(f"  {reason}: {count}只\n")
+
+    # 投资提示
+    parts.append(_TIP_LHB)
 
     # 第八步：添加数据说明
-    result += f"\n数据统计: 共 {len(df)} 条龙虎榜记录"
-    result += f"\n数据来源: 东方财富网龙虎榜"
-    result += f"\n更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    parts.append(f"\n数据统计: 共 {len(df)} 条龙虎榜记录")
+    parts.append(f"\n数据来源: 东方财富网龙虎榜")
+    parts.append(f"\n更新时间: {_now_str()}")
 
-    return result
+    return "".join(parts)
 
 
 if __name__ == "__main__":
@@ -1885,11 +2447,25 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="运行股票数据 MCP HTTP 服务器")
     parser.add_argument("--port", type=int, default=8124, help="监听端口号")
     parser.add_argument("--host", type=str, default="localhost", help="监听主机地址")
+    parser.add_argument("--log-level", type=str, default="INFO",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="日志级别")
     args = parser.parse_args()
 
+    # FastMCP 初始化时已配置根日志处理器，这里只调整本模块日志的级别
+    logger.setLevel(args.log_level)
+    # 根日志处理器（RichHandler）渲染和写终端较慢，改由后台线程处理，
+    # 事件循环线程中的日志调用只把记录放入队列
+    root_logger = logging.getLogger()
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, *root_logger.handlers, respect_handler_level=True)
+    root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
     print(f"启动股票 MCP 服务器...")
     print(f"监听地址: http://{args.host}:{args.port}")
     print(f"支持的功能: 历史行情查询、分时数据查询、近期历史行情")
     
-    # 启动服务器，使用流式 HTTP 传输
+    # 启动服务器，使用流式 HTTP 传输（只在直接运行时才需要 uvicorn）
+    import uvicorn
     uvicorn.run(mcp.streamable_http_app, host=args.host, port=args.port)
@@ -9,11 +9,20 @@
 使用方法:
 1. 确保已安装依赖: pip install -r requirements.txt
 2. 运行测试: python test.py
+3. 反复调试时可设置 STOCK_TEST_CACHE=1，今天之前的行情和股票代码查询结果缓存到 .cache/ 目录，
+   有效期内重新运行直接读取磁盘，不再请求数据源
 """
 
 import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Tuple
 
 # 导入我们的 MCP 服务器模块
 from stock_mcp_server import (
@@ -34,6 +43,180 @@ from stock_mcp_server import (
     get_recent_date_range
 )
 
+# 查询结果磁盘缓存，默认关闭。缓存的是格式化后的文本，修改格式化代码后需要清空 .cache/ 才能看到新输出
+CACHE_ENABLED = os.environ.get("STOCK_TEST_CACHE") == "1"
+CACHE_DIR = Path(__file__).resolve().parent / ".cache"
+PRICE_CACHE_TTL = 7 * 86400       # 今天之前的历史行情，7天
+INFO_CACHE_TTL = 30 * 86400       # 股票代码名称等元数据，30天
+
+
+def _before_today(date_str: str) -> bool:
+    """判断日期参数是否早于今天（空值表示默认的近期日期，视为包含今天）
+
+    Args:
+        date_str (str): 日期字符串，支持 format_date_string 接受的格式
+
+    Returns:
+        bool: 早于今天返回 True，空值、无效日期或今天及以后返回 False
+    """
+    if not date_str:
+        return False
+    try:
+        return format_date_string(date_str) < datetime.now().strftime("%Y%m%d")
+    except ValueError:
+        return False
+
+
+def _cached(ttl: int, date_arg: Optional[str] = None):
+    """按函数名和参数把查询结果缓存到磁盘的装饰器
+
+    只缓存正常结果，以"错误"或"暂无数据"开头的结果不写入缓存，下次仍会重新查询。
+
+    Args:
+        ttl (int): 缓存有效期（秒），按缓存文件的修改时间判断
+        date_arg (Optional[str]): 查询截止日期的参数名；指定时只缓存截止日期早于今天的查询，
+            当日数据在交易时段内仍会变化，始终实时查询
+
+    Returns:
+        Callable: 装饰器，未开启缓存时原样返回被装饰的函数
+    """
+    def decorator(func: Callable[..., Awaitable[str]]) -> Callable[..., Awaitable[str]]:
+        if not CACHE_ENABLED:
+            return func
+
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> str:
+            # 按完整参数生成缓存键，位置参数和关键字参数写法不同的相同查询共用缓存
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if date_arg is not None and not _before_today(bound.arguments[date_arg]):
+                return await func(*args, **kwargs)
+
+            key = json.dumps([func.__name__, bound.arguments], ensure_ascii=False, sort_keys=True)
+            path = CACHE_DIR / f"{func.__name__}-{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+            try:
+                if time.time() - path.stat().st_mtime < ttl:
+                    return json.loads(path.read_text(encoding="utf-8"))["result"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+            result = await func(*args, **kwargs)
+            if not result.startswith(("错误", "暂无数据")):
+                CACHE_DIR.mkdir(exist_ok=True)
+                path.write_text(json.dumps({"key": key, "result": result}, ensure_ascii=False), encoding="utf-8")
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# 只缓存结果由参数完全确定的查询：截止日期早于今天的行情和股票代码名称。
+# 基本信息含最新价格，近期行情、排行、资金流、龙虎榜等依赖当天数据，始终实时查询
+get_stock_history = _cached(PRICE_CACHE_TTL, date_arg="end_date")(get_stock_history)
+get_stock_intraday = _cached(PRICE_CACHE_TTL, date_arg="date")(get_stock_intraday)
+search_stock_code = _cached(INFO_CACHE_TTL)(search_stock_code)
+
+class QueryTest(NamedTuple):
+    """单项数据查询测试"""
+    label: str                               # 测试说明
+    query: Callable[[], Awaitable[str]]      # 创建查询协程的函数
+    limit: Optional[int] = 500               # 结果显示的最大字符数，None 表示完整显示
+
+
+def build_query_tests() -> List[Tuple[str, List[QueryTest]]]:
+    """生成按功能分组的数据查询测试（日期参数按运行时的当前日期计算）
+
+    Returns:
+        List[Tuple[str, List[QueryTest]]]: (功能名称, 该功能的查询测试) 列表
+    """
+    now = datetime.now()
+    today = now.strftime("%Y%m%d")
+    five_days_ago = (now - timedelta(days=5)).strftime("%Y%m%d")
+    three_days_ago = (now - timedelta(days=3)).strftime("%Y%m%d")
+
+    return [
+        ("历史行情查询", [
+            QueryTest("测试基本历史行情查询（平安银行近5天）",
+                      lambda: get_stock_history("000001", "daily", five_days_ago, today)),
+            QueryTest("测试错误股票代码", lambda: get_stock_history("999999"), 200),
+        ]),
+        ("分时数据查询", [
+            QueryTest("测试60分钟分时数据（平安银行今日）", lambda: get_stock_intraday("000001", today, "60")),
+        ]),
+        ("近期历史行情", [
+            QueryTest("测试近期历史行情（贵州茅台）", lambda: get_recent_history("600519"), 800),
+        ]),
+        ("股票基本信息", [
+            QueryTest("测试股票基本信息（平安银行）", lambda: get_stock_info("000001"), None),
+            QueryTest("测试股票基本信息（万科A）", lambda: get_stock_info("000002")),
+        ]),
+        ("筹码分布", [
+            QueryTest("测试筹码分布（平安银行）", lambda: get_stock_chip_distribution("000001"), 800),
+        ]),
+        ("股票代码查询", [
+            QueryTest("测试根据代码查询名称（平安银行）", lambda: search_stock_code("000001"), None),
+            QueryTest("测试根据名称查询代码（贵州茅台）", lambda: search_stock_code("贵州茅台"), None),
+            QueryTest("测试模糊查询（平安）", lambda: search_stock_code("平安"), 600),
+        ]),
+        ("市场分析功能", [
+            QueryTest("测试股票热度排行", get_stock_hot_rank, 600),
+            QueryTest("测试个股资金流（即时）", lambda: get_individual_fund_flow("即时"), 600),
+            QueryTest("测试概念资金流（即时）", lambda: get_concept_fund_flow("即时"), 600),
+            QueryTest("测试行业资金流（即时）", lambda: get_industry_fund_flow("即时"), 600),
+            QueryTest("测试行业板块总览", get_industry_board_overview, 600),
+        ]),
+        ("龙虎榜功能", [
+            QueryTest("测试龙虎榜详情（最近7天）", get_dragon_tiger_list, 800),
+            QueryTest("测试龙虎榜详情（指定日期）", lambda: get_dragon_tiger_list(three_days_ago, today), 600),
+        ]),
+    ]
+
+
+def _head(text: str, limit: Optional[int]) -> str:
+    """截取文本开头用于显示，超出长度时末尾加省略号
+
+    Args:
+        text (str): 原文本
+        limit (Optional[int]): 最大字符数，None 表示不截取
+
+    Returns:
+        str: 截取后的文本
+    """
+    if limit is None or len(text) <= limit:
+        return text
+    return f"{text[:limit]}..."
+
+
+async def run_query_group(title: str, tests: List[QueryTest]) -> str:
+    """依次执行一组数据查询测试
+
+    整组输出拼好后返回，由调用方按顺序打印，并发执行时各组输出不会互相穿插。
+
+    Args:
+        title (str): 功能名称
+        tests (List[QueryTest]): 该功能的查询测试
+
+    Returns:
+        str: 该组测试的全部输出
+    """
+    lines = [f"=== 测试{title} ==="]
+    for index, test in enumerate(tests, 1):
+        lines.append(f"{index}. {test.label}...")
+
+        start_ns = time.perf_counter_ns()
+        result = await test.query()
+        lines.append(f"查询耗时: {(time.perf_counter_ns() - start_ns) / 1e9:.2f}秒")
+
+        lines.append("查询结果:")
+        lines.append(_head(result, test.limit))
+        lines.append("")
+
+    return "\n".join(lines) + "\n"
+
 
 async def test_validate_stock_symbol():
     """测试股票代码验证功能"""
@@ -73,260 +256,25 @@ async def test_date_functions():
     print()
 
 
-async def test_stock_history():
-    """测试历史行情查询功能"""
-    print("=== 测试历史行情查询 ===")
-
-    # 测试基本查询
-    print("1. 测试基本历史行情查询（平安银行近5天）...")
-    start_time = time.time()
-
-    # 计算近5天的日期范围
-    today = datetime.now()
-    end_date = today.strftime("%Y%m%d")
-    start_date = (today - timedelta(days=5)).strftime("%Y%m%d")
-
-    result = await get_stock_history("000001", "daily", start_date, end_date)
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:500] + "..." if len(result) > 500 else result)
-    print()
-
-    # 测试错误情况
-    print("2. 测试错误股票代码...")
-    error_result = await get_stock_history("999999")
-    print("错误结果:", error_result[:200])
-    print()
-
-
-async def test_stock_intraday():
-    """测试分时数据查询功能"""
-    print("=== 测试分时数据查询 ===")
-
-    print("1. 测试60分钟分时数据（平安银行今日）...")
-    start_time = time.time()
-
-    today = datetime.now().strftime("%Y%m%d")
-    result = await get_stock_intraday("000001", today, "60")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:500] + "..." if len(result) > 500 else result)
-    print()
-
-
-async def test_recent_history():
-    """测试近期历史行情功能"""
-    print("=== 测试近期历史行情 ===")
-
-    print("1. 测试近期历史行情（贵州茅台）...")
-    start_time = time.time()
-
-    result = await get_recent_history("600519")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:800] + "..." if len(result) > 800 else result)
-    print()
-
-
-async def test_stock_info():
-    """测试股票基本信息功能"""
-    print("=== 测试股票基本信息 ===")
-
-    print("1. 测试股票基本信息（平安银行）...")
-    start_time = time.time()
-
-    result = await get_stock_info("000001")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result)
-    print()
-
-    print("2. 测试股票基本信息（万科A）...")
-    start_time = time.time()
-
-    result = await get_stock_info("000002")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:500] + "..." if len(result) > 500 else result)
-    print()
-
-
-async def test_chip_distribution():
-    """测试筹码分布功能"""
-    print("=== 测试筹码分布 ===")
-
-    print("1. 测试筹码分布（平安银行）...")
-    start_time = time.time()
-
-    result = await get_stock_chip_distribution("000001")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:800] + "..." if len(result) > 800 else result)
-    print()
-
-
-async def test_search_stock_code():
-    """测试股票代码查询功能"""
-    print("=== 测试股票代码查询 ===")
-
-    print("1. 测试根据代码查询名称（平安银行）...")
-    start_time = time.time()
-
-    result = await search_stock_code("000001")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result)
-    print()
-
-    print("2. 测试根据名称查询代码（贵州茅台）...")
-    start_time = time.time()
-
-    result = await search_stock_code("贵州茅台")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result)
-    print()
-
-    print("3. 测试模糊查询（平安）...")
-    start_time = time.time()
-
-    result = await search_stock_code("平安")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:600] + "..." if len(result) > 600 else result)
-    print()
-
-
-async def test_market_analysis():
-    """测试市场分析功能"""
-    print("=== 测试市场分析功能 ===")
-
-    print("1. 测试股票热度排行...")
-    start_time = time.time()
-
-    result = await get_stock_hot_rank()
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:600] + "..." if len(result) > 600 else result)
-    print()
-
-    print("2. 测试个股资金流（即时）...")
-    start_time = time.time()
-
-    result = await get_individual_fund_flow("即时")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:600] + "..." if len(result) > 600 else result)
-    print()
-
-    print("3. 测试概念资金流（即时）...")
-    start_time = time.time()
-
-    result = await get_concept_fund_flow("即时")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:600] + "..." if len(result) > 600 else result)
-    print()
-
-    print("4. 测试行业资金流（即时）...")
-    start_time = time.time()
-
-    result = await get_industry_fund_flow("即时")
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:600] + "..." if len(result) > 600 else result)
-    print()
-
-    print("5. 测试行业板块总览...")
-    start_time = time.time()
-
-    result = await get_industry_board_overview()
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:600] + "..." if len(result) > 600 else result)
-    print()
-
-
-async def test_dragon_tiger_list():
-    """测试龙虎榜功能"""
-    print("=== 测试龙虎榜功能 ===")
-
-    print("1. 测试龙虎榜详情（最近7天）...")
-    start_time = time.time()
-
-    result = await get_dragon_tiger_list()
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:800] + "..." if len(result) > 800 else result)
-    print()
-
-    print("2. 测试龙虎榜详情（指定日期）...")
-    start_time = time.time()
-
-    # 查询最近3天的数据
-    from datetime import datetime, timedelta
-    end_date = datetime.now().strftime("%Y%m%d")
-    start_date = (datetime.now() - timedelta(days=3)).strftime("%Y%m%d")
-
-    result = await get_dragon_tiger_list(start_date, end_date)
-    elapsed = time.time() - start_time
-
-    print(f"查询耗时: {elapsed:.2f}秒")
-    print("查询结果:")
-    print(result[:600] + "..." if len(result) > 600 else result)
-    print()
-
-
 async def run_all_tests():
     """运行所有测试"""
     print("🚀 开始股票 MCP 服务器功能测试")
     print("=" * 50)
 
-    total_start = time.time()
+    total_start_ns = time.perf_counter_ns()
 
-    # 运行各项测试
+    # 运行本地功能测试
     await test_validate_stock_symbol()
     await test_date_functions()
-    await test_stock_history()
-    await test_stock_intraday()
-    await test_recent_history()
-    await test_stock_info()
-    await test_chip_distribution()
-    await test_search_stock_code()
-    await test_market_analysis()
-    await test_dragon_tiger_list()
 
-    total_elapsed = time.time() - total_start
+    # 数据查询测试按功能分组，各组互不依赖，并发执行以重叠网络等待，输出按原顺序打印
+    outputs = await asyncio.gather(*(
+        run_query_group(title, tests) for title, tests in build_query_tests()
+    ))
+    for output in outputs:
+        print(output, end="")
+
+    total_elapsed = (time.perf_counter_ns() - total_start_ns) / 1e9
 
     print("=" * 50)
     print(f"✅ 所有测试完成，总耗时: {total_elapsed:.2f}秒")
@@ -342,9 +290,6 @@ async def run_all_tests():
 
 
 if __name__ == "__main__":
-    # 导入 timedelta（用于日期计算）
-    from datetime import timedelta
-
     # 运行异步测试
     asyncio.run(run_all_tests())
 
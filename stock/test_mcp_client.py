@@ -11,13 +11,17 @@ pip install mcp
 """
 
 import asyncio
+import importlib.util
 import json
 import time
-from typing import Optional
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
 
 try:
-    from mcp.client.session import ClientSession
-    from mcp.client.sse import SseServerParameters
+    import httpx
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
     MCP_AVAILABLE = True
 except ImportError:
     print("⚠️  MCP 客户端库未安装，请运行: pip install mcp")
@@ -26,6 +30,92 @@ except ImportError:
 # 测试配置
 SERVER_URL = "http://localhost:8124"
 TEST_SYMBOLS = ["000001", "600519", "000002"]  # 平安银行、贵州茅台、万科A
+CONCURRENT_TESTS = 4  # 同时进行的功能测试数，与服务端 AKSHARE_MAX_WORKERS 一致
+
+
+def _pooled_http_client(
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional["httpx.Timeout"] = None,
+    auth: Optional["httpx.Auth"] = None
+) -> "httpx.AsyncClient":
+    """创建 MCP 传输使用的 HTTP 客户端
+
+    并发的工具调用共用一个连接池并保持长连接，不必每次请求重新建立连接；
+    安装了 h2 且服务使用 HTTPS 时启用 HTTP/2 多路复用。
+
+    Args:
+        headers (Optional[Dict[str, str]]): 请求头
+        timeout (Optional[httpx.Timeout]): 超时设置，默认30秒
+        auth (Optional[httpx.Auth]): 认证方式
+
+    Returns:
+        httpx.AsyncClient: HTTP 客户端
+    """
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=timeout or httpx.Timeout(30.0),
+        auth=auth,
+        follow_redirects=True,
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+    )
+
+
+class ToolTest(NamedTuple):
+    """单项工具调用测试"""
+    title: str                       # 测试说明
+    tool: str                        # 工具名
+    arguments: Dict[str, Any]        # 工具参数
+    limit: Optional[int] = 500       # 结果显示的最大字符数，None 表示完整显示
+
+
+def build_tool_tests() -> List[ToolTest]:
+    """生成功能测试列表（日期参数按运行时的当前日期计算）
+
+    Returns:
+        List[ToolTest]: 各项工具调用测试
+    """
+    now = datetime.now()
+    today = now.strftime("%Y%m%d")
+    ten_days_ago = (now - timedelta(days=10)).strftime("%Y%m%d")
+
+    return [
+        ToolTest("🔍 测试近期历史行情查询 - 000001", "get_recent_history", {"symbol": "000001"}),  # 平安银行
+        ToolTest("📈 测试历史行情查询 - 600519", "get_stock_history", {  # 贵州茅台
+            "symbol": "600519",
+            "period": "daily",
+            "start_date": ten_days_ago,
+            "end_date": today
+        }),
+        ToolTest("⏰ 测试分时数据查询 - 000002", "get_stock_intraday", {  # 万科A
+            "symbol": "000002",
+            "date": today,
+            "period": "60"
+        }),
+        ToolTest("📋 测试股票基本信息 - 000001", "get_stock_info", {"symbol": "000001"}, None),
+        ToolTest("📊 测试筹码分布 - 000001", "get_stock_chip_distribution", {"symbol": "000001"}, 800),
+        ToolTest("🔍 测试股票代码查询 - '000001'", "search_stock_code", {"query": "000001"}, None),
+        ToolTest("🔍 测试股票代码查询 - '平安银行'", "search_stock_code", {"query": "平安银行"}, None),
+        ToolTest("🔥 测试股票热度排行", "get_stock_hot_rank", {}, 400),
+        ToolTest("💰 测试个股资金流（即时）", "get_individual_fund_flow", {"symbol": "即时"}, 400),
+        ToolTest("🏭 测试行业板块总览", "get_industry_board_overview", {}, 400),
+        ToolTest("🐉 测试龙虎榜详情（最近7天）", "get_dragon_tiger_list", {}),
+    ]
+
+
+def _head(text: str, limit: Optional[int]) -> str:
+    """截取文本开头用于显示，超出长度时末尾加省略号
+
+    Args:
+        text (str): 原文本
+        limit (Optional[int]): 最大字符数，None 表示不截取
+
+    Returns:
+        str: 截取后的文本
+    """
+    if limit is None or len(text) <= limit:
+        return text
+    return f"{text[:limit]}..."
 
 
 class StockMCPTester:
@@ -39,6 +129,8 @@ class StockMCPTester:
         """
         self.server_url = server_url
         self.session: Optional[ClientSession] = None
+        # 传输层和会话的上下文在 close() 中统一退出
+        self._exit_stack = AsyncExitStack()
         
     async def connect(self) -> bool:
         """连接到 MCP 服务器
@@ -49,11 +141,15 @@ class StockMCPTester:
         try:
             print(f"🔗 正在连接到 MCP 服务器: {self.server_url}")
             
-            server_params = SseServerParameters(url=self.server_url)
-            self.session = ClientSession(server_params)
-            
+            # 服务使用 streamable HTTP 传输，MCP 端点为 /mcp；整个测试期间只建立一个会话
+            read_stream, write_stream, _ = await self._exit_stack.enter_async_context(
+                streamablehttp_client(f"{self.server_url}/mcp", httpx_client_factory=_pooled_http_client)
+            )
+            session = await self._exit_stack.enter_async_context(ClientSession(read_stream, write_stream))
+
             # 初始化连接
-            await self.session.initialize()
+            await session.initialize()
+            self.session = session
             print("✅ MCP 连接成功")
             return True
             
@@ -79,275 +175,32 @@ class StockMCPTester:
         except Exception as e:
             print(f"❌ 获取工具列表失败: {e}")
     
-    async def test_recent_history(self, symbol: str = "000001"):
-        """测试近期历史行情查询
-        
-        Args:
-            symbol (str): 股票代码
-        """
-        if not self.session:
-            print("❌ 未连接到 MCP 服务器")
-            return
-        
-        try:
-            print(f"\n🔍 测试近期历史行情查询 - {symbol}")
-            start_time = time.time()
-            
-            result = await self.session.call_tool(
-                "get_recent_history",
-                arguments={"symbol": symbol}
-            )
-            
-            elapsed = time.time() - start_time
-            print(f"⏱️  查询耗时: {elapsed:.2f}秒")
-            print("📊 查询结果:")
-            
-            # 显示结果的前500个字符
-            content = result.content[0].text if result.content else "无数据"
-            print(content[:500] + ("..." if len(content) > 500 else ""))
-            
-        except Exception as e:
-            print(f"❌ 查询失败: {e}")
-    
-    async def test_stock_history(self, symbol: str = "600519"):
-        """测试历史行情查询
-        
-        Args:
-            symbol (str): 股票代码
-        """
-        if not self.session:
-            print("❌ 未连接到 MCP 服务器")
-            return
-        
-        try:
-            print(f"\n📈 测试历史行情查询 - {symbol}")
-            start_time = time.time()
-            
-            # 查询最近10天的数据
-            from datetime import datetime, timedelta
-            end_date = datetime.now().strftime("%Y%m%d")
-            start_date = (datetime.now() - timedelta(days=10)).strftime("%Y%m%d")
-            
-            result = await self.session.call_tool(
-                "get_stock_history",
-                arguments={
-                    "symbol": symbol,
-                    "period": "daily",
-                    "start_date": start_date,
-                    "end_date": end_date
-                }
-            )
-            
-            elapsed = time.time() - start_time
-            print(f"⏱️  查询耗时: {elapsed:.2f}秒")
-            print("📊 查询结果:")
-            
-            content = result.content[0].text if result.content else "无数据"
-            print(content[:500] + ("..." if len(content) > 500 else ""))
-            
-        except Exception as e:
-            print(f"❌ 查询失败: {e}")
-    
-    async def test_intraday_data(self, symbol: str = "000002"):
-        """测试分时数据查询
-        
-        Args:
-            symbol (str): 股票代码
-        """
-        if not self.session:
-            print("❌ 未连接到 MCP 服务器")
-            return
-        
-        try:
-            print(f"\n⏰ 测试分时数据查询 - {symbol}")
-            start_time = time.time()
-            
-            # 查询今天的60分钟数据
-            today = datetime.now().strftime("%Y%m%d")
-            
-            result = await self.session.call_tool(
-                "get_stock_intraday",
-                arguments={
-                    "symbol": symbol,
-                    "date": today,
-                    "period": "60"
-                }
-            )
-            
-            elapsed = time.time() - start_time
-            print(f"⏱️  查询耗时: {elapsed:.2f}秒")
-            print("📊 查询结果:")
-            
-            content = result.content[0].text if result.content else "无数据"
-            print(content[:500] + ("..." if len(content) > 500 else ""))
-            
-        except Exception as e:
-            print(f"❌ 查询失败: {e}")
+    async def run_tool_test(self, test: "ToolTest"):
+        """执行单项工具调用测试
 
-    async def test_stock_info(self, symbol: str = "000001"):
-        """测试股票基本信息功能
+        整项测试的输出拼好后一次打印，并发执行时各项测试的输出不会互相穿插。
 
         Args:
-            symbol (str): 股票代码
+            test (ToolTest): 测试说明、工具名、参数和结果显示长度
         """
         if not self.session:
             print("❌ 未连接到 MCP 服务器")
             return
 
+        lines = [f"\n{test.title}"]
         try:
-            print(f"\n📋 测试股票基本信息 - {symbol}")
-            start_time = time.time()
-
-            result = await self.session.call_tool(
-                "get_stock_info",
-                arguments={"symbol": symbol}
-            )
-
-            elapsed = time.time() - start_time
-            print(f"⏱️  查询耗时: {elapsed:.2f}秒")
-            print("📊 查询结果:")
+            start_ns = time.perf_counter_ns()
+            result = await self.session.call_tool(test.tool, arguments=test.arguments)
+            lines.append(f"⏱️  查询耗时: {(time.perf_counter_ns() - start_ns) / 1e9:.2f}秒")
+            lines.append("📊 查询结果:")
 
             content = result.content[0].text if result.content else "无数据"
-            print(content)
+            lines.append(_head(content, test.limit))
 
         except Exception as e:
-            print(f"❌ 查询失败: {e}")
+            lines.append(f"❌ 查询失败: {e}")
 
-    async def test_chip_distribution(self, symbol: str = "000001"):
-        """测试筹码分布功能
-
-        Args:
-            symbol (str): 股票代码
-        """
-        if not self.session:
-            print("❌ 未连接到 MCP 服务器")
-            return
-
-        try:
-            print(f"\n📊 测试筹码分布 - {symbol}")
-            start_time = time.time()
-
-            result = await self.session.call_tool(
-                "get_stock_chip_distribution",
-                arguments={"symbol": symbol}
-            )
-
-            elapsed = time.time() - start_time
-            print(f"⏱️  查询耗时: {elapsed:.2f}秒")
-            print("📊 查询结果:")
-
-            content = result.content[0].text if result.content else "无数据"
-            print(content[:800] + ("..." if len(content) > 800 else ""))
-
-        except Exception as e:
-            print(f"❌ 查询失败: {e}")
-
-    async def test_search_stock_code(self, query: str = "000001"):
-        """测试股票代码查询功能
-
-        Args:
-            query (str): 查询内容（代码或名称）
-        """
-        if not self.session:
-            print("❌ 未连接到 MCP 服务器")
-            return
-
-        try:
-            print(f"\n🔍 测试股票代码查询 - '{query}'")
-            start_time = time.time()
-
-            result = await self.session.call_tool(
-                "search_stock_code",
-                arguments={"query": query}
-            )
-
-            elapsed = time.time() - start_time
-            print(f"⏱️  查询耗时: {elapsed:.2f}秒")
-            print("📊 查询结果:")
-
-            content = result.content[0].text if result.content else "无数据"
-            print(content)
-
-        except Exception as e:
-            print(f"❌ 查询失败: {e}")
-
-    async def test_market_analysis(self):
-        """测试市场分析功能"""
-        if not self.session:
-            print("❌ 未连接到 MCP 服务器")
-            return
-
-        # 测试股票热度
-        try:
-            print(f"\n🔥 测试股票热度排行")
-            start_time = time.time()
-
-            result = await self.session.call_tool("get_stock_hot_rank", arguments={})
-            elapsed = time.time() - start_time
-            print(f"⏱️  查询耗时: {elapsed:.2f}秒")
-
-            content = result.content[0].text if result.content else "无数据"
-            print("📊 查询结果:")
-            print(content[:400] + ("..." if len(content) > 400 else ""))
-
-        except Exception as e:
-            print(f"❌ 股票热度查询失败: {e}")
-
-        # 测试个股资金流
-        try:
-            print(f"\n💰 测试个股资金流（即时）")
-            start_time = time.time()
-
-            result = await self.session.call_tool(
-                "get_individual_fund_flow",
-                arguments={"symbol": "即时"}
-            )
-            elapsed = time.time() - start_time
-            print(f"⏱️  查询耗时: {elapsed:.2f}秒")
-
-            content = result.content[0].text if result.content else "无数据"
-            print("📊 查询结果:")
-            print(content[:400] + ("..." if len(content) > 400 else ""))
-
-        except Exception as e:
-            print(f"❌ 个股资金流查询失败: {e}")
-
-        # 测试行业板块总览
-        try:
-            print(f"\n🏭 测试行业板块总览")
-            start_time = time.time()
-
-            result = await self.session.call_tool("get_industry_board_overview", arguments={})
-            elapsed = time.time() - start_time
-            print(f"⏱️  查询耗时: {elapsed:.2f}秒")
-
-            content = result.content[0].text if result.content else "无数据"
-            print("📊 查询结果:")
-            print(content[:400] + ("..." if len(content) > 400 else ""))
-
-        except Exception as e:
-            print(f"❌ 行业板块总览查询失败: {e}")
-
-    async def test_dragon_tiger_list(self):
-        """测试龙虎榜功能"""
-        if not self.session:
-            print("❌ 未连接到 MCP 服务器")
-            return
-
-        try:
-            print(f"\n🐉 测试龙虎榜详情（最近7天）")
-            start_time = time.time()
-
-            result = await self.session.call_tool("get_dragon_tiger_list", arguments={})
-            elapsed = time.time() - start_time
-            print(f"⏱️  查询耗时: {elapsed:.2f}秒")
-
-            content = result.content[0].text if result.content else "无数据"
-            print("📊 查询结果:")
-            print(content[:500] + ("..." if len(content) > 500 else ""))
-
-        except Exception as e:
-            print(f"❌ 龙虎榜查询失败: {e}")
+        print("\n".join(lines))
 
     async def test_error_handling(self):
         """测试错误处理"""
@@ -365,7 +218,7 @@ class StockMCPTester:
                 arguments={"symbol": "999999"}
             )
             content = result.content[0].text if result.content else "无响应"
-            print(f"  结果: {content[:100]}...")
+            print(f"  结果: {_head(content, 100)}")
             
         except Exception as e:
             print(f"  异常: {e}")
@@ -381,7 +234,7 @@ class StockMCPTester:
                 }
             )
             content = result.content[0].text if result.content else "无响应"
-            print(f"  结果: {content[:100]}...")
+            print(f"  结果: {_head(content, 100)}")
             
         except Exception as e:
             print(f"  异常: {e}")
@@ -389,7 +242,8 @@ class StockMCPTester:
     async def close(self):
         """关闭连接"""
         if self.session:
-            await self.session.close()
+            self.session = None
+            await self._exit_stack.aclose()
             print("🔌 MCP 连接已关闭")
 
 
@@ -411,16 +265,15 @@ async def run_comprehensive_test():
         # 工具列表测试
         await tester.list_tools()
         
-        # 功能测试
-        await tester.test_recent_history("000001")  # 平安银行
-        await tester.test_stock_history("600519")   # 贵州茅台
-        await tester.test_intraday_data("000002")   # 万科A
-        await tester.test_stock_info("000001")      # 平安银行基本信息
-        await tester.test_chip_distribution("000001")  # 平安银行筹码分布
-        await tester.test_search_stock_code("000001")   # 股票代码查询
-        await tester.test_search_stock_code("平安银行")  # 股票名称查询
-        await tester.test_market_analysis()            # 市场分析功能
-        await tester.test_dragon_tiger_list()          # 龙虎榜功能
+        # 功能测试：各项查询互不依赖，并发执行（同一会话按请求 ID 区分响应），
+        # 同时进行的查询数与服务端 akshare 并发上限一致，各项输出按完成顺序整块显示
+        semaphore = asyncio.Semaphore(CONCURRENT_TESTS)
+
+        async def limited(test: ToolTest):
+            async with semaphore:
+                await tester.run_tool_test(test)
+
+        await asyncio.gather(*(limited(test) for test in build_tool_tests()))
 
         # 错误处理测试
         await tester.test_error_handling()
@@ -440,8 +293,5 @@ async def run_comprehensive_test():
 
 
 if __name__ == "__main__":
-    # 导入 datetime（用于日期计算）
-    from datetime import datetime, timedelta
-    
     # 运行测试
     asyncio.run(run_comprehensive_test())
@@ -9,6 +9,7 @@ from .core import (
     get_current_timestamp,
     get_timestamp_range,
     get_time_range,
+    get_time_range_list,
     get_timezone_time,
     get_timezone_timestamp,
     get_recent_time,
@@ -52,11 +53,9 @@ async def time_range(
     format_str: str = "%Y-%m-%d %H:%M:%S",
     interval_seconds: int = 60
 ) -> str:
-    """获取指定时间范围内的时间列表（流式返回）"""
-    results = []
-    async for time_str in get_time_range(start_time, end_time, format_str, interval_seconds):
-        results.append(time_str)
-    return "\n".join(results)
+    """获取指定时间范围内的时间列表"""
+    # 工具结果一次性返回，直接批量生成列表，不逐个消费流式生成器
+    return "\n".join(await get_time_range_list(start_time, end_time, format_str, interval_seconds))
 
 
 @mcp.tool()
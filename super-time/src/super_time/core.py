@@ -6,8 +6,35 @@ SuperTime 核心功能模块
 import asyncio
 import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, AsyncIterator
-from zoneinfo import ZoneInfo
+from functools import lru_cache
+from typing import Optional, Dict, Any, AsyncIterator, Callable, List, Tuple, Type
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# 流式返回时间列表时每批格式化的数量，批与批之间让出一次事件循环
+TIME_RANGE_CHUNK_SIZE = 4096
+
+# get_current_time 的结果缓存: (秒级时间戳, 格式字符串, 格式化结果)，同一秒内相同格式直接复用
+_current_time_cache: Optional[Tuple[int, str, str]] = None
+
+# _now_in 的结果缓存: (时区名称, 单调时钟毫秒桶, 当前时间)，约1毫秒内同一时区的调用共用一个结果
+_now_cache: Optional[Tuple[str, int, datetime]] = None
+
+# 默认时间格式，解析时走 datetime.fromisoformat 快速路径
+DEFAULT_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 常用格式的专用格式化函数：isoformat 不用解析格式字符串，速度约为 strftime 的两倍。
+# 对不带时区的时间，年份不小于1000时结果与 strftime 完全相同
+_FAST_FORMATTERS: Dict[str, Callable[[datetime], str]] = {
+    "%Y-%m-%d %H:%M:%S": lambda dt: dt.isoformat(" ", "seconds"),
+    "%Y-%m-%dT%H:%M:%S": lambda dt: dt.isoformat("T", "seconds"),
+    "%Y-%m-%d": lambda dt: dt.date().isoformat(),
+}
+
+# 中文星期名称，按 datetime.weekday() 的下标排列
+_WEEKDAYS_CN = ("星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日")
+# get_time_info 中固定字段的格式，与用户格式拼在一起只调用一次 strftime，
+# 用单元分隔符 \x1f 隔开后再拆分
+_TIME_INFO_FORMAT_SUFFIX = "\x1f%Y-%m-%d\x1f%H:%M:%S\x1f%A"
 
 
 async def get_current_time(format_str: str = "%Y-%m-%d %H:%M:%S") -> str:
@@ -20,7 +47,20 @@ async def get_current_time(format_str: str = "%Y-%m-%d %H:%M:%S") -> str:
     Returns:
         格式化的时间字符串
     """
-    return datetime.now().strftime(format_str)
+    global _current_time_cache
+
+    # 含微秒的格式在同一秒内也会变化，不缓存
+    if "%f" in format_str:
+        return _format_time(datetime.now(), format_str)
+
+    sec = time.time_ns() // 1_000_000_000
+    cached = _current_time_cache
+    if cached is not None and cached[0] == sec and cached[1] == format_str:
+        return cached[2]
+
+    result = _format_time(datetime.fromtimestamp(sec), format_str)
+    _current_time_cache = (sec, format_str, result)
+    return result
 
 
 async def get_current_timestamp() -> int:
@@ -30,7 +70,35 @@ async def get_current_timestamp() -> int:
     Returns:
         当前时间戳（秒）
     """
-    return int(time.time())
+    # 整数纳秒整除，不经过浮点数转换
+    return time.time_ns() // 1_000_000_000
+
+
+def _parse_time(time_str: str, format_str: str) -> datetime:
+    """
+    按格式解析时间字符串
+
+    默认格式且字符串为标准的 "YYYY-MM-DD HH:MM:SS" 布局时用 C 实现的 fromisoformat 解析，
+    不经过 strptime 的格式匹配；其他情况（包括个位数月日等 strptime 才接受的写法）仍用 strptime。
+
+    Args:
+        time_str: 时间字符串
+        format_str: 时间格式字符串
+
+    Returns:
+        解析出的时间
+    """
+    if (
+        format_str == DEFAULT_TIME_FORMAT
+        and len(time_str) == 19
+        and time_str.isascii()
+        and time_str[4] == time_str[7] == "-"
+        and time_str[10] == " "
+        and time_str[13] == time_str[16] == ":"
+        and time_str.replace("-", "").replace(" ", "").replace(":", "").isdigit()
+    ):
+        return datetime.fromisoformat(time_str)
+    return datetime.strptime(time_str, format_str)
 
 
 async def get_timestamp_range(
@@ -49,15 +117,87 @@ async def get_timestamp_range(
     Returns:
         包含开始和结束时间戳的字典
     """
-    start_dt = datetime.strptime(start_time, format_str)
-    end_dt = datetime.strptime(end_time, format_str)
+    start_dt = _parse_time(start_time, format_str)
+    end_dt = _parse_time(end_time, format_str)
 
+    # 不带时区的时间按本地时区换算，与 get_current_time 等接口保持一致，这里不改成按 UTC 解释
     return {
         "start_timestamp": int(start_dt.timestamp()),
         "end_timestamp": int(end_dt.timestamp())
     }
 
 
+def _time_range_points(
+    start_time: str,
+    end_time: str,
+    format_str: str,
+    interval_seconds: int
+) -> Tuple[datetime, timedelta, int]:
+    """
+    解析时间范围并计算其中的时间点个数
+
+    Args:
+        start_time: 开始时间字符串
+        end_time: 结束时间字符串
+        format_str: 时间格式字符串
+        interval_seconds: 时间间隔（秒）
+
+    Returns:
+        (开始时间, 时间间隔, 时间点个数)，结束时间早于开始时间时个数为0
+    """
+    if interval_seconds <= 0:
+        raise ValueError(f"时间间隔必须大于0秒，当前为 {interval_seconds}")
+
+    start_dt = _parse_time(start_time, format_str)
+    end_dt = _parse_time(end_time, format_str)
+    step = timedelta(seconds=interval_seconds)
+
+    return start_dt, step, max((end_dt - start_dt) // step + 1, 0)
+
+
+def _format_time(dt: datetime, format_str: str) -> str:
+    """
+    格式化单个时间，常用格式走 isoformat 快速路径，其他格式用 strftime
+
+    Args:
+        dt: 不带时区的时间
+        format_str: 时间格式字符串
+
+    Returns:
+        格式化的时间字符串
+    """
+    fast = _FAST_FORMATTERS.get(format_str)
+    # strftime 对小于1000的年份不补零，与 isoformat 不同，此时仍用 strftime
+    if fast is not None and dt.year >= 1000:
+        return fast(dt)
+    return dt.strftime(format_str)
+
+
+def _format_time_points(
+    start_dt: datetime,
+    step: timedelta,
+    indexes: range,
+    format_str: str
+) -> List[str]:
+    """
+    按序号批量格式化时间点，每个时间点由开始时间直接算出，不逐个累加
+
+    Args:
+        start_dt: 开始时间
+        step: 时间间隔
+        indexes: 时间点序号范围
+        format_str: 时间格式字符串
+
+    Returns:
+        格式化的时间字符串列表
+    """
+    fast = _FAST_FORMATTERS.get(format_str)
+    # strftime 对小于1000的年份不补零，与 isoformat 不同，此时仍用 strftime
+    if fast is not None and start_dt.year >= 1000:
+        return [fast(start_dt + step * i) for i in indexes]
+    return [(start_dt + step * i).strftime(format_str) for i in indexes]
+
+
 async def get_time_range(
     start_time: str,
     end_time: str,
@@ -76,14 +216,94 @@ async def get_time_range(
     Yields:
         格式化的时间字符串
     """
-    start_dt = datetime.strptime(start_time, format_str)
-    end_dt = datetime.strptime(end_time, format_str)
+    start_dt, step, count = _time_range_points(start_time, end_time, format_str, interval_seconds)
+
+    # 按批格式化，批与批之间让出一次事件循环，避免长范围阻塞其他请求；
+    # 不超过一批的范围直接返回，不做任何等待
+    for chunk_start in range(0, count, TIME_RANGE_CHUNK_SIZE):
+        if chunk_start:
+            await asyncio.sleep(0)
+        chunk_end = min(chunk_start + TIME_RANGE_CHUNK_SIZE, count)
+        for time_str in _format_time_points(start_dt, step, range(chunk_start, chunk_end), format_str):
+            yield time_str
+
+
+async def get_time_range_list(
+    start_time: str,
+    end_time: str,
+    format_str: str = "%Y-%m-%d %H:%M:%S",
+    interval_seconds: int = 60
+) -> List[str]:
+    """
+    获取指定时间范围内的时间列表（一次性返回）
+
+    Args:
+        start_time: 开始时间字符串
+        end_time: 结束时间字符串
+        format_str: 时间格式字符串
+        interval_seconds: 时间间隔（秒），默认为60秒
+
+    Returns:
+        格式化的时间字符串列表
+    """
+    start_dt, step, count = _time_range_points(start_time, end_time, format_str, interval_seconds)
+    return _format_time_points(start_dt, step, range(count), format_str)
+
+
+# 无效时区名称的缓存: 名称 -> (异常类型, 异常参数)，按写入顺序淘汰，
+# 重复的无效名称直接抛出同样的异常，不再让 ZoneInfo 在各个时区目录中逐个查找文件
+_INVALID_ZONES: Dict[str, Tuple[Type[Exception], tuple]] = {}
+_INVALID_ZONES_MAXSIZE = 256
+
+
+@lru_cache(maxsize=64)
+def _get_zone(timezone: str) -> ZoneInfo:
+    """
+    获取时区对象并缓存，避免重复读取和解析时区数据文件
+
+    无效的时区名称会记入最多 _INVALID_ZONES_MAXSIZE（256）条的负缓存，再次查询时
+    直接抛出相同类型的异常，不再查找时区数据文件；超出上限时淘汰最早记录的名称
+
+    Args:
+        timezone: 时区名称
+
+    Returns:
+        时区对象，无效的时区名称抛出 ZoneInfoNotFoundError 或 ValueError
+    """
+    invalid = _INVALID_ZONES.get(timezone)
+    if invalid is not None:
+        raise invalid[0](*invalid[1])
 
-    current_dt = start_dt
-    while current_dt <= end_dt:
-        yield current_dt.strftime(format_str)
-        current_dt += timedelta(seconds=interval_seconds)
-        await asyncio.sleep(0.001)  # 小延迟避免阻塞
+    try:
+        return ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        while len(_INVALID_ZONES) >= _INVALID_ZONES_MAXSIZE:
+            del _INVALID_ZONES[next(iter(_INVALID_ZONES))]
+        _INVALID_ZONES[timezone] = (type(e), e.args)
+        raise
+
+
+def _now_in(timezone: str) -> datetime:
+    """
+    获取指定时区的当前时间，约1毫秒内同一时区的重复调用直接复用上一次的结果
+
+    Args:
+        timezone: 时区名称
+
+    Returns:
+        带时区的当前时间，无效的时区名称抛出异常
+    """
+    global _now_cache
+
+    # 右移20位即除以约 1.05e6，得到约1毫秒的时间桶；用单调时钟分桶，不受系统时间调整影响
+    bucket = time.monotonic_ns() >> 20
+    cached = _now_cache
+    if cached is not None and cached[1] == bucket and cached[0] == timezone:
+        return cached[2]
+
+    now = datetime.now(_get_zone(timezone))
+    _now_cache = (timezone, bucket, now)
+    return now
 
 
 async def get_timezone_time(
@@ -101,8 +321,11 @@ async def get_timezone_time(
         指定时区的格式化时间字符串
     """
     try:
-        tz = ZoneInfo(timezone)
-        return datetime.now(tz).strftime(format_str)
+        now = _now_in(timezone)
+        # 快速路径的格式都不含时区字段，去掉时区再格式化，避免 isoformat 附加时区偏移
+        if format_str in _FAST_FORMATTERS:
+            return _format_time(now.replace(tzinfo=None), format_str)
+        return now.strftime(format_str)
     except Exception as e:
         return f"错误：无效的时区 '{timezone}' - {str(e)}"
 
@@ -118,8 +341,7 @@ async def get_timezone_timestamp(timezone: str = "Asia/Shanghai") -> int:
         指定时区的当前时间戳（秒）
     """
     try:
-        tz = ZoneInfo(timezone)
-        return int(datetime.now(tz).timestamp())
+        return int(_now_in(timezone).timestamp())
     except Exception as e:
         return f"错误：无效的时区 '{timezone}' - {str(e)}"
 
@@ -139,7 +361,7 @@ async def get_recent_time(
         最近N分钟前的时间字符串
     """
     recent_dt = datetime.now() - timedelta(minutes=minutes)
-    return recent_dt.strftime(format_str)
+    return _format_time(recent_dt, format_str)
 
 
 async def get_recent_timestamp(minutes: int = 10) -> int:
@@ -152,8 +374,8 @@ async def get_recent_timestamp(minutes: int = 10) -> int:
     Returns:
         最近N分钟前的时间戳（秒）
     """
-    recent_dt = datetime.now() - timedelta(minutes=minutes)
-    return int(recent_dt.timestamp())
+    # 时间戳是绝对时间，直接减去秒数即可，不需要构造 datetime
+    return time.time_ns() // 1_000_000_000 - minutes * 60
 
 
 async def get_time_info(
@@ -171,25 +393,29 @@ async def get_time_info(
         包含多种时间格式的信息字典
     """
     try:
-        tz = ZoneInfo(timezone)
-        now = datetime.now(tz)
+        now = _now_in(timezone)
+        timestamp = now.timestamp()
+        # 从右侧拆分，用户格式中即使含有分隔符也不影响固定字段
+        local_time, date_str, time_str, weekday = now.strftime(
+            format_str + _TIME_INFO_FORMAT_SUFFIX
+        ).rsplit("\x1f", 3)
 
         return {
             "timezone": timezone,
-            "local_time": now.strftime(format_str),
+            "local_time": local_time,
             "iso_format": now.isoformat(),
-            "timestamp": int(now.timestamp()),
-            "timestamp_ms": int(now.timestamp() * 1000),
-            "date": now.strftime("%Y-%m-%d"),
-            "time": now.strftime("%H:%M:%S"),
+            "timestamp": int(timestamp),
+            "timestamp_ms": int(timestamp * 1000),
+            "date": date_str,
+            "time": time_str,
             "year": now.year,
             "month": now.month,
             "day": now.day,
             "hour": now.hour,
             "minute": now.minute,
             "second": now.second,
-            "weekday": now.strftime("%A"),
-            "weekday_cn": ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"][now.weekday()]
+            "weekday": weekday,
+            "weekday_cn": _WEEKDAYS_CN[now.weekday()]
         }
     except Exception as e:
         return {"error": f"无效的时区 '{timezone}' - {str(e)}"}
\ No newline at end of file
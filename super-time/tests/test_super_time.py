@@ -3,22 +3,17 @@ SuperTime MCP 服务测试用例
 """
 
 import asyncio
+import time
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-import sys
-from pathlib import Path
-
-# 添加src目录到Python路径
-src_path = Path(__file__).parent.parent / "src"
-sys.path.insert(0, str(src_path))
-
 from super_time.core import (
     get_current_time,
     get_current_timestamp,
     get_timestamp_range,
     get_time_range,
+    get_time_range_list,
     get_timezone_time,
     get_timezone_timestamp,
     get_recent_time,
@@ -44,11 +39,12 @@ class TestSuperTime:
     @pytest.mark.asyncio
     async def test_get_current_timestamp(self):
         """测试获取当前时间戳"""
+        before = int(time.time())
         result = await get_current_timestamp()
+        after = int(time.time())
         assert isinstance(result, int)
-        # 验证时间戳在合理范围内（过去1小时到未来1分钟）
-        now = int(datetime.now().timestamp())
-        assert now - 3600 <= result <= now + 60
+        # 验证时间戳落在调用前后读取的系统时间之间
+        assert before <= result <= after
 
     @pytest.mark.asyncio
     async def test_get_timestamp_range(self):
@@ -67,6 +63,14 @@ class TestSuperTime:
         # 验证时间戳差值为1小时（3600秒）
         assert result["end_timestamp"] - result["start_timestamp"] == 3600
 
+        # strptime 接受的非标准写法仍能解析
+        loose = await get_timestamp_range("2023-1-1 0:0:0", "2023-1-1 1:0:0")
+        assert loose == result
+
+        # 无效日期仍然报错
+        with pytest.raises(ValueError):
+            await get_timestamp_range("2023-02-30 00:00:00", end_time)
+
     @pytest.mark.asyncio
     async def test_get_time_range(self):
         """测试获取时间范围列表"""
@@ -93,9 +97,25 @@ class TestSuperTime:
         result_utc = await get_timezone_time("UTC")
         assert isinstance(result_utc, str)
 
-        # 测试无效时区
+        # 默认格式不应带时区偏移，含时区的格式仍按 strftime 输出
+        datetime.strptime(result_utc, "%Y-%m-%d %H:%M:%S")
+        assert (await get_timezone_time("UTC", "%H:%M %z")).endswith("+0000")
+
+        # 紧接着查询其他时区，不应复用上一个时区的当前时间
+        assert (await get_timezone_time("Asia/Shanghai", "%z")) == "+0800"
+
+        # 测试无效时区，重复查询时返回相同的错误
         result_invalid = await get_timezone_time("Invalid/Timezone")
         assert "错误" in result_invalid
+        assert await get_timezone_time("Invalid/Timezone") == result_invalid
+
+        # ZoneInfo 接受但不在 available_timezones() 中的名称仍然有效
+        for key in ("posix/Asia/Shanghai", "right/UTC"):
+            try:
+                ZoneInfo(key)
+            except Exception:
+                continue
+            assert "错误" not in await get_timezone_time(key)
 
     @pytest.mark.asyncio
     async def test_get_timezone_timestamp(self):
@@ -122,12 +142,13 @@ class TestSuperTime:
     @pytest.mark.asyncio
     async def test_get_recent_timestamp(self):
         """测试获取最近时间戳"""
+        before = int(time.time())
         result = await get_recent_timestamp(minutes=30)
+        after = int(time.time())
         assert isinstance(result, int)
 
-        # 验证时间戳在合理范围内
-        now = int(datetime.now().timestamp())
-        assert now - 1800 <= result <= now  # 30分钟前到现在
+        # 验证时间戳正好是调用前后系统时间的30分钟前
+        assert before - 1800 <= result <= after - 1800
 
     @pytest.mark.asyncio
     async def test_get_time_info(self):
@@ -149,6 +170,10 @@ class TestSuperTime:
         # 验证时间戳
         assert isinstance(result["timestamp"], int)
 
+        # 验证各格式字段来自同一时刻
+        assert result["local_time"] == f"{result['date']} {result['time']}"
+        assert result["weekday_cn"].startswith("星期")
+
     @pytest.mark.asyncio
     async def test_custom_time_format(self):
         """测试自定义时间格式"""
@@ -160,6 +185,21 @@ class TestSuperTime:
         assert "月" in result
         assert "日" in result
 
+    @pytest.mark.asyncio
+    async def test_current_time_cache_by_format(self):
+        """测试同一秒内不同格式的当前时间互不影响"""
+        first = await get_current_time("%Y-%m-%d")
+        second = await get_current_time("%H:%M:%S")
+        third = await get_current_time("%Y-%m-%d")
+
+        datetime.strptime(first, "%Y-%m-%d")
+        datetime.strptime(second, "%H:%M:%S")
+        datetime.strptime(third, "%Y-%m-%d")
+
+        # 含微秒的格式不使用缓存，结果保留实际的微秒数
+        result = await get_current_time("%S.%f")
+        assert len(result.split(".")[1]) == 6
+
     @pytest.mark.asyncio
     async def test_streamable_time_range(self):
         """测试流式时间范围返回"""
@@ -174,6 +214,62 @@ class TestSuperTime:
         # 应该返回5个时间点（0, 30, 60, 90, 120秒）
         assert count == 5
 
+    @pytest.mark.asyncio
+    async def test_get_time_range_list(self):
+        """测试一次性返回的时间范围列表与流式结果一致"""
+        start_time = "2023-01-01 00:00:00"
+        end_time = "2023-01-01 00:02:00"
+
+        streamed = [time_str async for time_str in get_time_range(start_time, end_time, interval_seconds=30)]
+        result = await get_time_range_list(start_time, end_time, interval_seconds=30)
+
+        assert result == streamed
+
+        # 结束时间早于开始时间时返回空列表
+        assert await get_time_range_list(end_time, start_time) == []
+
+    @pytest.mark.asyncio
+    async def test_long_time_range(self):
+        """测试跨多个批次的长时间范围"""
+        start_time = "2023-01-01 00:00:00"
+        end_time = "2023-01-02 00:00:00"
+
+        results = []
+        async for time_str in get_time_range(start_time, end_time, interval_seconds=1):
+            results.append(time_str)
+
+        # 一天按1秒间隔共 86401 个时间点（包含开始和结束）
+        assert len(results) == 86401
+        assert results[4096] == "2023-01-01 01:08:16"
+        assert results[-1] == end_time
+
+    @pytest.mark.asyncio
+    async def test_time_range_formats_match_strftime(self):
+        """测试常用格式的专用格式化结果与 strftime 一致"""
+        cases = [
+            ("%Y-%m-%d %H:%M:%S", "2023-12-31 23:59:58", "2024-01-01 00:00:02"),
+            ("%Y-%m-%dT%H:%M:%S", "2024-02-28T23:59:59", "2024-03-01T00:00:01"),
+            ("%Y-%m-%d", "2023-12-30", "2024-01-02"),
+            ("%Y-%m-%d %H:%M:%S", "0999-12-31 23:59:59", "1000-01-01 00:00:01"),
+        ]
+        for format_str, start_time, end_time in cases:
+            interval = 86400 if format_str == "%Y-%m-%d" else 1
+            result = await get_time_range_list(start_time, end_time, format_str, interval)
+
+            start_dt = datetime.strptime(start_time, format_str)
+            expected = [
+                (start_dt + timedelta(seconds=interval * i)).strftime(format_str)
+                for i in range(len(result))
+            ]
+            assert result == expected
+            assert result[0] == start_dt.strftime(format_str)
+
+    @pytest.mark.asyncio
+    async def test_invalid_interval(self):
+        """测试无效的时间间隔"""
+        with pytest.raises(ValueError):
+            await get_time_range_list("2023-01-01 00:00:00", "2023-01-01 00:05:00", interval_seconds=0)
+
 
 if __name__ == "__main__":
     # 运行测试